@@ -1,20 +1,51 @@
+# start the clock before anything else is imported, for --profile-startup
+from lib.startup_profile import StartupProfile
+STARTUP = StartupProfile()
+
+import argparse
+import cProfile
+import datetime
+import multiprocessing
 import os
+import shutil
+import sys
+import tempfile
 import yaml
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog
-from PIL import Image, ImageTk
-from lib.scanner import list_scanners, scan_image, upload_to_paperlessngx
+from PIL import ImageTk
+from lib.scanner import list_scanners, scan_image, scan_batch, set_backend
 from lib.ai import (
+    OPENAI_MODEL,
+    GEMINI_MODEL,
+    HEDGE_MODELS,
+    set_prepare_options,
+    set_request_timeout,
+    preload_providers,
+    configure_cache,
+    cache_stats,
     get_recommended_filename_from_pil_image,
     get_recommended_filename_from_pil_image_gemini,
     get_recommended_filename_from_pil_image_custom,
 )
+from lib.ai_hedge import Candidate, LatencyStats, first_valid_suggestion
+from lib.upload_queue import UploadQueue, UPLOADING, DONE, FAILED, DUPLICATE
+from lib.dedupe import ChecksumCache, DuplicateChecker
+from lib.task_tracker import TaskTracker
+from lib.background import TkExecutor
+from lib.preview import PreviewRenderer, open_for_preview
+from lib.document import Document
+from lib.page_store import PageStore, DEFAULT_MAX_MB, MB
 from configwindow import ConfigWindow
+STARTUP.mark('imports')
+
+NO_SCANNERS = "No scanners found"
 
 class PaperlessScanApp:
-    def __init__(self, root):
+    def __init__(self, root, startup=None):
         version = os.getenv('APP_VERSION', 'v0.0.1')
         self.root = root
+        self.startup = startup
         self.root.title("Paperless Scan App")
         self.root.geometry("1000x800")
         self.root.configure(bg='#f0f0f0')
@@ -22,8 +53,14 @@ class PaperlessScanApp:
         
         # Initialize variables
         self.scanned_image_path = None
-        self.scanned_image = None
+        # the current scan, and the scan the Upload button will send (None once queued)
+        self.document = None
+        self.upload_document = None
+        self.batch_pdf_path = None
         self.photo_image = None
+        self.preview = None
+        self.preview_box = None
+        self._resize_job = None
         self.api_url = None
         self.api_token = None
         self.openai_api_key = None
@@ -31,10 +68,50 @@ class PaperlessScanApp:
         self.custom_endpoint = None
         self.custom_model = None
         self.custom_api_key = None
+        self.openai_model = OPENAI_MODEL
+        self.gemini_model = GEMINI_MODEL
+        # seconds to wait on one AI provider before asking the next one as well (None: only ever ask one)
+        self.ai_hedge_budget = None
+        self.ai_hedge_models = hedge_models(HEDGE_MODELS)
+        # how quickly each provider/model answered this session, fastest asked first when hedging
+        self.ai_stats = LatencyStats()
+        self.upload_workers = 2
+        self.ai_timeout = 60
+        self.ai_cache_settings = None
+        self.ai_preload = True
+        self.duplicate_checker = None
+        self.upload_queue = None
+        self.skip_blank_pages = True
+        self.blank_page_threshold = None
+        self.page_cleanup = None
+        self.cleanup_workers = None
+        self.auto_page_format = True
+        self.encode_workers = None
+        # full-resolution pages are kept under a RAM ceiling, the rest spilled to disk
+        self.page_store = PageStore()
         self.filename = ""
+        self.scan_task = None
+        self.ai_task = None
         # Center the window
         self.center_window()
+        self.mark_startup('center_window')
         self.load_config()
+        self.mark_startup('load_config')
+        # Uploads run in the background so the window never waits on the network
+        self.upload_queue = UploadQueue(workers=self.upload_workers, duplicates=self.duplicate_checker)
+        self._reported_jobs = set()
+        # files handed to the queue that Upload takes back when their upload fails:
+        # upload job id -> the Document the file was staged from, None for a batch PDF
+        self._owned_uploads = {}
+        # Paperless consumes uploads asynchronously; follow each upload's task to its outcome
+        self.task_tracker = TaskTracker()
+        self._consume_tasks = {}  # upload job id -> TrackedTask
+        self._reported_consumes = set()
+        # Scanning and saving run here so the window stays responsive
+        self.tasks = TkExecutor(root)
+        # AI suggestions get their own workers: a provider that hangs until its
+        # request timeout must not hold up the next scan or save
+        self.ai_tasks = TkExecutor(root, max_workers=2, name="ai-worker")
         # Create main frame
         main_frame = tk.Frame(root, bg='#f0f0f0')
         main_frame.pack(expand=True, fill='both', padx=20, pady=20)
@@ -123,9 +200,23 @@ class PaperlessScanApp:
         )
         self.save_button.pack(side='left')
         
+        # Skip AI button (only shown while a filename suggestion is pending)
+        self.skip_ai_button = tk.Button(
+            self.filename_frame,
+            text="Skip AI",
+            command=self.skip_ai,
+            font=("Arial", 9),
+            bg='#9E9E9E',
+            fg='white',
+            relief='flat',
+            padx=10,
+            pady=5
+        )
+        
         # Image display frame
         self.image_frame = tk.Frame(main_frame, bg='white', relief='solid', bd=1)
         self.image_frame.pack(pady=10, fill='both', expand=True)
+        self.image_frame.bind('<Configure>', self.on_preview_resize)
         
         # Placeholder for image
         self.image_label = tk.Label(
@@ -156,6 +247,21 @@ class PaperlessScanApp:
         )
         scan_button.pack(side='left', padx=10)
         
+        # Batch scan button (document feeder -> one multi-page PDF)
+        batch_button = tk.Button(
+            button_frame,
+            text="Batch Scan",
+            command=self.batch_scan_document,
+            font=("Arial", 12),
+            bg='#009688',
+            fg='white',
+            relief='flat',
+            padx=20,
+            pady=10,
+            cursor='hand2'
+        )
+        batch_button.pack(side='left', padx=10)
+        
         # Upload button
         self.upload_button = tk.Button(
             button_frame,
@@ -202,6 +308,54 @@ class PaperlessScanApp:
         )
         exit_button.pack(side='left', padx=10)
         
+        # Upload queue frame
+        queue_frame = tk.LabelFrame(
+            main_frame,
+            text="Uploads",
+            font=("Arial", 10, "bold"),
+            fg='#333333',
+            bg='#f0f0f0'
+        )
+        queue_frame.pack(fill='x', pady=(0, 5))
+        
+        self.upload_tree = ttk.Treeview(
+            queue_frame,
+            columns=("document", "status", "progress"),
+            show="headings",
+            height=4
+        )
+        self.upload_tree.heading("document", text="Document")
+        self.upload_tree.heading("status", text="Status")
+        self.upload_tree.heading("progress", text="Progress")
+        self.upload_tree.column("status", width=100, anchor='center')
+        self.upload_tree.column("progress", width=100, anchor='center')
+        self.upload_tree.pack(side='left', fill='x', expand=True, padx=5, pady=5)
+        
+        queue_side = tk.Frame(queue_frame, bg='#f0f0f0')
+        queue_side.pack(side='left', padx=5)
+        
+        self.queue_label = tk.Label(
+            queue_side,
+            text="Queue: 0",
+            font=("Arial", 9),
+            fg='#666666',
+            bg='#f0f0f0'
+        )
+        self.queue_label.pack(pady=(0, 5))
+        
+        cancel_upload_button = tk.Button(
+            queue_side,
+            text="Cancel Selected",
+            command=self.cancel_selected_uploads,
+            font=("Arial", 9),
+            bg='#f44336',
+            fg='white',
+            relief='flat',
+            padx=10,
+            pady=5
+        )
+        cancel_upload_button.pack()
+        
         # Status label
         self.status_label = tk.Label(
             main_frame,
@@ -217,12 +371,22 @@ class PaperlessScanApp:
             fg='#999999',
             bg='#f0f0f0'
         )
+        # Upload progress bar (only shown while something is uploading)
+        self.upload_progress = ttk.Progressbar(
+            main_frame,
+            orient='horizontal',
+            mode='determinate',
+            length=300,
+            maximum=100
+        )
         self.version_label.pack(side='bottom', pady=(0,5))
         self.status_label.pack(pady=5)
         
         # Bind hover effects
         scan_button.bind('<Enter>', lambda e: scan_button.configure(bg='#45a049'))
         scan_button.bind('<Leave>', lambda e: scan_button.configure(bg='#4CAF50'))
+        batch_button.bind('<Enter>', lambda e: batch_button.configure(bg='#00796B'))
+        batch_button.bind('<Leave>', lambda e: batch_button.configure(bg='#009688'))
         self.upload_button.bind('<Enter>', lambda e: self.upload_button.configure(bg='#e68900') if self.upload_button['state'] != 'disabled' else None)
         self.upload_button.bind('<Leave>', lambda e: self.upload_button.configure(bg='#FF9800') if self.upload_button['state'] != 'disabled' else None)
         exit_button.bind('<Enter>', lambda e: exit_button.configure(bg='#da190b'))
@@ -231,21 +395,52 @@ class PaperlessScanApp:
         refresh_button.bind('<Leave>', lambda e: refresh_button.configure(bg='#2196F3'))
         self.save_button.bind('<Enter>', lambda e: self.save_button.configure(bg='#45a049'))
         self.save_button.bind('<Leave>', lambda e: self.save_button.configure(bg='#4CAF50'))
+        self.skip_ai_button.bind('<Enter>', lambda e: self.skip_ai_button.configure(bg='#757575'))
+        self.skip_ai_button.bind('<Leave>', lambda e: self.skip_ai_button.configure(bg='#9E9E9E'))
         settings_button.bind('<Enter>', lambda e: settings_button.configure(bg='#7B1FA2'))
         settings_button.bind('<Leave>', lambda e: settings_button.configure(bg='#9C27B0'))
+        cancel_upload_button.bind('<Enter>', lambda e: cancel_upload_button.configure(bg='#da190b'))
+        cancel_upload_button.bind('<Leave>', lambda e: cancel_upload_button.configure(bg='#f44336'))
         
+        self.mark_startup('build_ui')
         # Initialize scanners
         self.refresh_scanners()
+        self.mark_startup('scanner_enumeration')
+        
+        # Start watching the upload queue
+        self.root.after(200, self.poll_uploads)
+        
+        # Import the AI provider SDK once the window is up, not before it
+        self.root.after_idle(self.preload_ai_provider)
+    
+    def mark_startup(self, phase):
+        if self.startup is not None:
+            self.startup.mark(phase)
     
     def open_settings(self):
         """Open the configuration settings window"""
         ConfigWindow(self.root)
     
     def cleanup(self):
-         if os.path.exists('tmp.jpg'):
-            os.remove('tmp.jpg')
+         if self.batch_pdf_path and os.path.exists(self.batch_pdf_path):
+            os.remove(self.batch_pdf_path)
+         self.batch_pdf_path = None
 
     def exit_app(self):
+        if self.upload_queue.depth() and not messagebox.askyesno(
+                "Uploads Pending", "Some documents are still uploading. Exit anyway?"):
+            return
+        self.upload_queue.shutdown()
+        self.task_tracker.stop()
+        self.tasks.shutdown()
+        self.ai_tasks.shutdown()
+        stats = cache_stats()
+        if stats:
+            print(f"AI suggestion cache: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"~{stats['saved_seconds']:.1f}s of API time saved")
+        for name, (average, answers, failures) in self.ai_stats.summary().items():
+            latency = f"{average:.1f}s average" if average is not None else "no answer"
+            print(f"AI provider {name}: {latency}, {answers} answer(s), {failures} failure(s)")
         # clean up the temp file
         self.cleanup()
         self.root.quit()
@@ -268,61 +463,234 @@ class PaperlessScanApp:
                 self.scanner_combo.set(scanners[0])
                 self.status_label.config(text=f"Found {len(scanners)} scanner(s)")
             else:
-                self.scanner_combo['values'] = ["No scanners found"]
-                self.scanner_combo.set("No scanners found")
+                self.scanner_combo['values'] = [NO_SCANNERS]
+                self.scanner_combo.set(NO_SCANNERS)
                 self.status_label.config(text="No scanners detected")
         except Exception as e:
             self.status_label.config(text=f"Error detecting scanners: {str(e)}")
     
+    def selected_scanner(self):
+        """Name of the scanner picked in the list, None to let the backend choose"""
+        name = self.scanner_var.get()
+        return name if name and name != NO_SCANNERS else None
+    
     def scan_document(self):
-       # scan the document
+        """Scan a page in the background; the preview shows as soon as it arrives"""
+        if self.scan_task is not None and self.scan_task.pending:
+            self.status_label.config(text="Already scanning...")
+            return
         try:
             self.status_label.config(text="Scanning document...")
-            self.root.update()
-            
-
+            # a suggestion still running for the previous page is no longer wanted
+            self.cancel_ai()
             # clear out existing file if its there...
             self.cleanup()
             # Scan the image and get PIL Image object
-            self.scanned_image = scan_image()
+            self.scan_task = self.tasks.submit(scan_image, self.selected_scanner(), cleanup=self.page_cleanup, store=self.page_store, on_success=self.on_scan_complete, on_error=self.on_scan_error)
+        except Exception as e:
+            self.on_scan_error(e)
+
+    def on_scan_complete(self, document):
+        """Show a finished scan (a Document) and start the AI filename suggestion"""
+        self.document = document
+        
+        if self.document is not None:
+            # Display the image
+            self.display_image_object(self.document)
             
-            if self.scanned_image is not None:
-                # Display the image
-                self.display_image_object(self.scanned_image)
-
-                # get the filename based on the configured AI provider
-                if self.custom_endpoint and self.custom_model:
-                    self.filename = get_recommended_filename_from_pil_image_custom(
-                        self.scanned_image,
-                        self.custom_endpoint,
-                        self.custom_model,
-                        self.custom_api_key,
-                    )
-                elif self.openai_api_key:
-                    self.filename = get_recommended_filename_from_pil_image(self.scanned_image, self.openai_api_key)
-                elif self.gemini_api_key:
-                    self.filename = get_recommended_filename_from_pil_image_gemini(self.scanned_image, self.gemini_api_key)
-                else:
-                    self.filename = ""
-                # Show filename input frame
+            # Show filename input frame
+            self.filename = ""
+            self.filename_frame.pack(side='left', padx=(10, 0))
+            self.filename_var.set("")  # Clear previous filename
+            self.filename_entry.focus()  # Set focus to filename entry
+            # the page stays in memory, it is only written out when saved or uploaded
+            self.scanned_image_path = None
+            self.upload_document = self.document
+            # change text
+            self.upload_button.config(text="Upload to Paperless")
+            self.request_filename(self.document, "Document scanned successfully! Enter filename to save.")
+        else:
+            self.status_label.config(text="Scan cancelled or failed")
+            messagebox.showinfo("Scan Cancelled", "Scan was cancelled or failed")
+
+    def on_scan_error(self, error):
+        self.status_label.config(text=f"Scan error: {str(error)}")
+        messagebox.showerror("Scan Error", f"Error during scanning: {str(error)}")
+
+    def request_filename(self, document, done_text):
+        """Get a filename suggestion from the AI provider without blocking the window"""
+        if not self.ai_configured():
+            self.status_label.config(text=done_text)
+            return
+        placeholder = self.filename_var.get()
+        
+        def on_success(filename):
+            self.hide_skip_ai()
+            # don't overwrite what the user typed in the meantime
+            if filename and self.filename_var.get() in ("", placeholder):
+                self.filename = filename
+                self.filename_var.set(filename)
+            self.status_label.config(text=done_text)
+        
+        def on_error(error):
+            self.hide_skip_ai()
+            self.status_label.config(text=f"AI suggestion failed: {str(error)}")
+        
+        def on_timeout():
+            self.hide_skip_ai()
+            self.status_label.config(text="AI suggestion timed out. Enter filename to save.")
+        
+        self.status_label.config(text="Getting filename suggestion...")
+        self.skip_ai_button.pack(side='left', padx=(10, 0))
+        self.ai_task = self.ai_tasks.submit(self.recommend_filename, document, on_success=on_success,
+                                            on_error=on_error, timeout=self.ai_timeout, on_timeout=on_timeout)
+
+    def ai_configured(self):
+        return bool(self.ai_provider())
+
+    def ai_provider(self):
+        """Name of the SDK recommend_filename will use ('openai' also covers custom endpoints), or None"""
+        if (self.custom_endpoint and self.custom_model) or self.openai_api_key:
+            return 'openai'
+        if self.gemini_api_key:
+            return 'gemini'
+        return None
+
+    def preload_ai_provider(self):
+        if not self.ai_preload:
+            return
+        if self.ai_hedge_budget:
+            preload_providers({candidate.sdk for candidate in self.ai_candidates()})
+        elif self.ai_provider():
+            preload_providers([self.ai_provider()])
+
+    def cancel_ai(self):
+        if self.ai_task is not None:
+            self.ai_task.cancel()
+            self.ai_task = None
+        self.hide_skip_ai()
+
+    def skip_ai(self):
+        """Stop waiting for the AI filename suggestion"""
+        self.cancel_ai()
+        self.status_label.config(text="AI suggestion skipped. Enter filename to save.")
+
+    def hide_skip_ai(self):
+        self.skip_ai_button.pack_forget()
+    
+    def recommend_filename(self, document):
+        """
+        Ask the configured AI provider for a filename, empty string if none is configured.
+        With ai_hedge_budget the other providers and faster models are asked too
+        when the first one is slow (see lib.ai_hedge).
+        """
+        candidates = self.ai_candidates()
+        if not candidates:
+            return ""
+        if self.ai_hedge_budget and len(candidates) > 1:
+            return first_valid_suggestion(document, candidates, self.ai_hedge_budget, self.ai_stats, timeout=self.ai_timeout)
+        return candidates[0].fetch(document, None)
+
+    def ai_candidates(self):
+        """
+        Every configured way of getting a filename, as lib.ai_hedge.Candidate:
+        the provider used without hedging first (custom endpoint, then OpenAI,
+        then Gemini), then the other configured providers, then their faster
+        ai_hedge_models.
+        """
+        def custom(document, cancel):
+            return get_recommended_filename_from_pil_image_custom(
+                document,
+                self.custom_endpoint,
+                self.custom_model,
+                self.custom_api_key,
+                cancel=cancel,
+            )
+
+        def openai(model):
+            return Candidate(f'openai:{model}', 'openai',
+                             lambda document, cancel: get_recommended_filename_from_pil_image(document, self.openai_api_key, model, cancel=cancel))
+
+        def gemini(model):
+            return Candidate(f'gemini:{model}', 'gemini',
+                             lambda document, cancel: get_recommended_filename_from_pil_image_gemini(document, self.gemini_api_key, model, cancel=cancel))
+
+        candidates, faster = [], []
+        if self.custom_endpoint and self.custom_model:
+            candidates.append(Candidate(f'custom:{self.custom_model}', 'openai', custom))
+        if self.openai_api_key:
+            candidates.append(openai(self.openai_model))
+            faster += [openai(model) for model in self.ai_hedge_models.get('openai', ()) if model != self.openai_model]
+        if self.gemini_api_key:
+            candidates.append(gemini(self.gemini_model))
+            faster += [gemini(model) for model in self.ai_hedge_models.get('gemini', ()) if model != self.gemini_model]
+        return candidates + faster
+
+    def batch_scan_document(self):
+        """Scan every page in the document feeder into one multi-page PDF"""
+        if self.scan_task is not None and self.scan_task.pending:
+            self.status_label.config(text="Already scanning...")
+            return
+        first_page = None
+        blank_pages = 0
+
+        def on_blank(page):
+            # runs on the scan thread
+            nonlocal blank_pages
+            blank_pages += 1
+
+        def on_page(page_number, page):
+            # runs on the scan thread
+            nonlocal first_page
+            if first_page is None:
+                # keep only the first page around, for the preview and AI filename
+                first_page = Document(page.copy()).store_in(self.page_store)
+            self.tasks.call_in_ui(self.status_label.config, {"text": f"Scanned page {page_number}..."})
+
+        def on_complete(pages):
+            if pages:
+                self.document = first_page
+                self.upload_document = None
+                self.display_image_object(first_page)
+                self.filename = datetime.datetime.now().strftime("batch_%Y%m%d_%H%M%S")
                 self.filename_frame.pack(side='left', padx=(10, 0))
-                self.filename_var.set(self.filename or "")  # Clear previous filename
-                self.filename_entry.focus()  # Set focus to filename entry
-                self.scanned_image_path = 'tmp.jpg'
-                self.status_label.config(text="Document scanned successfully! Enter filename to save.")
-                # change text
+                self.filename_var.set(self.filename)
+                self.filename_entry.focus()
+                self.scanned_image_path = pdf_path
                 self.upload_button.config(text="Upload to Paperless")
+                skipped = f", left out {blank_pages} blank page(s)" if blank_pages else ""
+                self.request_filename(self.document, f"Scanned {pages} page(s) into one PDF{skipped}. Enter filename to save.")
             else:
-                self.status_label.config(text="Scan cancelled or failed")
-                messagebox.showinfo("Scan Cancelled", "Scan was cancelled or failed")
-                
+                self.cleanup()
+                self.status_label.config(text="No pages scanned")
+                if blank_pages:
+                    messagebox.showinfo("Batch Scan", f"All {blank_pages} page(s) from the document feeder were blank")
+                else:
+                    messagebox.showinfo("Batch Scan", "No pages were fed from the document feeder")
+
+        def on_error(error):
+            self.cleanup()
+            self.status_label.config(text=f"Scan error: {str(error)}")
+            messagebox.showerror("Scan Error", f"Error during batch scanning: {str(error)}")
+
+        try:
+            self.status_label.config(text="Scanning from document feeder...")
+            self.cancel_ai()
+            self.cleanup()
+            fd, pdf_path = tempfile.mkstemp(suffix='.pdf', prefix='paperless-batch-')
+            os.close(fd)
+            self.batch_pdf_path = pdf_path
+            self.scan_task = self.tasks.submit(scan_batch, pdf_path, self.selected_scanner(), on_page=on_page,
+                                               skip_blank=self.skip_blank_pages, blank_threshold=self.blank_page_threshold,
+                                               on_blank=on_blank, cleanup=self.page_cleanup, cleanup_workers=self.cleanup_workers,
+                                               compact=self.auto_page_format, encode_workers=self.encode_workers,
+                                               on_success=on_complete, on_error=on_error)
         except Exception as e:
-            self.status_label.config(text=f"Scan error: {str(e)}")
-            messagebox.showerror("Scan Error", f"Error during scanning: {str(e)}")
-    
+            on_error(e)
+
     def save_scanned_image(self):
         """Save the scanned image with the specified filename"""
-        if self.scanned_image is None:
+        if self.document is None:
             messagebox.showerror("Save Error", "No scanned image to save")
             return
             
@@ -332,27 +700,57 @@ class PaperlessScanApp:
             messagebox.showwarning("Filename Required", "Please enter a filename")
             return
         
-        # Add .jpg extension if not provided
-        if not filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff')):
-            filename += '.jpg'
+        is_batch = self.batch_pdf_path is not None and self.scanned_image_path == self.batch_pdf_path
+        # Add .pdf (batch) or an image extension if not provided: the compact
+        # format for the page's content, or .jpg
+        compact = False
+        if is_batch:
+            if not filename.lower().endswith('.pdf'):
+                filename += '.pdf'
+        elif not filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')):
+            compact = self.auto_page_format
+            filename += self.document.compact_extension() if compact else self.plain_format(self.document)[1]
         
+        def on_saved(_):
+            self.status_label.config(text=f"Document saved as '{filename}'")
+            messagebox.showinfo("Save Success", f"Document saved as '{filename}'")
+
+        def on_error(error):
+            self.status_label.config(text=f"Save error: {str(error)}")
+            messagebox.showerror("Save Error", f"Error saving document: {str(error)}")
+
         try:
-            # Save the image
+            # the typed filename wins over a suggestion that is still on its way
+            self.cancel_ai()
             self.filename = filename
             
             # Hide filename frame
             self.filename_frame.pack_forget()
                         
-            self.status_label.config(text=f"Document saved as '{filename}'")
-            self.scanned_image.save(filename)
-            messagebox.showinfo("Save Success", f"Document saved as '{filename}'")
+            self.status_label.config(text=f"Saving '{filename}'...")
+            # Save the image (encoding a large scan takes a while, keep it off the UI thread)
+            if is_batch:
+                self.tasks.submit(shutil.copyfile, self.batch_pdf_path, filename, on_success=on_saved, on_error=on_error)
+            else:
+                self.tasks.submit(self.document.save, filename, compact=compact, on_success=on_saved, on_error=on_error)
             
         except Exception as e:
-            self.status_label.config(text=f"Save error: {str(e)}")
-            messagebox.showerror("Save Error", f"Error saving document: {str(e)}")
+            on_error(e)
     
     def display_image_object(self, pil_image):
-        """Display a PIL Image object in the app"""
+        """Display a PIL Image (or a Document, previewed from its reduced view) in the app"""
+        try:
+            self.preview = PreviewRenderer(pil_image, factory=ImageTk.PhotoImage)
+            self.preview_box = None
+            self.refresh_preview()
+        except Exception as e:
+            self.status_label.config(text=f"Error displaying image: {str(e)}")
+    
+    def refresh_preview(self):
+        """Render the current preview to fit the image frame"""
+        self._resize_job = None
+        if self.preview is None:
+            return
         try:
             # Get frame dimensions
             frame_width = self.image_frame.winfo_width() - 20
@@ -363,18 +761,11 @@ class PaperlessScanApp:
                 frame_width = 1000
                 frame_height = 900
             
-            # Calculate resize ratio to fit in frame
-            img_width, img_height = pil_image.size
-            ratio = min(frame_width / img_width, frame_height / img_height)
-            
-            new_width = int(img_width * ratio)
-            new_height = int(img_height * ratio)
-            
-            # Resize image
-            resized_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Convert to PhotoImage
-            self.photo_image = ImageTk.PhotoImage(resized_image)
+            box = (frame_width, frame_height)
+            if box == self.preview_box:
+                return
+            self.preview_box = box
+            self.photo_image = self.preview.render(box)
             
             # Update label
             self.image_label.config(image=self.photo_image, text="")
@@ -382,18 +773,44 @@ class PaperlessScanApp:
         except Exception as e:
             self.status_label.config(text=f"Error displaying image: {str(e)}")
     
+    def on_preview_resize(self, _event=None):
+        """Re-render the preview once the window has stopped resizing"""
+        if self.preview is None:
+            return
+        if self._resize_job is not None:
+            self.root.after_cancel(self._resize_job)
+        self._resize_job = self.root.after(150, self.refresh_preview)
+    
     def display_image(self, image_path):
         """Display the scanned image from file path in the app"""
         try:
-            # Load and resize image
-            image = Image.open(image_path)
+            # Decode at (roughly) screen resolution, the preview never needs more
+            image = open_for_preview(image_path)
             self.display_image_object(image)
             
         except Exception as e:
             self.status_label.config(text=f"Error displaying image: {str(e)}")
     
     def upload_to_paperless(self):
-        """Upload the scanned document to Paperless-ngx"""
+        """Queue the scanned (or selected) document for upload to Paperless-ngx"""
+        if self.upload_document is not None:
+            document, self.upload_document = self.upload_document, None
+            filename = self.filename
+            self.upload_button.config(text="Select Document")
+            self.status_label.config(text="Preparing upload...")
+            
+            def on_staged(path):
+                job = self.enqueue_upload(path, filename, remove_after=True)
+                self._owned_uploads[job.id] = document
+            
+            def on_error(error):
+                self.restore_upload(document)
+                self.on_upload_error(error)
+            
+            # the encoding is shared with Save, so this is usually just a write
+            self.tasks.submit(document.write_temp, None if self.auto_page_format else self.plain_format(document)[0],
+                              on_success=on_staged, on_error=on_error)
+            return
         if not self.scanned_image_path or not os.path.exists(self.scanned_image_path):
             file_path = filedialog.askopenfilename(title="Select Document to Upload", 
                                                         filetypes=[("All Files", "*.*")])
@@ -401,22 +818,136 @@ class PaperlessScanApp:
                 return
             self.scanned_image_path = file_path
         try:
-            self.status_label.config(text="Uploading to Paperless...")
-            self.root.update()
-             
-            # Upload the document with filename
-            success, status_code, response = upload_to_paperlessngx(self.scanned_image_path, self.api_url, self.api_token, self.filename)
-            if success:
-                self.status_label.config(text="Document uploaded successfully!")
-                messagebox.showinfo("Upload Success", "Document uploaded to Paperless-ngx!")
-            else:
-                self.status_label.config(text="Upload failed")
-                messagebox.showerror("Upload Error", f"Error uploading document: {response}")
-                print(f"Upload failed: {status_code} {response}")
+            file_path = self.scanned_image_path
+            remove_after = False
+            if file_path == self.batch_pdf_path:
+                # the batch PDF is already a private temp file, hand it over to the queue
+                self.batch_pdf_path = None
+                remove_after = True
+            
+            self.scanned_image_path = None
+            job = self.enqueue_upload(file_path, self.filename, remove_after=remove_after)
+            if remove_after:
+                self._owned_uploads[job.id] = None
             
         except Exception as e:
-            self.status_label.config(text=f"Upload error: {str(e)}")
-            messagebox.showerror("Upload Error", f"Error uploading document: {str(e)}")
+            self.on_upload_error(e)
+
+    def plain_format(self, document):
+        """
+        (PIL format, extension) a single page is saved and uploaded in when
+        auto_page_format is off: JPEG, but lossless PNG for black-and-white
+        pages and cleaned-up grayscale ones, which JPEG would blur and blow up
+        """
+        if document.mode == '1' or (document.mode == 'L' and self.page_cleanup is not None):
+            return 'PNG', '.png'
+        return 'JPEG', '.jpg'
+
+    def enqueue_upload(self, file_path, filename, remove_after=False):
+        """Hand a file to the upload queue; remove_after gives the queue ownership of it"""
+        job = self.upload_queue.submit(file_path, self.api_url, self.api_token, filename, remove_after=remove_after)
+        self.upload_button.config(text="Select Document")
+        self.status_label.config(text=f"Queued '{job.name}' for upload")
+        self.refresh_upload_list()
+        return job
+
+    def on_upload_error(self, error):
+        self.status_label.config(text=f"Upload error: {str(error)}")
+        messagebox.showerror("Upload Error", f"Error uploading document: {str(error)}")
+
+    def cancel_selected_uploads(self):
+        """Cancel the selected uploads that have not started yet"""
+        for item in self.upload_tree.selection():
+            if not self.upload_queue.cancel(int(item)):
+                self.status_label.config(text="Only uploads that have not started can be cancelled")
+        self.refresh_upload_list()
+
+    def refresh_upload_list(self):
+        """Sync the upload list and queue depth with the upload queue"""
+        for job in self.upload_queue.jobs():
+            item = str(job.id)
+            consume = self._consume_tasks.get(job.id)
+            status = consume.summary if consume is not None else job.status
+            values = (job.name, status, f"{int(job.progress * 100)}%")
+            if self.upload_tree.exists(item):
+                self.upload_tree.item(item, values=values)
+            else:
+                self.upload_tree.insert('', 'end', iid=item, values=values)
+            
+            if job.status in (DONE, FAILED, DUPLICATE) and job.id not in self._reported_jobs:
+                self._reported_jobs.add(job.id)
+                if job.status == DUPLICATE:
+                    self.status_label.config(text=f"'{job.name}' is already in Paperless, upload skipped")
+                elif job.status == DONE:
+                    self.status_label.config(text=f"'{job.name}' uploaded successfully!")
+                    if job.task_id:
+                        self._consume_tasks[job.id] = self.task_tracker.track(job.api_url, job.api_token, job.task_id, job.name)
+                else:
+                    self.status_label.config(text=f"Upload of '{job.name}' failed: {job.error}")
+                    print(f"Upload failed: {job.error}")
+                    self.restore_failed_upload(job)
+                self._owned_uploads.pop(job.id, None)
+            if consume is not None and consume.finished and job.id not in self._reported_consumes:
+                self._reported_consumes.add(job.id)
+                self.report_consume_result(consume)
+        self.queue_label.config(text=f"Queue: {self.upload_queue.depth()}")
+        
+        # progress bar follows the bytes sent by the running uploads
+        uploading = [job for job in self.upload_queue.jobs() if job.status == UPLOADING]
+        if uploading:
+            self.upload_progress['value'] = 100 * sum(job.progress for job in uploading) / len(uploading)
+            if not self.upload_progress.winfo_manager():
+                self.upload_progress.pack(after=self.status_label, pady=(0, 5))
+        elif self.upload_progress.winfo_manager():
+            self.upload_progress.pack_forget()
+
+    def restore_failed_upload(self, job):
+        """Give a failed scan back to the Upload button; the queue keeps the file of a failed job"""
+        if job.id not in self._owned_uploads:
+            return
+        document = self._owned_uploads[job.id]
+        if not self.restore_upload(document, job.file_path):
+            # something newer is waiting for Upload (or being scanned), leave the file where it is
+            self.status_label.config(text=f"Upload of '{job.name}' failed: {job.error}. Kept at {job.file_path}")
+            return
+        if document is not None and os.path.exists(job.file_path):
+            # the page is staged again on the next Upload
+            try:
+                os.remove(job.file_path)
+            except OSError as e:
+                print(f"Could not remove staged upload {job.file_path}: {str(e)}")
+        self.status_label.config(text=f"Upload of '{job.name}' failed: {job.error}. Press Upload to try again")
+
+    def restore_upload(self, document, batch_pdf_path=None):
+        """Put a scan (a Document or a batch PDF) back behind the Upload button, unless a newer one is there"""
+        if self.upload_document is not None or self.scanned_image_path:
+            return False
+        if document is None and self.batch_pdf_path:
+            # a batch is being scanned
+            return False
+        if document is not None:
+            self.upload_document = document
+        else:
+            self.batch_pdf_path = self.scanned_image_path = batch_pdf_path
+        self.upload_button.config(text="Upload to Paperless")
+        return True
+
+    def report_consume_result(self, task):
+        """Tell the user what Paperless made of an uploaded document"""
+        if task.summary == 'consumed':
+            self.status_label.config(text=f"'{task.name}' consumed by Paperless (document {task.document_id})")
+        elif task.summary == 'unknown':
+            self.status_label.config(text=f"Paperless has not finished processing '{task.name}'")
+        else:
+            self.status_label.config(text=f"Paperless did not consume '{task.name}': {task.result}")
+            print(f"Consume failed for {task.name}: {task.result}")
+
+    def poll_uploads(self):
+        """Periodically refresh the upload list from the Tk thread"""
+        try:
+            self.refresh_upload_list()
+        finally:
+            self.root.after(200, self.poll_uploads)
 
     def load_config(self):
         # load the config file
@@ -431,19 +962,165 @@ class PaperlessScanApp:
                 self.custom_endpoint = config.get('custom_endpoint', None)
                 self.custom_model = config.get('custom_model', None)
                 self.custom_api_key = config.get('custom_api_key', None)
+                self.openai_model = config.get('openai_model') or OPENAI_MODEL
+                self.gemini_model = config.get('gemini_model') or GEMINI_MODEL
+                budget = config.get('ai_hedge_budget')
+                self.ai_hedge_budget = float(budget) if budget else None
+                self.ai_hedge_models = hedge_models(config.get('ai_hedge_models', HEDGE_MODELS))
+                self.upload_workers = int(config.get('upload_workers', 2))
+                self.ai_timeout = float(config.get('ai_timeout', 60))
+                # a request that outlives the suggestion would only keep an AI worker busy
+                set_request_timeout(self.ai_timeout)
+                self.ai_preload = bool(config.get('ai_preload', True))
+                self.skip_blank_pages = bool(config.get('skip_blank_pages', True))
+                threshold = config.get('blank_page_threshold')
+                self.blank_page_threshold = float(threshold) if threshold is not None else None
+                self.page_cleanup = page_cleanup_options(config.get('page_cleanup'))
+                workers = config.get('cleanup_workers')
+                self.cleanup_workers = int(workers) if workers else None
+                self.auto_page_format = bool(config.get('auto_page_format', True))
+                workers = config.get('encode_workers')
+                self.encode_workers = int(workers) if workers is not None else None
+                if config.get('scanner_backend'):
+                    self.configure_scanner_backend(config)
+                set_prepare_options(config.get('ai_image'))
+                self.configure_ai_cache(config)
+                self.configure_duplicate_check(config)
+                self.configure_page_store(config)
             return config
         else:
             return None
 
-def main():
-    # check if the temp file exists, and remove it if it does
-    if os.path.exists('tmp.jpg'):
-        os.remove('tmp.jpg')
+    def configure_scanner_backend(self, config):
+        """Use the scanner backend named in the config (e.g. the simulated scanner for load tests)"""
+        backend = config['scanner_backend']
+        options = (config.get('simulated_scanner') or {}) if backend == 'simulated' else {}
+        try:
+            set_backend(backend, **options)
+        except (ValueError, KeyError) as e:
+            print(f"Ignoring scanner_backend setting: {str(e)}")
+
+    def configure_ai_cache(self, config):
+        """(Re)open the AI suggestion cache when its settings change"""
+        settings = (
+            config.get('ai_cache_path', 'ai_cache.sqlite3'),
+            int(config.get('ai_cache_max_entries', 5000)),
+            float(config.get('ai_cache_ttl_days', 90)),
+        )
+        if settings != self.ai_cache_settings:
+            self.ai_cache_settings = settings
+            path, max_entries, ttl_days = settings
+            configure_cache(path or None, max_entries=max_entries, ttl=ttl_days * 24 * 3600)
+
+    def configure_duplicate_check(self, config):
+        """Check uploads against the checksums already in Paperless (skip_duplicates, on by default)"""
+        if not config.get('skip_duplicates', True):
+            self.duplicate_checker = None
+        elif self.duplicate_checker is None:
+            self.duplicate_checker = make_duplicate_checker(config)
+        if self.upload_queue is not None:
+            self.upload_queue.duplicates = self.duplicate_checker
+
+    def configure_page_store(self, config):
+        """RAM ceiling for scanned pages (page_store_max_mb); 0 keeps every page in memory"""
+        max_mb = config.get('page_store_max_mb', DEFAULT_MAX_MB)
+        if not max_mb:
+            self.page_store = None
+            return
+        if self.page_store is None:
+            self.page_store = PageStore()
+        self.page_store.max_bytes = int(float(max_mb) * MB)
+        self.page_store.trim()
+
+def make_duplicate_checker(config):
+    """DuplicateChecker with the checksum cache from the config (dedupe_cache_path, dedupe_cache_ttl_days)"""
+    path = config.get('dedupe_cache_path', 'dedupe_cache.sqlite3')
+    cache = ChecksumCache(path, ttl=float(config.get('dedupe_cache_ttl_days', 7)) * 24 * 3600) if path else None
+    return DuplicateChecker(cache)
+
+def hedge_models(setting):
+    """{provider: [model, ...]} from the ai_hedge_models setting, where a provider names one model or a list"""
+    return {provider: [models] if isinstance(models, str) else list(models or ())
+            for provider, models in (setting or {}).items()}
+
+def page_cleanup_options(setting):
+    """clean_page() options from the page_cleanup setting: off (default), true for every step, or a dict of steps"""
+    if not setting:
+        return None
+    if not isinstance(setting, dict):
+        return {}
+    # NumPy is only loaded when the clean-up is switched on
+    from lib.cleanup import DEFAULT_OPTIONS
+    unknown = set(setting) - set(DEFAULT_OPTIONS)
+    if unknown:
+        print(f"Ignoring unknown page_cleanup option(s): {', '.join(sorted(unknown))}")
+    return {step: bool(value) for step, value in setting.items() if step in DEFAULT_OPTIONS}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="paperless-scanner", description="Scan documents and upload them to Paperless-ngx")
+    subparsers = parser.add_subparsers(dest="command")
+    watch_parser = subparsers.add_parser("watch", help="upload every document dropped into a folder (headless, Linux only)")
+    watch_parser.add_argument("directory", help="folder to watch")
+    watch_parser.add_argument("--workers", type=int, default=4, help="number of concurrent uploads (default 4)")
+    watch_parser.add_argument("--done-dir", help="move uploaded files here instead of deleting them")
+    watch_parser.add_argument("--failed-dir", help="move files that failed to upload here")
+    watch_parser.add_argument("--settle", type=float, default=1.0, help="seconds a file must stay untouched before upload (default 1)")
+    parser.add_argument("--profile-startup", nargs="?", const="startup-profile.json", metavar="REPORT",
+                        help="write start-up phase timings as JSON (default startup-profile.json)")
+    parser.add_argument("--profile-startup-cprofile", metavar="FILE", help="also write a cProfile dump of start-up")
+    parser.add_argument("--exit-after-startup", action="store_true", help="quit as soon as the window has been shown")
+    return parser.parse_args(argv)
+
+def run_watch(args):
+    """Run the headless hot-folder watcher with the Paperless settings from config.yaml"""
+    from lib.watcher import watch
+    if not os.path.exists('config.yaml'):
+        print("config.yaml not found, run the app once to configure Paperless-ngx")
+        return 1
+    with open('config.yaml', 'r') as file:
+        config = yaml.safe_load(file) or {}
+    duplicates = make_duplicate_checker(config) if config.get('skip_duplicates', True) else None
+    try:
+        watch(args.directory, config['api_url'], config['api_token'], workers=args.workers,
+              done_dir=args.done_dir, failed_dir=args.failed_dir, settle=args.settle, duplicates=duplicates)
+    except OSError as e:
+        print(f"Stopped watching: {str(e)}")
+        return 1
+    return 0
+
+def finish_startup(root, args, profiler=None):
+    """Runs once the window has been drawn: write the start-up reports that were asked for"""
+    STARTUP.mark('first_window')
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile_startup_cprofile)
+        print(f"Start-up profile written to {args.profile_startup_cprofile}")
+    if args.profile_startup:
+        STARTUP.write(args.profile_startup)
+        print(f"Start-up timings written to {args.profile_startup}")
+    if args.exit_after_startup:
+        root.destroy()
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "watch":
+        return run_watch(args)
+
+    profiler = None
+    if args.profile_startup_cprofile:
+        # module imports happened before this point, see the JSON report for those
+        profiler = cProfile.Profile()
+        profiler.enable()
 
     root = tk.Tk()
+    STARTUP.mark('tk_init')
     # root.iconbitmap('docs/images/icon.ico')
-    app = PaperlessScanApp(root)
+    app = PaperlessScanApp(root, startup=STARTUP)
+    if args.profile_startup or profiler is not None or args.exit_after_startup:
+        root.after_idle(finish_startup, root, args, profiler)
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # the page clean-up pool starts worker processes, which a frozen build has to recognise
+    multiprocessing.freeze_support()
+    sys.exit(main())
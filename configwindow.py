@@ -2,6 +2,10 @@ import tkinter as tk
 from tkinter import messagebox, ttk
 import os
 import yaml
+from lib.ai import invalidate_clients
+
+# settings that AI provider clients are built from
+AI_CREDENTIAL_KEYS = ('openai_api_key', 'gemini_api_key', 'custom_endpoint', 'custom_api_key')
 
 class ConfigWindow:
     def __init__(self, parent):
@@ -70,6 +74,11 @@ class ConfigWindow:
                                self.config.get('api_token', ''), 
                                "Paperless-ngx API Token", is_password=True)
         
+        # Upload workers
+        self.create_config_entry(paperless_frame, "upload_workers", "Upload Workers:",
+                               self.config.get('upload_workers', 2),
+                               "Number of documents uploaded at the same time (takes effect after restart)")
+        
         # AI Configuration Section
         ai_frame = tk.LabelFrame(
             scrollable_frame,
@@ -196,6 +205,13 @@ class ConfigWindow:
                                "Leave blank if your endpoint does not require authentication",
                                is_password=True)
 
+        # AI timeout applies to every provider, keep it below the provider fields
+        timeout_frame = tk.Frame(ai_frame, bg='#f0f0f0')
+        timeout_frame.pack(side='bottom', fill='x', pady=5)
+        self.create_config_entry(timeout_frame, "ai_timeout", "AI Timeout (seconds):",
+                               self.config.get('ai_timeout', 60),
+                               "Stop waiting for a filename suggestion after this many seconds")
+
         # Info label
         info_label = tk.Label(
             scrollable_frame,
@@ -370,15 +386,17 @@ class ConfigWindow:
     def save_config(self):
         """Save configuration to file"""
         try:
-            # Collect values from entries
-            config = {}
+            # Keep settings that have no field in this window, then
+            # collect values from entries
+            config = {k: v for k, v in self.config.items() if k not in self.entries}
             for key, entry in self.entries.items():
                 value = entry.get().strip()
                 if value:  # Only save non-empty values
                     config[key] = value
             
             # Handle AI provider toggle logic — only persist keys for the
-            # currently-selected provider so we don't leak credentials.
+            # currently-selected provider so we don't leak credentials
+            # (unless hedging, which asks the other configured providers too).
             provider = self.ai_provider.get()
             custom_keys = ('custom_endpoint', 'custom_model', 'custom_api_key')
             other_keys = {
@@ -387,9 +405,29 @@ class ConfigWindow:
                 'custom': ('openai_api_key', 'gemini_api_key'),
                 'none':   ('openai_api_key', 'gemini_api_key') + custom_keys,
             }.get(provider, ())
+            if config.get('ai_hedge_budget') and provider != 'none':
+                other_keys = ()
             for k in other_keys:
                 config.pop(k, None)
 
+            if 'upload_workers' in config:
+                try:
+                    config['upload_workers'] = int(config['upload_workers'])
+                    if config['upload_workers'] < 1:
+                        raise ValueError
+                except ValueError:
+                    messagebox.showerror("Save Error", "Upload Workers must be a positive whole number.")
+                    return
+
+            if 'ai_timeout' in config:
+                try:
+                    config['ai_timeout'] = float(config['ai_timeout'])
+                    if config['ai_timeout'] <= 0:
+                        raise ValueError
+                except ValueError:
+                    messagebox.showerror("Save Error", "AI Timeout must be a positive number of seconds.")
+                    return
+
             if provider == 'custom':
                 if not config.get('custom_endpoint') or not config.get('custom_model'):
                     messagebox.showerror(
@@ -402,6 +440,10 @@ class ConfigWindow:
             with open('config.yaml', 'w') as file:
                 yaml.dump(config, file, default_flow_style=False)
             
+            # cached AI clients hold the old credentials
+            if any(self.config.get(k) != config.get(k) for k in AI_CREDENTIAL_KEYS):
+                invalidate_clients()
+            
             messagebox.showinfo("Success", "Configuration saved successfully!")
             
             # Update parent app's config
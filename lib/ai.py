@@ -1,11 +1,141 @@
 """open ai api wrapper for filename recommendation"""
-# pylint: disable=E1101, C0301, W0311, C0303, W0718
+# pylint: disable=E1101, C0301, W0311, C0303, W0718, C0415
 import base64
+import importlib
 import io
-import openai
-from google import genai
-from google.genai import types
+import threading
+import time
 from PIL import Image
+from lib.ai_cache import SuggestionCache, DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+from lib.document import Document
+
+OPENAI_MODEL = "gpt-4o-mini"
+GEMINI_MODEL = "gemini-2.5-pro"
+# faster models asked as well when hedging (lib.ai_hedge) and the configured one is slow
+HEDGE_MODELS = {'gemini': ('gemini-2.5-flash',)}
+SYSTEM_PROMPT = "You are a helpful assistant that analyzes documents and suggests appropriate filenames. Generate a concise, descriptive filename (without extension) based on the document content. Focus on the main subject, document type, and key identifiers. Use underscores instead of spaces and keep it under 50 characters."
+USER_PROMPT = "Analyze this document and suggest a filename (without extension) that describes its content. Return only the filename, nothing else."
+GEMINI_PROMPT = "Analyze this document and suggest a filename (without extension) that describes its content. Return only the filename, nothing else. Use underscores instead of spaces and keep it under 25 characters."
+
+# Provider SDKs are slow to import (about half a second each) and only one
+# provider is used at a time, so they are imported on first use.
+PROVIDER_MODULES = {
+    'openai': ('openai',),
+    'gemini': ('google.genai', 'google.genai.types'),
+}
+
+def preload_providers(providers):
+    """
+    Import the SDKs for the given providers on a background thread, so the
+    first request does not pay for the import.
+
+    Args:
+        providers (iterable): Names from PROVIDER_MODULES ('openai' also covers custom endpoints)
+
+    Returns:
+        threading.Thread: The started thread, or None if there was nothing to import
+    """
+    modules = [m for provider in providers for m in PROVIDER_MODULES.get(provider, ())]
+    if not modules:
+        return None
+
+    def run():
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                print(f"Could not preload {module}: {str(e)}")
+
+    thread = threading.Thread(target=run, name="provider-preload", daemon=True)
+    thread.start()
+    return thread
+
+# Provider clients, built once per (provider, endpoint, key) and kept for the
+# life of the process so their connection pools and TLS sessions are reused.
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Seconds one provider request may take. Without it the OpenAI SDK waits up to
+# 10 minutes (and retries twice), keeping a worker thread busy long after the
+# app has stopped waiting for the suggestion.
+DEFAULT_REQUEST_TIMEOUT = 60.0
+# retries after a failed or timed out request
+MAX_RETRIES = 1
+_request_timeout = DEFAULT_REQUEST_TIMEOUT
+
+def set_request_timeout(seconds):
+    """Set the timeout of each provider request (None for the default); clients built with another one are dropped"""
+    global _request_timeout
+    seconds = float(seconds) if seconds else DEFAULT_REQUEST_TIMEOUT
+    if seconds != _request_timeout:
+        _request_timeout = seconds
+        invalidate_clients()
+
+def get_openai_client(api_key, base_url=None):
+    """Return the shared OpenAI (or OpenAI-compatible) client for this endpoint and key"""
+    import openai
+    key = ('openai', base_url, api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client_kwargs = {"api_key": api_key or "not-needed", "timeout": _request_timeout, "max_retries": MAX_RETRIES}
+            if base_url:
+                client_kwargs["base_url"] = base_url
+            client = _clients[key] = openai.OpenAI(**client_kwargs)
+        return client
+
+def get_gemini_client(api_key):
+    """Return the shared Gemini client for this key"""
+    from google import genai
+    from google.genai import types
+    key = ('gemini', None, api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # the genai SDK takes its timeout in milliseconds
+            client = _clients[key] = genai.Client(api_key=api_key, http_options=types.HttpOptions(timeout=int(_request_timeout * 1000)))
+        return client
+
+def invalidate_clients():
+    """
+    Forget every cached provider client, e.g. after the credentials changed.
+    Requests already running keep their client until they finish.
+    """
+    with _clients_lock:
+        _clients.clear()
+
+# suggestion cache, off until configure_cache() is called
+_cache = None
+
+def configure_cache(path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+    """Enable the on-disk suggestion cache (path=None disables it)"""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = SuggestionCache(path, max_entries=max_entries, ttl=ttl) if path else None
+    return _cache
+
+def cache_stats():
+    """Hit/miss counters of the suggestion cache, None when it is disabled"""
+    return _cache.stats() if _cache is not None else None
+
+def cached_suggestion(image_bytes, provider, model, prompt, fetch):
+    """
+    Return the cached suggestion for this image/provider/model/prompt, or
+    call fetch() and cache its (non-empty) result.
+    """
+    cache = _cache
+    if cache is None:
+        return fetch()
+    key = cache.make_key(image_bytes, provider, model, prompt)
+    filename = cache.get(key)
+    if filename is not None:
+        return filename
+    start = time.perf_counter()
+    filename = fetch()
+    if filename:
+        cache.put(key, filename, time.perf_counter() - start)
+    return filename
 
 ## pretty much for debugging
 def get_recommended_filename(file_path, apikey):
@@ -30,7 +160,11 @@ def get_recommended_filename(file_path, apikey):
         print(f"Error getting recommended filename: {str(e)}")
         return None
 
-def apirequest(api_key, file_content, base_url=None, model="gpt-4o-mini"):
+def image_data_url(img_bytes):
+    """Return JPEG bytes as the base64 data URL chat completions take for images"""
+    return "data:image/jpeg;base64," + base64.b64encode(img_bytes).decode('ascii')
+
+def apirequest(api_key, file_content, base_url=None, model=OPENAI_MODEL, cancel=None):
     """
     Make API request to an OpenAI-compatible chat completions endpoint
     for filename recommendation.
@@ -43,31 +177,31 @@ def apirequest(api_key, file_content, base_url=None, model="gpt-4o-mini"):
             at a self-hosted OpenAI-compatible endpoint (e.g. Ollama's
             "http://localhost:11434/v1"). When None, uses OpenAI's default.
         model (str): Model name to request.
+        cancel (threading.Event, optional): Set when the answer is no longer
+            wanted (see lib.ai_hedge); the answer is then streamed, so the
+            request stops reading and its connection is closed once it is set.
 
     Returns:
         str: Recommended filename or None if failed
     """
-    client_kwargs = {"api_key": api_key or "not-needed"}
-    if base_url:
-        client_kwargs["base_url"] = base_url
-    response = openai.OpenAI(**client_kwargs).chat.completions.create(
+    request = dict(
             model=model,
             messages=[
                 {
                     "role": "system",
-                    "content": "You are a helpful assistant that analyzes documents and suggests appropriate filenames. Generate a concise, descriptive filename (without extension) based on the document content. Focus on the main subject, document type, and key identifiers. Use underscores instead of spaces and keep it under 50 characters."
+                    "content": SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
                     "content": [
                         {
                             "type": "text",
-                            "text": "Analyze this document and suggest a filename (without extension) that describes its content. Return only the filename, nothing else."
+                            "text": USER_PROMPT
                         },
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64.b64encode(file_content).decode('utf-8')}"
+                                "url": image_data_url(file_content)
                             }
                         }
                     ]
@@ -76,9 +210,21 @@ def apirequest(api_key, file_content, base_url=None, model="gpt-4o-mini"):
             max_tokens=50,
             temperature=0.3
         )
-
-    # Extract the recommended filename
-    recommended_filename = response.choices[0].message.content.strip()
+    client = get_openai_client(api_key, base_url)
+    if cancel is None:
+        response = client.chat.completions.create(**request)
+        # Extract the recommended filename
+        recommended_filename = response.choices[0].message.content.strip()
+    else:
+        parts = []
+        # leaving the block closes the response, and with it the connection
+        with client.chat.completions.create(**request, stream=True) as stream:
+            for chunk in stream:
+                if cancel.is_set():
+                    return None
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+        recommended_filename = "".join(parts).strip()
 
     # Clean up the filename (remove quotes, extra spaces, etc.)
     recommended_filename = recommended_filename.replace('"', '').replace("'", "").strip()
@@ -92,99 +238,222 @@ def apirequest(api_key, file_content, base_url=None, model="gpt-4o-mini"):
         return recommended_filename
     return None
 
-def get_recommended_filename_from_pil_image(pil_image, api_key):
+def get_recommended_filename_from_pil_image(pil_image, api_key, model=OPENAI_MODEL, cancel=None):
     """
     Get a recommended filename from a PIL Image object.
     
     Args:
-        pil_image (PIL.Image): PIL Image object to analyze
+        pil_image (PIL.Image or Document): PIL Image object to analyze
         api_key (str): OpenAI API key
-        max_tokens (int): Maximum tokens for the response
+        model (str): OpenAI model to ask
+        cancel (threading.Event, optional): Stops the request once set (see apirequest)
         
     Returns:
         str: Recommended filename (without extension) or None if failed
     """
     try:
         # Convert PIL image to bytes
-        img_byte_arr = PIL_to_bytes(pil_image)
+        img_byte_arr = prepare_image_bytes(pil_image, 'openai')
         
-        # Create the API request
-        response = apirequest(api_key, img_byte_arr)
+        # Create the API request (unless this exact image was seen before)
+        response = cached_suggestion(img_byte_arr, 'openai', model, SYSTEM_PROMPT + USER_PROMPT,
+                                     lambda: apirequest(api_key, img_byte_arr, model=model, cancel=cancel))
         return response
             
     except Exception as e:
         print(f"Error getting recommended filename from PIL image: {str(e)}")
         return ""
 
-def get_recommended_filename_from_pil_image_custom(pil_image, endpoint, model, api_key=None):
+def get_recommended_filename_from_pil_image_custom(pil_image, endpoint, model, api_key=None, cancel=None):
     """
     Get a recommended filename from a PIL Image using a self-hosted,
     OpenAI-compatible endpoint (e.g. Ollama at http://localhost:11434/v1).
 
     Args:
-        pil_image (PIL.Image): PIL Image object to analyze
+        pil_image (PIL.Image or Document): PIL Image object to analyze
         endpoint (str): Base URL of the OpenAI-compatible API.
             For Ollama, use "http://<host>:11434/v1".
         model (str): Model name to use (e.g. "llava", "llama3.2-vision",
             "moondream", "bakllava").
         api_key (str, optional): API key, if the endpoint requires one.
+        cancel (threading.Event, optional): Stops the request once set (see apirequest)
 
     Returns:
         str: Recommended filename (without extension) or empty string if failed
     """
     try:
-        img_byte_arr = PIL_to_bytes(pil_image)
-        return apirequest(api_key, img_byte_arr, base_url=endpoint, model=model)
+        img_byte_arr = prepare_image_bytes(pil_image, 'custom')
+        return cached_suggestion(img_byte_arr, f'custom:{endpoint}', model, SYSTEM_PROMPT + USER_PROMPT,
+                                 lambda: apirequest(api_key, img_byte_arr, base_url=endpoint, model=model, cancel=cancel))
     except Exception as e:
         print(f"Error getting recommended filename from custom endpoint: {str(e)}")
         return ""
 
-def PIL_to_bytes(pil_image):
+def PIL_to_bytes(pil_image, quality=75):
     """
     Convert a PIL Image object to bytes.
     """
+    if pil_image.mode not in ('RGB', 'L'):
+        pil_image = pil_image.convert('RGB')
     img_byte_arr = io.BytesIO()
-    pil_image.save(img_byte_arr, format='JPEG')
+    pil_image.save(img_byte_arr, format='JPEG', quality=quality)
     return img_byte_arr.getvalue()
 
-def get_recommended_filename_from_pil_image_gemini(pil_image, api_key):
+# How each provider's images are prepared before they are sent. Vision models
+# downscale large images on their side anyway, so sending a full 600 dpi scan
+# only costs upload time and tokens.
+#   max_edge:  longest side in pixels (None keeps the scan size)
+#   grayscale: drop color
+#   quality:   JPEG quality
+#   crop_top:  keep only this fraction of the page from the top (None keeps all of it)
+PREPARE_DEFAULTS = {
+    # gpt-4o-mini scales "high detail" images to fit 2048px, then to 768px on the short side
+    'openai': {'max_edge': 1024, 'grayscale': True, 'quality': 70, 'crop_top': None},
+    # Gemini tiles images into 768px blocks
+    'gemini': {'max_edge': 1536, 'grayscale': True, 'quality': 75, 'crop_top': None},
+    # local models (llava, moondream...) work on 336-672px inputs
+    'custom': {'max_edge': 1024, 'grayscale': True, 'quality': 70, 'crop_top': None},
+}
+
+def set_prepare_options(overrides):
+    """
+    Override the image preparation defaults, e.g. from the ai_image section
+    of config.yaml: {'openai': {'max_edge': 1536}, 'custom': {'grayscale': False}}
+    """
+    for provider, options in (overrides or {}).items():
+        if provider in PREPARE_DEFAULTS and isinstance(options, dict):
+            PREPARE_DEFAULTS[provider].update(
+                {k: v for k, v in options.items() if k in PREPARE_DEFAULTS[provider]})
+
+def prepare_image(pil_image, max_edge=None, grayscale=False, crop_top=None):
+    """
+    Shrink a scan to what a vision model needs to read it.
+
+    Args:
+        pil_image (PIL.Image): Scanned page
+        max_edge (int, optional): Longest side of the result in pixels
+        grayscale (bool): Convert to grayscale
+        crop_top (float, optional): Fraction (0-1] of the page to keep, from the top
+
+    Returns:
+        PIL.Image: Prepared image (the original is not modified)
+    """
+    image = pil_image
+    if crop_top and 0 < crop_top < 1:
+        image = image.crop((0, 0, image.width, max(1, int(image.height * crop_top))))
+    resize_to = None
+    if max_edge and max(image.size) > max_edge:
+        scale = max_edge / max(image.size)
+        resize_to = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        # box-average by a whole factor first; it is several times cheaper than
+        # resampling the full-resolution scan
+        factor = max(image.size) // max_edge
+        if factor >= 2:
+            image = image.reduce(factor)
+    # convert after shrinking so there are fewer pixels to convert
+    if grayscale and image.mode != 'L':
+        image = image.convert('L')
+    if resize_to and image.size != resize_to:
+        image = image.resize(resize_to, Image.Resampling.LANCZOS)
+    return image
+
+def _prepare_source(document, settings):
+    """
+    What prepare_image() needs of a Document: the page already reduced by
+    the whole factor prepare_image() would reduce it by, so a spilled page
+    is read a band at a time rather than loaded whole.
+    """
+    max_edge = settings.get('max_edge')
+    if not max_edge:
+        return document.image
+    width, height = document.size
+    crop_top = settings.get('crop_top')
+    if crop_top and 0 < crop_top < 1:
+        height = max(1, int(height * crop_top))
+    return document.reduced(max(width, height) // max_edge)
+
+def prepare_image_bytes(pil_image, provider, **options):
+    """
+    Prepare and JPEG-encode a scan with the provider's defaults.
+
+    Args:
+        pil_image (PIL.Image or Document): Scanned page; for a Document the
+            result is kept with it, so it is only prepared once per settings
+        provider (str): 'openai', 'gemini' or 'custom'
+        **options: Overrides for max_edge, grayscale, quality and crop_top
+
+    Returns:
+        bytes: JPEG data
+    """
+    settings = dict(PREPARE_DEFAULTS.get(provider, {}))
+    settings.update(options)
+    quality = settings.pop('quality', 75)
+    if isinstance(pil_image, Document):
+        document = pil_image
+        key = ('ai', quality) + tuple(sorted(settings.items()))
+        return document.memo(key, lambda: PIL_to_bytes(prepare_image(_prepare_source(document, settings), **settings), quality=quality))
+    return PIL_to_bytes(prepare_image(pil_image, **settings), quality=quality)
+
+def get_recommended_filename_from_pil_image_gemini(pil_image, api_key, model=GEMINI_MODEL, cancel=None):
     """
     Get a recommended filename from a PIL Image object using Google Gemini.
     
     Args:
-        pil_image (PIL.Image): PIL Image object to analyze
+        pil_image (PIL.Image or Document): PIL Image object to analyze
         api_key (str): Google Gemini API key
+        model (str): Gemini model to ask
+        cancel (threading.Event, optional): Stops reading the answer once set
         
     Returns:
         str: Recommended filename (without extension) or empty string if failed
     """
-    recommended_filename = ""
     try:
-        # Configure Gemini
-        client = genai.Client(api_key=api_key)
-        model = 'gemini-2.5-pro'
-        
-        # Create the prompt
-        prompt = "Analyze this document and suggest a filename (without extension) that describes its content. Return only the filename, nothing else. Use underscores instead of spaces and keep it under 25 characters."
-        
-        img_bytes = PIL_to_bytes(pil_image)
-        # Generate response with the PIL image
-        for chunk in client.models.generate_content_stream(
-            model=model,
-            contents=[
-                prompt,
-                types.Part.from_bytes(data=img_bytes, mime_type='image/jpeg'),
-            ],
-        ):
-            print(chunk.text)
-            recommended_filename += chunk.text or ""
-        
-        return recommended_filename
+        img_bytes = prepare_image_bytes(pil_image, 'gemini')
+        return cached_suggestion(img_bytes, 'gemini', model, GEMINI_PROMPT,
+                                 lambda: gemini_request(api_key, img_bytes, model, cancel))
             
     except Exception as e:
         print(f"Error getting recommended filename from PIL image with Gemini: {str(e)}")
         return ""
 
+def gemini_request(api_key, img_bytes, model=GEMINI_MODEL, cancel=None):
+    """
+    Ask Gemini for a filename for a JPEG-encoded image.
+
+    Args:
+        cancel (threading.Event, optional): Once set, the rest of the answer
+            is not read and the stream is closed
+
+    Returns:
+        str: The streamed response text, empty when cancelled
+    """
+    from google.genai import types
+    recommended_filename = ""
+    # Configure Gemini
+    client = get_gemini_client(api_key)
+    
+    # Generate response with the image
+    stream = client.models.generate_content_stream(
+        model=model,
+        contents=[
+            GEMINI_PROMPT,
+            types.Part.from_bytes(data=img_bytes, mime_type='image/jpeg'),
+        ],
+    )
+    try:
+        for chunk in stream:
+            if cancel is not None and cancel.is_set():
+                return ""
+            print(chunk.text)
+            recommended_filename += chunk.text or ""
+    finally:
+        # closing the generator closes the response it is reading
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+    
+    return recommended_filename
+
 # only for debug / testing
 if __name__ == "__main__":
     API_KEY = "YOUR_API_KEY"
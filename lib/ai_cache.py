@@ -0,0 +1,119 @@
+"""Persistent cache of AI filename suggestions, keyed on the image that was sent"""
+# pylint: disable=C0301, W0311, C0303
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL = 90 * 24 * 3600  # seconds
+
+
+class SuggestionCache:
+    """
+    SQLite-backed LRU cache of filename suggestions.
+
+    Entries are keyed on a hash of the prepared image bytes plus the
+    provider, model and prompt, so a rescan of the same page (or picking
+    the same file again) is answered without another API call, while a
+    change of model or prompt is not. The least recently used entries are
+    evicted beyond max_entries and entries older than ttl seconds are
+    ignored.
+
+    Args:
+        path (str): SQLite database file (':memory:' for a throwaway cache)
+        max_entries (int): Maximum number of suggestions kept
+        ttl (float): Seconds an entry stays valid
+        clock (callable): Time source, mostly here for testing
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        # API time the hits would have cost, from the latency recorded when they were stored
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path) if path != ':memory:' else ''
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # suggestions are looked up from worker threads, access is serialised by _lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS suggestions ("
+            " key TEXT PRIMARY KEY,"
+            " filename TEXT NOT NULL,"
+            " latency REAL NOT NULL DEFAULT 0,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS suggestions_last_used ON suggestions (last_used)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(image_bytes, provider, model, prompt):
+        digest = hashlib.sha256()
+        for part in (provider, model, prompt):
+            digest.update((part or '').encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached filename for key, or None"""
+        now = self.clock()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT filename, latency, created FROM suggestions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM suggestions WHERE key = ?", (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE suggestions SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            self.saved_seconds += row[1]
+            return row[0]
+
+    def put(self, key, filename, latency=0.0):
+        """Store a suggestion, evicting the least recently used entries if the cache is full"""
+        now = self.clock()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO suggestions (key, filename, latency, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, filename, latency, now, now),
+            )
+            self._db.execute(
+                "DELETE FROM suggestions WHERE key IN ("
+                " SELECT key FROM suggestions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM suggestions").fetchone()[0]
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self),
+            'saved_seconds': self.saved_seconds,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM suggestions")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
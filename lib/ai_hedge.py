@@ -0,0 +1,149 @@
+"""Filename suggestions from several AI providers, asking the next one when the first is slow"""
+# pylint: disable=C0301, W0311, C0303, W0718
+import collections
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+# weight of the newest answer in a provider's average latency
+SMOOTHING = 0.3
+
+# One way of getting a suggestion: name identifies it in the statistics (e.g.
+# 'gemini:gemini-2.5-flash'), sdk is its key in lib.ai.PROVIDER_MODULES and
+# fetch(document, cancel) returns a filename, empty or None when it has none.
+# cancel is a threading.Event set once the answer is no longer wanted, for
+# fetch to stop reading and let its connection go (None when nothing cancels).
+Candidate = collections.namedtuple('Candidate', 'name sdk fetch')
+
+
+def is_valid(filename):
+    return isinstance(filename, str) and bool(filename.strip())
+
+
+class LatencyStats:
+    """
+    How quickly each candidate has come back with a valid filename this
+    session, used to ask the fastest one first.
+
+    A candidate's score is its smoothed latency divided by its (smoothed)
+    success rate: the expected wait for a usable answer. Candidates with
+    no answer yet keep their configured order behind the scored ones, with
+    the ones that only ever failed last.
+
+    Args:
+        smoothing (float): Weight of the newest latency in the average
+    """
+
+    def __init__(self, smoothing=SMOOTHING):
+        self.smoothing = smoothing
+        self._stats = {}  # name -> [average seconds or None, answers, failures]
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, ok):
+        """Count one finished request of candidate name"""
+        with self._lock:
+            entry = self._stats.setdefault(name, [None, 0, 0])
+            if ok:
+                entry[0] = seconds if entry[0] is None else entry[0] + self.smoothing * (seconds - entry[0])
+                entry[1] += 1
+            else:
+                entry[2] += 1
+
+    def expected(self, name):
+        """Expected seconds until name gives a valid filename, None before its first one"""
+        with self._lock:
+            average, answers, failures = self._stats.get(name, (None, 0, 0))
+        if average is None:
+            return None
+        return average * (answers + failures + 2) / (answers + 1)
+
+    def order(self, candidates):
+        """candidates, the one expected to answer first in front"""
+        summary = self.summary()
+
+        def key(item):
+            index, candidate = item
+            expected = self.expected(candidate.name)
+            if expected is not None:
+                return (0, expected, index)
+            return (1, summary.get(candidate.name, (None, 0, 0))[2], index)
+
+        return [candidate for _, candidate in sorted(enumerate(candidates), key=key)]
+
+    def summary(self):
+        """{name: (average seconds or None, answers, failures)}"""
+        with self._lock:
+            return {name: tuple(entry) for name, entry in self._stats.items()}
+
+
+def _start(candidate, document, stats, cancel):
+    # a daemon thread rather than a pool: a request that lost the race may
+    # hang on until it notices cancel, and must not hold up the app's exit
+    future = Future()
+    start = time.perf_counter()
+
+    def run():
+        try:
+            filename = candidate.fetch(document, cancel)
+        except Exception as e:
+            print(f"AI suggestion from {candidate.name} failed: {str(e)}")
+            filename = None
+        if stats is not None:
+            stats.record(candidate.name, time.perf_counter() - start, is_valid(filename))
+        future.set_result(filename)
+
+    threading.Thread(target=run, name=f"ai-{candidate.name}", daemon=True).start()
+    return future
+
+
+def first_valid_suggestion(document, candidates, budget, stats=None, timeout=None):
+    """
+    Ask candidates for a filename, hedging slow ones, and return the first valid answer.
+
+    The first candidate (by stats when given, else as listed) is asked
+    straight away. Whenever budget seconds pass without a valid filename,
+    or a request comes back without one, the next candidate is asked as
+    well. Requests still running once an answer is in are cancelled (their
+    cancel event is set) and their results dropped (the statistics still
+    count them); candidates not yet asked never are. After timeout seconds
+    in all, the search gives up the same way.
+
+    Args:
+        document (Document): The page to name
+        candidates (list): Candidate tuples, the preferred one first
+        budget (float): Seconds to wait for an answer before asking the next candidate too
+        stats (LatencyStats, optional): Orders the candidates and records every request
+        timeout (float, optional): Seconds to wait in all, no limit by default
+
+    Returns:
+        str: The first valid filename, empty string if no candidate gave one in time
+    """
+    waiting = collections.deque(stats.order(candidates) if stats is not None else candidates)
+    running = set()
+    cancels = []
+    next_start = 0
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while waiting or running:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            if waiting and (not running or now >= next_start):
+                cancels.append(threading.Event())
+                running.add(_start(waiting.popleft(), document, stats, cancels[-1]))
+                next_start = now + budget
+            # wake up to ask the next candidate, or at the deadline, whichever comes first
+            until = [limit for limit in (next_start if waiting else None, deadline) if limit is not None]
+            done, running = wait(running, timeout=max(0, min(until) - time.monotonic()) if until else None,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                filename = future.result()
+                if is_valid(filename):
+                    return filename
+                # no answer from this one: hand over now rather than at the end of the budget
+                next_start = 0
+        return ""
+    finally:
+        # the requests still running lost: stop them rather than pay for their answers
+        for cancel in cancels:
+            cancel.set()
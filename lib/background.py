@@ -0,0 +1,138 @@
+"""Run blocking work off the Tk thread and hand the results back to it"""
+# pylint: disable=C0301, W0311, C0303, W0718
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Task:
+    """Handle for work submitted to a TkExecutor."""
+
+    def __init__(self, future, on_success=None, on_error=None, timeout=None, on_timeout=None):
+        self.future = future
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_timeout = on_timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Stop caring about this task. Its callbacks will never run; if it has
+        not started yet it will not run at all. A call that is already
+        running is left to finish in the background and its result dropped.
+        """
+        self.cancelled = True
+        self.future.cancel()
+
+    @property
+    def pending(self):
+        return not self.cancelled and not self.future.done()
+
+
+class TkExecutor:
+    """
+    Thread pool whose callbacks run on the Tk thread.
+
+    Tk widgets may only be touched from the thread running mainloop(), so
+    workers never call back directly: finished futures are put on a queue
+    that is drained with root.after() polling while there is outstanding work.
+
+    Args:
+        root: Tk root (anything with after())
+        max_workers (int): Number of worker threads
+        poll_interval (int): Milliseconds between checks for finished work
+        name (str): Prefix of the worker thread names
+    """
+
+    def __init__(self, root, max_workers=4, poll_interval=50, name="tk-worker"):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._finished = queue.Queue()
+        self._calls = queue.Queue()
+        self._tasks = set()
+        self._polling = False
+
+    def submit(self, fn, *args, on_success=None, on_error=None, timeout=None, on_timeout=None, **kwargs):
+        """
+        Run fn(*args, **kwargs) on a worker thread.
+
+        Args:
+            on_success (callable, optional): Called with the result on the Tk thread
+            on_error (callable, optional): Called with the exception on the Tk thread
+            timeout (float, optional): Seconds after which the task is cancelled
+            on_timeout (callable, optional): Called (no arguments) on the Tk thread if the timeout hits
+
+        Returns:
+            Task: Handle that can be cancelled
+        """
+        future = self._executor.submit(fn, *args, **kwargs)
+        task = Task(future, on_success, on_error, timeout, on_timeout)
+        self._tasks.add(task)
+        future.add_done_callback(lambda _: self._finished.put(task))
+        self._schedule_poll()
+        return task
+
+    def call_in_ui(self, fn, *args):
+        """Run fn(*args) on the Tk thread; safe to call from worker threads"""
+        self._calls.put((fn, args))
+
+    def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self.poll)
+
+    def poll(self):
+        """Deliver finished work and timeouts. Runs on the Tk thread."""
+        self._polling = False
+        while True:
+            try:
+                fn, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            self._run_callback(fn, *args)
+
+        while True:
+            try:
+                task = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(task)
+
+        now = time.monotonic()
+        for task in list(self._tasks):
+            if task.deadline is not None and task.pending and now >= task.deadline:
+                task.cancel()
+                self._tasks.discard(task)
+                self._run_callback(task.on_timeout)
+
+        if self._tasks or not self._calls.empty():
+            self._schedule_poll()
+
+    def _deliver(self, task):
+        self._tasks.discard(task)
+        if task.cancelled or task.future.cancelled():
+            return
+        error = task.future.exception()
+        if error is not None:
+            if task.on_error:
+                self._run_callback(task.on_error, error)
+            else:
+                print(f"Background task failed: {str(error)}")
+        else:
+            self._run_callback(task.on_success, task.future.result())
+
+    @staticmethod
+    def _run_callback(callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"Error in background task callback: {str(e)}")
@@ -0,0 +1,180 @@
+"""Skip uploads Paperless-ngx already has, by comparing MD5 checksums before any bytes are sent"""
+# pylint: disable=C0301, W0311, C0303, W0718
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+from lib.scanner import CHECKSUM_BATCH_SIZE, file_checksum, get_client
+
+DEFAULT_TTL = 7 * 24 * 3600  # seconds
+# how long a "not in Paperless" answer is trusted; the document may be uploaded by then
+DEFAULT_NEGATIVE_TTL = 60.0
+# file versions whose checksum is kept in memory; the least recently used go first
+DEFAULT_MAX_FILES = 4096
+
+
+class ChecksumCache:
+    """
+    SQLite record of checksums known to exist on a Paperless server.
+
+    Only positive answers are stored: a document found once is skipped
+    without asking again until the entry is ttl seconds old (it may have
+    been deleted from Paperless since).
+
+    Args:
+        path (str): SQLite database file (':memory:' for a throwaway cache)
+        ttl (float): Seconds an entry stays valid
+        clock (callable): Time source, mostly here for testing
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path) if path != ':memory:' else ''
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # checked from the upload workers, access is serialised by _lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checksums ("
+            " server TEXT NOT NULL,"
+            " checksum TEXT NOT NULL,"
+            " checked REAL NOT NULL,"
+            " PRIMARY KEY (server, checksum))"
+        )
+        self._db.commit()
+
+    def known(self, server, checksums):
+        """Return the checksums recorded for server that have not expired"""
+        checksums = list(checksums)
+        oldest = self.clock() - self.ttl
+        found = set()
+        with self._lock:
+            # stay under SQLite's bound parameter limit
+            for start in range(0, len(checksums), 500):
+                chunk = checksums[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT checksum FROM checksums WHERE server = ? AND checked >= ? AND checksum IN ({','.join('?' * len(chunk))})",
+                    (server, oldest, *chunk),
+                )
+                found.update(row[0] for row in rows)
+        return found
+
+    def add(self, server, checksums):
+        now = self.clock()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO checksums (server, checksum, checked) VALUES (?, ?, ?)",
+                [(server, checksum, now) for checksum in checksums],
+            )
+            self._db.commit()
+
+    def forget(self, server, checksum):
+        with self._lock:
+            self._db.execute("DELETE FROM checksums WHERE server = ? AND checksum = ?", (server, checksum))
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM checksums").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class DuplicateChecker:
+    """
+    Decide which files Paperless already has a document for.
+
+    Checksums are computed once per file version (path, size, mtime) and
+    looked up in the ChecksumCache first; the rest are asked about in
+    batched requests (PaperlessClient.existing_checksums). Recent "not
+    found" answers are remembered in memory for negative_ttl seconds, so
+    the files of a batch that were asked about together are not asked
+    about again one by one. Both are bounded, so a checker living as long
+    as a folder watcher does not grow with every file it has seen.
+
+    Args:
+        cache (ChecksumCache, optional): Persistent record of known checksums
+        batch_size (int): Checksums per request
+        negative_ttl (float): Seconds a "not found" answer is trusted
+        max_files (int): File versions whose checksum is kept in memory
+        client_factory (callable): client_factory(api_url, api_token) -> PaperlessClient, mostly here for testing
+        clock (callable): Time source, mostly here for testing
+    """
+
+    def __init__(self, cache=None, batch_size=CHECKSUM_BATCH_SIZE, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 client_factory=get_client, clock=time.monotonic, max_files=DEFAULT_MAX_FILES):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.negative_ttl = negative_ttl
+        self.client_factory = client_factory
+        self.clock = clock
+        self.max_files = max_files
+        self.requests = 0
+        self._checksums = collections.OrderedDict()  # (path, size, mtime_ns) -> md5, least recently used first
+        self._not_found = collections.OrderedDict()  # (server, md5) -> time asked, oldest first
+        self._lock = threading.Lock()
+
+    def checksum(self, path):
+        """MD5 of the file at path, computed once per version of the file"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            checksum = self._checksums.get(key)
+            if checksum is not None:
+                self._checksums.move_to_end(key)
+        if checksum is None:
+            checksum = file_checksum(path)
+            with self._lock:
+                self._checksums[key] = checksum
+                while len(self._checksums) > self.max_files:
+                    self._checksums.popitem(last=False)
+        return checksum
+
+    def find_duplicates(self, api_url, api_token, paths):
+        """
+        Return the paths whose content is already in Paperless.
+
+        Files that cannot be read, and all files when the server cannot be
+        asked, count as new: the upload then goes ahead and Paperless does
+        its own duplicate check.
+        """
+        checksums = {}
+        for path in paths:
+            try:
+                checksums[path] = self.checksum(path)
+            except OSError as e:
+                print(f"Could not checksum {path}: {str(e)}")
+        server = api_url.rstrip('/')
+        now = self.clock()
+        existing = self.cache.known(server, set(checksums.values())) if self.cache is not None else set()
+        with self._lock:
+            unknown = [c for c in dict.fromkeys(checksums.values())
+                       if c not in existing and now - self._not_found.get((server, c), float('-inf')) > self.negative_ttl]
+        if unknown:
+            try:
+                self.requests += 1
+                found = self.client_factory(api_url, api_token).existing_checksums(unknown, self.batch_size)
+            except Exception as e:
+                print(f"Could not check Paperless for duplicates: {str(e)}")
+                found = set()
+                unknown = []
+            if found and self.cache is not None:
+                self.cache.add(server, found)
+            existing |= found
+            with self._lock:
+                for checksum in unknown:
+                    if checksum not in found:
+                        # re-inserted so the entries stay in the order they were asked
+                        self._not_found.pop((server, checksum), None)
+                        self._not_found[(server, checksum)] = now
+                # answers too old to be trusted are of no more use
+                while self._not_found and now - next(iter(self._not_found.values())) > self.negative_ttl:
+                    self._not_found.popitem(last=False)
+        return {path for path, checksum in checksums.items() if checksum in existing}
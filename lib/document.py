@@ -0,0 +1,196 @@
+"""In-memory scanned page shared by the preview, AI, save and upload steps"""
+# pylint: disable=C0301, W0311, C0303, C0415
+import io
+import os
+import tempfile
+import threading
+
+from PIL import Image
+
+from lib.page_store import reduce_by
+
+
+class Document:
+    """
+    A scanned page: the decoded pixels plus every encoded form of them that
+    has been asked for so far.
+
+    Each encoding (JPEG for upload, PNG for a save, the shrunk JPEG for the
+    AI provider...) is built at most once and shared by every step that
+    needs it. When the scanner already delivered encoded bytes (WIA hands
+    over a JPEG) they are kept and reused as-is, so saving or uploading in
+    that format costs no encode at all.
+
+    The pixels can be handed to a PageStore (store_in()), which spills them
+    to a memory-mapped file when the app is over its RAM ceiling; previews
+    then come from view() without loading the whole page back.
+
+    Args:
+        image (PIL.Image): The decoded page
+        data (bytes, optional): Encoded bytes the page was decoded from
+        data_format (str, optional): PIL format name of data, e.g. 'JPEG'
+    """
+
+    def __init__(self, image, data=None, data_format=None):
+        self._image = image
+        self._page = None
+        self._cache = {}
+        self._lock = threading.Lock()
+        # one lock per key: two steps asking for the same form wait for one build,
+        # different forms are built in parallel
+        self._key_locks = {}
+        if data is not None:
+            self._cache[('encode', data_format or image.format)] = data
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Decode encoded image bytes, keeping them for later reuse"""
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return cls(image, data, image.format)
+
+    @classmethod
+    def wrap(cls, image):
+        """Return image as a Document (None stays None)"""
+        if image is None or isinstance(image, Document):
+            return image
+        return cls(image)
+
+    @property
+    def image(self):
+        """The decoded page (loaded back from disk if its store spilled it)"""
+        if self._page is not None:
+            return self._page.image
+        return self._image
+
+    @property
+    def size(self):
+        if self._page is not None:
+            return self._page.size
+        return self._image.size
+
+    @property
+    def mode(self):
+        if self._page is not None:
+            return self._page.mode
+        return self._image.mode
+
+    def store_in(self, store):
+        """Hand the pixels to store (a lib.page_store.PageStore; None keeps them here)"""
+        if store is not None and self._page is None:
+            self._page = store.add(self._image)
+            self._image = None
+        return self
+
+    def view(self, max_edge):
+        """
+        The page reduced by a whole factor so its longest edge is below twice
+        max_edge, for previews. Read a band at a time from a spilled page.
+        """
+        return self.reduced(max(self.size) // max_edge)
+
+    def reduced(self, factor):
+        """The page reduced by a whole factor (see lib.page_store.reduce_by)"""
+        if self._page is not None:
+            return self._page.reduced(factor)
+        return reduce_by(self._image, factor)
+
+    def sample(self, size):
+        """The page resized to size by taking the nearest pixel; only those are read from a spilled page"""
+        if self._page is not None:
+            return self._page.sample(size)
+        return self._image.resize(size, Image.NEAREST)
+
+    def memo(self, key, build):
+        """
+        Return the value cached under key, calling build() to make it the first time.
+        Used for derived forms such as the AI payload.
+        """
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._cache:
+                self._cache[key] = build()
+            return self._cache[key]
+
+    def encode(self, fmt='JPEG', **params):
+        """
+        Encode the page, once per format and parameters.
+
+        Args:
+            fmt (str): PIL format name
+            **params: Passed to PIL's save(), e.g. quality=90
+
+        Returns:
+            bytes: The encoded page
+        """
+        key = ('encode', fmt.upper()) + tuple(sorted(params.items()))
+
+        def build():
+            image = self.image
+            if fmt.upper() == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+                image = image.convert('RGB')
+            buffer = io.BytesIO()
+            image.save(buffer, format=fmt, **params)
+            return buffer.getvalue()
+
+        return self.memo(key, build)
+
+    def encode_compact(self):
+        """
+        Encode the page in the most compact format for what is on it (see
+        lib.page_format): group 4 TIFF for text, grayscale JPEG for
+        grayscale pages, colour JPEG only when there is colour.
+
+        Returns:
+            tuple: (PIL format name, file extension, encoded bytes)
+        """
+        # NumPy is only loaded once a page is encoded this way
+        from lib.page_format import encode_page
+        return self.memo(('compact',), lambda: encode_page(self.image, self.kind()))
+
+    def compact_extension(self):
+        """File extension encode_compact() will pick; only the cheap classification is done for it"""
+        from lib.page_format import output_format
+        return output_format(self.kind())[2]
+
+    def kind(self):
+        """What the page holds (lib.page_format.classify), judged from the sample grid alone"""
+        from lib.page_format import analysis_size, classify
+        return self.memo(('kind',), lambda: classify(self.sample(analysis_size(self.size))))
+
+    def save(self, path, compact=False, **params):
+        """Write the page to path, in the format its extension names (or the compact one)"""
+        if compact:
+            data = self.encode_compact()[2]
+        else:
+            extension = os.path.splitext(path)[1].lower()
+            fmt = Image.registered_extensions().get(extension, 'JPEG')
+            data = self.encode(fmt, **params)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def write_temp(self, fmt=None, prefix='paperless-upload-'):
+        """
+        Write the page to a new private temp file, e.g. for the upload queue
+        (which removes it afterwards).
+
+        Args:
+            fmt (str, optional): PIL format name; the compact format for the
+                page's content (encode_compact()) when None
+
+        Returns:
+            str: Path of the temp file
+        """
+        if fmt is None:
+            _, extension, data = self.encode_compact()
+        else:
+            data = self.encode(fmt)
+            extension = '.jpg' if fmt.upper() == 'JPEG' else '.' + fmt.lower()
+        fd, path = tempfile.mkstemp(suffix=extension, prefix=prefix)
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        return path
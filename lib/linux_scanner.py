@@ -1,6 +1,160 @@
-# placeholder for linux scanners for now
+"""SANE scanner backend (Linux)"""
+# pylint: disable=E1101, C0301, W0311, C0303, W0718, E0401
+import atexit
+import threading
+
+try:
+    import sane
+except ImportError:  # python-sane (and libsane) not installed
+    sane = None
+
+# applied when a device is opened, if the device has the option
+DEFAULT_OPTIONS = {
+    'mode': 'Color',
+    'resolution': 300,
+}
+# words in a 'source' option value that mean the document feeder ('ADF Front', 'Automatic Document Feeder', ...)
+FEEDER_WORDS = ('adf', 'feeder')
+
+# Opening a SANE device and probing its options takes seconds, so handles
+# are opened once and kept until the process exits (or a scan fails).
+_devices = {}
+_lock = threading.RLock()
+_initialized = False
+
+
+def _init():
+    global _initialized
+    if sane is None:
+        raise RuntimeError("SANE support needs the python-sane package")
+    if not _initialized:
+        sane.init()
+        _initialized = True
+        atexit.register(close_devices)
+
+
 def list_scanners():
-    return ["Scanner 1", "Scanner 2"]
+    """Return the SANE device names (e.g. 'epson2:libusb:001:004')"""
+    if sane is None:
+        print("python-sane is not installed, no scanners available")
+        return []
+    with _lock:
+        _init()
+        return [device[0] for device in sane.get_devices()]
+
+
+def set_option(device, name, value):
+    """Set a device option if the device has it; returns True if it was set"""
+    if name not in device.opt:
+        return False
+    try:
+        setattr(device, name, value)
+        return True
+    except Exception as e:
+        print(f"Could not set scanner option {name}={value}: {str(e)}")
+        return False
+
+
+def get_device(scanner_name=None):
+    """
+    Return the open handle for scanner_name (or the first device found),
+    opening and configuring it on first use.
+
+    Raises:
+        RuntimeError: When no scanner is found
+    """
+    with _lock:
+        _init()
+        if scanner_name is None:
+            if _devices:
+                return next(iter(_devices.values()))
+            devices = sane.get_devices()
+            if not devices:
+                raise RuntimeError("No SANE scanners found")
+            scanner_name = devices[0][0]
+        device = _devices.get(scanner_name)
+        if device is None:
+            device = sane.open(scanner_name)
+            for name, value in DEFAULT_OPTIONS.items():
+                set_option(device, name, value)
+            _devices[scanner_name] = device
+        return device
+
 
-def scan_image():
+def close_device(scanner_name):
+    """Close and forget a device handle, the next scan reopens it"""
+    with _lock:
+        device = _devices.pop(scanner_name, None)
+        if device is not None:
+            try:
+                device.close()
+            except Exception as e:
+                print(f"Error closing scanner {scanner_name}: {str(e)}")
+
+
+def close_devices():
+    """Close every open device handle"""
+    with _lock:
+        for scanner_name in list(_devices):
+            close_device(scanner_name)
+
+
+def _name_of(device):
+    for scanner_name, open_device in _devices.items():
+        if open_device is device:
+            return scanner_name
     return None
+
+
+def _select_source(device, feeder):
+    """Pick the flatbed or the document feeder, for devices that have both"""
+    if 'source' not in device.opt:
+        return
+    sources = device.opt['source'].constraint or []
+    wanted = [s for s in sources if any(word in s.lower() for word in FEEDER_WORDS) == feeder]
+    if wanted and device.source not in wanted:
+        set_option(device, 'source', wanted[0])
+
+
+def scan_image(scanner_name=None):
+    """
+    Scan one page and return it as a PIL Image.
+
+    snap() reads the scan data block by block straight into the image's
+    buffer, so nothing goes through a temp file.
+    """
+    with _lock:
+        device = get_device(scanner_name)
+        try:
+            _select_source(device, feeder=False)
+            device.start()
+            return device.snap()
+        except Exception:
+            # a handle that failed once (device unplugged, backend reset) is not trusted again
+            close_device(_name_of(device))
+            raise
+
+
+def scan_pages(scanner_name=None):
+    """
+    Yield each page from the document feeder as a PIL Image until it is empty.
+
+    The lock is only held while a page is read, never while the caller has
+    it, so a batch that is abandoned part way (or consumed slowly) does not
+    keep other threads from the scanners.
+    """
+    with _lock:
+        device = get_device(scanner_name)
+        _select_source(device, feeder=True)
+        # multi_scan() stops when the backend reports the feeder is empty
+        pages = device.multi_scan()
+    while True:
+        with _lock:
+            try:
+                pil_image = next(pages, None)
+            except Exception:
+                close_device(_name_of(device))
+                raise
+        if pil_image is None:
+            return
+        yield pil_image
@@ -0,0 +1,93 @@
+"""Streaming multipart/form-data encoder for document uploads"""
+# pylint: disable=C0301, W0311, C0303
+import io
+import os
+import uuid
+
+
+class MultipartEncoder:
+    """
+    File-like multipart/form-data body that is produced while it is sent.
+
+    requests builds a multipart body for ``files=`` entirely in memory. This
+    encoder only ever holds one chunk of the file at a time: pass it as
+    ``data=`` together with its ``content_type`` header and requests streams
+    it, sending a Content-Length taken from ``len()``.
+
+    Args:
+        fields (dict, optional): Plain form fields (name -> value).
+        files (dict, optional): File fields, name -> (filename, fileobj, content_type).
+            fileobj must be opened in binary mode; it is read from its current position.
+        boundary (str, optional): Multipart boundary, random when omitted.
+        callback (callable, optional): Called as callback(bytes_sent, total_bytes)
+            every time a chunk of the body is read.
+    """
+
+    def __init__(self, fields=None, files=None, boundary=None, callback=None):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.callback = callback
+        self.bytes_read = 0
+        self.len = 0
+        self._parts = []
+        for name, value in (fields or {}).items():
+            self._add_bytes(self._part_header(name) + str(value).encode('utf-8') + b'\r\n')
+        for name, (filename, fileobj, content_type) in (files or {}).items():
+            self._add_bytes(self._part_header(name, filename, content_type))
+            self._parts.append(fileobj)
+            self.len += _remaining_size(fileobj)
+            self._add_bytes(b'\r\n')
+        self._add_bytes(f'--{self.boundary}--\r\n'.encode('ascii'))
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self.len
+
+    def read(self, size=-1):
+        """Read up to size bytes of the encoded body (everything that is left when size < 0)"""
+        chunks = []
+        wanted = size if size is not None and size >= 0 else None
+        while self._parts and (wanted is None or wanted > 0):
+            chunk = self._parts[0].read(wanted if wanted is not None else -1)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if wanted is not None:
+                wanted -= len(chunk)
+        data = b''.join(chunks)
+        self.bytes_read += len(data)
+        if data and self.callback:
+            self.callback(self.bytes_read, self.len)
+        return data
+
+    def _add_bytes(self, data):
+        self._parts.append(io.BytesIO(data))
+        self.len += len(data)
+
+    def _part_header(self, name, filename=None, content_type=None):
+        disposition = f'form-data; name="{_quote(name)}"'
+        if filename is not None:
+            disposition += f'; filename="{_quote(filename)}"'
+        header = f'--{self.boundary}\r\nContent-Disposition: {disposition}\r\n'
+        if content_type:
+            header += f'Content-Type: {content_type}\r\n'
+        return (header + '\r\n').encode('utf-8')
+
+
+def _quote(value):
+    # same escaping browsers (and urllib3) use for form-data names
+    return value.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+
+def _remaining_size(fileobj):
+    """Number of bytes between the current position and the end of fileobj"""
+    position = fileobj.tell()
+    try:
+        return os.fstat(fileobj.fileno()).st_size - position
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        end = fileobj.seek(0, io.SEEK_END)
+        fileobj.seek(position)
+        return end - position
@@ -0,0 +1,123 @@
+"""Pick the most compact encoding for a page from what is on it: text, grayscale or colour"""
+# pylint: disable=C0301, W0311, C0303, C0415
+import io
+
+import numpy as np
+from PIL import Image, features
+
+TEXT = 'text'
+GRAY = 'gray'
+COLOR = 'color'
+
+# a pixel is coloured when its channels differ by more than this (0-255);
+# paper tint and the colour fringes of a scanner's sensor stay below it
+COLOR_CHROMA = 48
+# fraction of the page that has to be coloured for colour to be kept (a small logo is ~0.5%)
+COLOR_FRACTION = 0.001
+# grey levels this far from both the paper and the ink count as mid-tones
+MIDTONE_MARGIN = 48
+# fraction of the page in solid mid-tone areas above which it is a grayscale page
+# (a photo of about 1.5 x 1.5 inches); text has mid-tones only along the thin
+# edges of its strokes, which the sample grid does not see as areas
+MIDTONE_FRACTION = 0.008
+# how much darker than the paper a pixel has to be to count as ink (0-255)
+INK_CONTRAST = 64
+# pages are sampled on a grid with this many points along the long edge (~75 dpi for A4)
+ANALYSIS_EDGE = 900
+
+# single-page encoding for each kind of page: PIL format, save() parameters, file extension
+FORMATS = {
+    TEXT: ('TIFF', {'compression': 'group4'}, '.tif'),
+    GRAY: ('JPEG', {}, '.jpg'),
+    COLOR: ('JPEG', {}, '.jpg'),
+}
+# CCITT group 4 needs Pillow built with libtiff; PNG is the next best lossless bilevel format
+FALLBACK_TEXT_FORMAT = ('PNG', {'optimize': True}, '.png')
+
+
+def analysis_size(size):
+    """Size of the sample grid classify() reads for a page of size"""
+    scale = min(1.0, ANALYSIS_EDGE / max(size))
+    return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+
+def classify(image):
+    """
+    Tell what a page holds: TEXT (black on paper), GRAY (mid-tones, e.g.
+    photos) or COLOR.
+
+    The page is sampled on a grid of about 75 dpi (a NEAREST resize reads
+    only the sampled pixels), so this costs a few milliseconds whatever the
+    scan resolution. Colour is the fraction of samples whose channels
+    differ by more than COLOR_CHROMA. Mid-tones are grey levels well away
+    from both the paper (median level) and the ink (median of the dark
+    samples); only those whose right and lower neighbours are mid-tones
+    too count, so the soft edges of text do not make a page grayscale.
+
+    Args:
+        image (PIL.Image): The page
+
+    Returns:
+        str: TEXT, GRAY or COLOR
+    """
+    if image.mode == '1':
+        return TEXT
+    small = image.resize(analysis_size(image.size), Image.NEAREST)
+    if small.mode not in ('L', 'RGB'):
+        small = small.convert('RGB')
+    if small.mode == 'RGB':
+        # per channel: reducing over the last axis of an RGB array is several times slower
+        red, green, blue = (np.asarray(band) for band in small.split())
+        chroma = np.maximum(np.maximum(red, green), blue) - np.minimum(np.minimum(red, green), blue)
+        if np.count_nonzero(chroma > COLOR_CHROMA) > COLOR_FRACTION * chroma.size:
+            return COLOR
+        small = small.convert('L')
+    gray = np.asarray(small)
+    histogram = np.bincount(gray.ravel(), minlength=256)
+    cumulative = np.cumsum(histogram)
+    paper = int(np.searchsorted(cumulative, gray.size // 2))
+    dark = int(cumulative[paper - INK_CONTRAST]) if paper >= INK_CONTRAST else 0
+    if not dark:
+        return TEXT
+    ink = int(np.searchsorted(cumulative, dark // 2))
+    midtone = (gray > ink + MIDTONE_MARGIN) & (gray < paper - MIDTONE_MARGIN)
+    solid = midtone[:-1, :-1] & midtone[1:, :-1] & midtone[:-1, 1:]
+    return GRAY if np.count_nonzero(solid) > MIDTONE_FRACTION * gray.size else TEXT
+
+
+def prepare(image, kind=None):
+    """Convert a page to the mode its kind is stored in: bilevel ('1'), 'L' or 'RGB'"""
+    kind = kind or classify(image)
+    if kind == TEXT:
+        if image.mode == '1':
+            return image
+        from lib.cleanup import adaptive_threshold
+        return adaptive_threshold(image)
+    mode = 'L' if kind == GRAY else 'RGB'
+    return image if image.mode == mode else image.convert(mode)
+
+
+def output_format(kind):
+    """(PIL format, save() parameters, file extension) for a single page of that kind"""
+    if kind == TEXT and not features.check('libtiff'):
+        return FALLBACK_TEXT_FORMAT
+    return FORMATS[kind]
+
+
+def encode_page(image, kind=None):
+    """
+    Encode a page in the compact format for its kind: CCITT group 4 TIFF for
+    text, grayscale JPEG for grayscale pages, colour JPEG only for colour.
+
+    Returns:
+        tuple: (PIL format name, file extension, encoded bytes)
+    """
+    kind = kind or classify(image)
+    fmt, params, extension = output_format(kind)
+    page = prepare(image, kind)
+    buffer = io.BytesIO()
+    save_params = dict(params)
+    if 'dpi' in image.info:
+        save_params['dpi'] = image.info['dpi']
+    page.save(buffer, format=fmt, **save_params)
+    return fmt, extension, buffer.getvalue()
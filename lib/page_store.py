@@ -0,0 +1,238 @@
+"""Scanned pages kept under a RAM ceiling, the pixels of the rest in memory-mapped files"""
+# pylint: disable=C0301, W0311, C0303, C0415
+import collections
+import os
+import tempfile
+import threading
+import weakref
+
+from PIL import Image
+
+# resident pixel data allowed by default before pages are spilled to disk
+DEFAULT_MAX_MB = 512
+MB = 1024 * 1024
+# rows of a spilled page read at a time for a reduced view; bounds the memory a view needs
+BAND_ROWS = 512
+# modes whose pixels NumPy maps one-to-one; pages in other modes always stay in memory
+SPILLABLE_MODES = ('1', 'L', 'RGB', 'RGBA', 'CMYK', 'I;16', 'I', 'F')
+
+
+def pixel_bytes(image):
+    """Memory Pillow uses for the pixels of image (multi-band pixels take 4 bytes)"""
+    per_pixel = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2}.get(image.mode, 4)
+    return image.width * image.height * per_pixel
+
+
+def _to_image(pixels, mode):
+    """
+    PIL image over a C-contiguous (possibly memory-mapped) pixel array of a
+    page in mode. Pillow maps the modes it stores the same way (L, RGBA,
+    CMYK, I;16) without copying; the others are unpacked once, straight
+    from the array.
+    """
+    height, width = pixels.shape[:2]
+    # NumPy keeps bilevel pixels as one bool byte each
+    rawmode = '1;8' if mode == '1' else mode
+    return Image.frombuffer(mode, (width, height), pixels, 'raw', rawmode, 0, 1)
+
+
+def reduce_by(image, factor):
+    """image.reduce(factor), for bilevel pages too (they come back grayscale)"""
+    if factor <= 1:
+        return image
+    if image.mode == '1':
+        # reduce() only averages multi-level pixels
+        image = image.convert('L')
+    return image.reduce(factor)
+
+
+class StoredPage:
+    """
+    One page in a PageStore: in memory, or spilled to a memory-mapped file.
+
+    Reduced views, samples and tiles of a spilled page are read from the
+    file a band at a time, so showing a preview of a 200 MB page needs a few
+    MB of RAM. image reads the whole page back and is meant for the steps
+    that really need every pixel (encoding, saving); it is not kept.
+    """
+
+    def __init__(self, store, image):
+        self._store = store
+        self._image = image
+        # the memory-mapped pixels once spilled, in a list the finalizer can empty
+        self._mapped = []
+        self.mode = image.mode
+        self.size = image.size
+        self.info = dict(image.info)
+        self.nbytes = pixel_bytes(image)
+
+    @property
+    def spilled(self):
+        return self._image is None
+
+    @property
+    def image(self):
+        """The full page as a PIL image"""
+        self._store.touch(self)
+        image = self._image
+        if image is not None:
+            return image
+        image = _to_image(self._mapped[0], self.mode)
+        image.info.update(self.info)
+        return image
+
+    def tile(self, box):
+        """
+        The part of the page inside box, without loading the rest.
+
+        Args:
+            box (tuple): (left, upper, right, lower) in page pixels
+
+        Returns:
+            PIL.Image: The tile
+        """
+        image = self._image
+        if image is not None:
+            return image.crop(box)
+        left, upper, right, lower = box
+        # whole rows are one block of the file; only the tile is copied out of them
+        return _to_image(self._mapped[0][upper:lower], self.mode).crop((left, 0, right, lower - upper))
+
+    def sample(self, size):
+        """
+        The page resized to size by taking the nearest pixel (Image.NEAREST),
+        reading only the pixels taken.
+        """
+        image = self._image
+        if image is not None:
+            return image.resize(size, Image.NEAREST)
+        import numpy as np
+        width, height = size
+        # the page pixel NEAREST picks for each column and row of the result
+        columns = ((np.arange(width) + 0.5) * self.size[0] / width).astype(np.intp)
+        rows = ((np.arange(height) + 0.5) * self.size[1] / height).astype(np.intp)
+        return _to_image(self._mapped[0][rows[:, None], columns], self.mode)
+
+    def view(self, max_edge):
+        """
+        The page reduced by a whole factor so its longest edge is below twice
+        max_edge (the page itself when it is that small already). Bilevel
+        pages come back as grayscale once reduced.
+        """
+        return self.reduced(max(self.size) // max_edge)
+
+    def reduced(self, factor):
+        """The page reduced by factor, like reduce_by()"""
+        image = self._image
+        if image is not None:
+            return reduce_by(image, factor)
+        if factor <= 1:
+            return self.image
+        # whole multiples of factor rows, so the bands reduce to exactly what reducing the page would give
+        rows = max(1, BAND_ROWS // factor) * factor
+        bands = [reduce_by(self.tile((0, top, self.size[0], min(top + rows, self.size[1]))), factor)
+                 for top in range(0, self.size[1], rows)]
+        view = Image.new(bands[0].mode, (bands[0].width, sum(band.height for band in bands)))
+        top = 0
+        for band in bands:
+            view.paste(band, (0, top))
+            top += band.height
+        return view
+
+    def spill(self):
+        """Move the pixels to a memory-mapped file; returns the bytes freed"""
+        import numpy as np
+        if self._image is None or self.mode not in SPILLABLE_MODES:
+            return 0
+        fd, path = tempfile.mkstemp(suffix='.npy', prefix='paperless-page-', dir=self._store.directory)
+        os.close(fd)
+        image = self._image
+        width, height = image.size
+        sample = np.asarray(image.crop((0, 0, 1, 1)))
+        # written a band at a time through the file: no second full copy of the page in
+        # RAM, and no dirty pages a writable map would leave behind
+        with open(path, 'wb') as file:
+            np.lib.format.write_array_header_1_0(file, {'descr': np.lib.format.dtype_to_descr(sample.dtype), 'fortran_order': False,
+                                                        'shape': (height, width) + sample.shape[2:]})
+            for top in range(0, height, BAND_ROWS):
+                file.write(np.asarray(image.crop((0, top, width, min(top + BAND_ROWS, height)))).tobytes())
+        self._mapped.append(np.load(path, mmap_mode='r'))
+        # the file goes with the page, however the page is dropped
+        weakref.finalize(self, _discard, self._mapped, path)
+        self._image = None
+        return self.nbytes
+
+
+def _discard(mapped, path):
+    # unmap first, Windows does not remove a file that is still mapped
+    mapped.clear()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class PageStore:
+    """
+    Keeps the pixels of scanned pages within a RAM ceiling.
+
+    Pages are added as they are scanned; once the pages in memory add up to
+    more than max_bytes, the least recently used ones are spilled to
+    memory-mapped files in directory (one .npy file per page, removed when
+    the page is dropped). A page bigger than the ceiling on its own is
+    spilled as soon as it is added. The store only holds weak references:
+    a page lives as long as whoever added it keeps it.
+
+    Args:
+        max_bytes (int): RAM allowed for page pixels
+        directory (str, optional): Where spilled pages go, the temp dir by default
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * MB, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._pages = collections.OrderedDict()
+        # reentrant: a page dropped while the lock is held forgets itself through its weakref callback
+        self._lock = threading.RLock()
+        # one trim at a time, so a page is never spilled twice
+        self._trim_lock = threading.Lock()
+
+    def add(self, image):
+        """Put image in the store; returns its StoredPage"""
+        page = StoredPage(self, image)
+        key = id(page)
+        with self._lock:
+            self._pages[key] = weakref.ref(page, lambda _ref: self._forget(key))
+        self.trim()
+        return page
+
+    def _forget(self, key):
+        with self._lock:
+            self._pages.pop(key, None)
+
+    def touch(self, page):
+        """Mark page as just used, so it is the last to be spilled"""
+        with self._lock:
+            if id(page) in self._pages:
+                self._pages.move_to_end(id(page))
+
+    def pages(self):
+        """Live pages, least recently used first"""
+        with self._lock:
+            refs = list(self._pages.values())
+        return [page for page in (ref() for ref in refs) if page is not None]
+
+    @property
+    def resident_bytes(self):
+        return sum(page.nbytes for page in self.pages() if not page.spilled)
+
+    def trim(self):
+        """Spill least recently used pages until the ones left in memory fit under max_bytes"""
+        with self._trim_lock:
+            pages = [page for page in self.pages() if not page.spilled]
+            resident = sum(page.nbytes for page in pages)
+            for page in pages:
+                if resident <= self.max_bytes:
+                    break
+                resident -= page.spill()
+            return resident
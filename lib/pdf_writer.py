@@ -0,0 +1,138 @@
+"""Write scanned pages into a multi-page PDF one page at a time"""
+# pylint: disable=C0301, W0311, C0303, C0415
+import collections
+import io
+import math
+import os
+import time
+
+from PIL import Image, PdfParser, TiffImagePlugin, features
+
+# A page image as it is embedded in the PDF: the encoded stream plus what the
+# image XObject says about it. Built by encode_pdf_image(), possibly in a
+# worker process, and written by PdfPageWriter.add_encoded(); plain values
+# only, as it is pickled on the way back from a worker.
+PdfImage = collections.namedtuple('PdfImage', 'width height dpi stream filter params colorspace bits procset decode')
+
+
+def _group4_stream(image):
+    """
+    The CCITT group 4 stream of a bilevel image, cut out of the single-strip
+    TIFF libtiff writes for it. None when Pillow wrote several strips (older
+    versions do not know strip_size): each strip is coded on its own, so
+    together they are no valid stream.
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format='TIFF', compression='group4', strip_size=math.ceil(image.width / 8) * image.height)
+    with Image.open(buffer) as tiff:
+        offsets = tiff.tag_v2[TiffImagePlugin.STRIPOFFSETS]
+        counts = tiff.tag_v2[TiffImagePlugin.STRIPBYTECOUNTS]
+    if len(offsets) != 1:
+        return None
+    return buffer.getvalue()[offsets[0]:offsets[0] + counts[0]]
+
+
+def encode_pdf_image(image, compact=False):
+    """
+    Encode a page the way it is stored in a PDF: bilevel pages as CCITT
+    group 4, everything else as JPEG (DCT), like Pillow's PDF plugin.
+
+    Args:
+        image (PIL.Image): The page
+        compact (bool): First convert the page to the most compact form for
+            what is on it (lib.page_format): bilevel text, grayscale or colour
+
+    Returns:
+        PdfImage: The encoded page
+    """
+    dpi = image.info.get('dpi')
+    if compact:
+        from lib.page_format import prepare
+        image = prepare(image)
+    if image.mode == '1':
+        stream = _group4_stream(image) if features.check('libtiff') else None
+        if stream is not None:
+            params = {'K': -1, 'BlackIs1': True, 'Columns': image.width, 'Rows': image.height}
+            return PdfImage(image.width, image.height, dpi, stream, 'CCITTFaxDecode', params, 'DeviceGray', 1, 'ImageB', None)
+        image = image.convert('L')
+    if image.mode not in ('L', 'RGB', 'CMYK'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    decode = None
+    image.save(buffer, format='JPEG')
+    colorspace, procset = {'L': ('DeviceGray', 'ImageB'), 'RGB': ('DeviceRGB', 'ImageC'), 'CMYK': ('DeviceCMYK', 'ImageC')}[image.mode]
+    if image.mode == 'CMYK':
+        decode = [1, 0, 1, 0, 1, 0, 1, 0]
+    return PdfImage(image.width, image.height, dpi, buffer.getvalue(), 'DCTDecode', None, colorspace, 8, procset, decode)
+
+
+def encode_pdf_pages(pages, workers=None, compact=False):
+    """
+    encode_pdf_image() for a stream of pages on all cores, in page order.
+    Each page is closed once it has been handed to a worker.
+    """
+    from lib.process_pool import map_pages
+    return map_pages(encode_pdf_image, pages, workers, compact=compact)
+
+
+class PdfPageWriter:
+    """
+    Append pages to a PDF on disk as they arrive.
+
+    Each page is written with an incremental update, so only the page being
+    added is ever held in memory, however many pages end up in the document.
+    Pages can be encoded elsewhere (encode_pdf_pages() encodes them in
+    worker processes) and added with add_encoded().
+
+    Args:
+        path (str): Output PDF path. An existing file is replaced.
+        resolution (float): Resolution in dpi, used for the PDF page size.
+        compact (bool): Store each page in the most compact form for what is on
+            it (lib.page_format): text pages bilevel (CCITT group 4), grayscale
+            pages as grayscale JPEG, colour JPEG only for colour pages.
+    """
+
+    def __init__(self, path, resolution=300.0, compact=False):
+        self.path = path
+        self.resolution = resolution
+        self.compact = compact
+        self.pages = 0
+        if os.path.exists(path):
+            os.remove(path)
+
+    def add_page(self, image):
+        """Append a PIL image as the next page of the PDF"""
+        return self.add_encoded(encode_pdf_image(image, self.compact))
+
+    def add_encoded(self, page):
+        """Append a page encoded by encode_pdf_image() as the next page of the PDF"""
+        resolution = (page.dpi or (self.resolution,))[0] or self.resolution
+        width, height = page.width * 72.0 / resolution, page.height * 72.0 / resolution
+        with open(self.path, 'r+b' if self.pages else 'w+b') as file:
+            pdf = PdfParser.PdfParser(f=file, filename=self.path, mode='r+b' if self.pages else 'w+b')
+            if not self.pages:
+                pdf.info['Title'] = os.path.splitext(os.path.basename(self.path))[0]
+                pdf.info['CreationDate'] = pdf.info['ModDate'] = time.gmtime()
+            pdf.start_writing()
+            pdf.write_header()
+            image_ref, page_ref, contents_ref = (pdf.next_object_id(0) for _ in range(3))
+            pdf.pages.append(page_ref)
+            pdf.write_catalog()
+            if page.params:
+                # laid out like Pillow's PDF plugin writes them
+                decode_filter = PdfParser.PdfArray([PdfParser.PdfName(page.filter)])
+                params = PdfParser.PdfArray([PdfParser.PdfDict(page.params)])
+            else:
+                decode_filter, params = PdfParser.PdfName(page.filter), None
+            pdf.write_obj(image_ref, stream=page.stream, Type=PdfParser.PdfName('XObject'), Subtype=PdfParser.PdfName('Image'),
+                          Width=page.width, Height=page.height, Filter=decode_filter, Decode=page.decode, DecodeParms=params,
+                          BitsPerComponent=page.bits, ColorSpace=PdfParser.PdfName(page.colorspace))
+            pdf.write_page(page_ref, Contents=contents_ref, MediaBox=[0, 0, width, height],
+                           Resources=PdfParser.PdfDict(ProcSet=[PdfParser.PdfName('PDF'), PdfParser.PdfName(page.procset)],
+                                                       XObject=PdfParser.PdfDict(image=image_ref)))
+            pdf.write_obj(contents_ref, stream=b"q %f 0 0 %f 0 0 cm /image Do Q\n" % (width, height))
+            pdf.write_xref_and_trailer()
+            file.flush()
+            pdf.close()
+        self.pages += 1
+        return self.pages
@@ -0,0 +1,118 @@
+"""Fast, cached preview rendering for scanned pages"""
+# pylint: disable=C0301, W0311, C0303
+from collections import OrderedDict
+
+from PIL import Image
+
+from lib.page_store import reduce_by
+
+# working copies previews are rendered from stay below twice this edge; at least any screen
+BASE_MAX_EDGE = 2560
+# number of preview sizes kept (window resizes go back and forth between a few sizes)
+CACHED_SIZES = 4
+
+
+def fit_size(image_size, box):
+    """
+    Size of an image scaled to fit inside box, keeping its aspect ratio.
+
+    Args:
+        image_size (tuple): (width, height) of the image
+        box (tuple): (width, height) available
+
+    Returns:
+        tuple: (width, height), never smaller than 1x1
+    """
+    img_width, img_height = image_size
+    ratio = min(box[0] / img_width, box[1] / img_height)
+    return max(1, int(img_width * ratio)), max(1, int(img_height * ratio))
+
+
+def downsample(pil_image, size):
+    """
+    Scale pil_image to size, doing the bulk of the work with a cheap integer
+    reduce() and only the last step (less than 2x) with LANCZOS.
+    """
+    factor = min(pil_image.width // size[0], pil_image.height // size[1])
+    if factor > 1:
+        pil_image = pil_image.reduce(factor)
+    if pil_image.size != size:
+        pil_image = pil_image.resize(size, Image.Resampling.LANCZOS)
+    return pil_image
+
+
+def open_for_preview(image_path, max_edge=BASE_MAX_EDGE):
+    """
+    Open an image file for previewing only.
+
+    JPEGs are decoded at a reduced scale (Image.draft), which skips most of
+    the decoding work for high-resolution scans.
+    """
+    image = Image.open(image_path)
+    # draft picks the smallest JPEG scale that is still at least this size
+    image.draft('RGB', fit_size(image.size, (max_edge, max_edge)))
+    image.load()
+    return image
+
+
+class PreviewRenderer:
+    """
+    Renders previews of one image at whatever size the window asks for.
+
+    The source is reduced once (by an integer factor, which is cheap) to a
+    working copy with edges below twice base_max_edge; every preview is
+    rendered from that copy and the results for the last few sizes are
+    kept, so resizing the window back and forth does not redo the work.
+
+    Args:
+        pil_image (PIL.Image or Document): Image to preview (not modified); a
+            Document provides the working copy itself (Document.view()), read
+            from disk a band at a time when its page store spilled it
+        factory (callable, optional): Applied to each rendered PIL image before
+            it is cached, e.g. ImageTk.PhotoImage
+        base_max_edge (int): Sources larger than this are reduced for the working copy
+        cached_sizes (int): Number of rendered sizes kept
+    """
+
+    def __init__(self, pil_image, factory=None, base_max_edge=BASE_MAX_EDGE, cached_sizes=CACHED_SIZES):
+        self.source = pil_image
+        self.factory = factory
+        self.base_max_edge = base_max_edge
+        self.cached_sizes = cached_sizes
+        self._base = None
+        self._cache = OrderedDict()
+
+    @property
+    def base(self):
+        """Working copy the previews are rendered from"""
+        if self._base is None:
+            if hasattr(self.source, 'view'):
+                image = self.source.view(self.base_max_edge)
+            else:
+                image = reduce_by(self.source, max(self.source.size) // self.base_max_edge)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            self._base = image
+        return self._base
+
+    def render(self, box):
+        """
+        Return the preview fitting box, from the cache when possible.
+
+        Args:
+            box (tuple): (width, height) available for the preview
+
+        Returns:
+            The rendered preview (a PIL image, or whatever factory returns)
+        """
+        size = fit_size(self.source.size, box)
+        if size in self._cache:
+            self._cache.move_to_end(size)
+            return self._cache[size]
+        preview = downsample(self.base, size)
+        if self.factory is not None:
+            preview = self.factory(preview)
+        self._cache[size] = preview
+        while len(self._cache) > self.cached_sizes:
+            self._cache.popitem(last=False)
+        return preview
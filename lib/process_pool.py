@@ -0,0 +1,171 @@
+"""Worker processes for CPU-heavy page work, with the pixels handed over in shared memory"""
+# pylint: disable=C0301, W0311, C0303
+import atexit
+import collections
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+# worker processes used when none are configured: one per core, none (work in
+# the calling process) on a single core, where a pool only adds copying
+DEFAULT_WORKERS = (os.cpu_count() or 1) if (os.cpu_count() or 1) > 1 else 0
+# rows of a page copied into shared memory at a time; bounds the memory the copy needs
+BAND_ROWS = 512
+
+# Starting worker processes (each imports NumPy and Pillow) takes a moment,
+# so one pool is kept for the life of the app and shared by every stage.
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers=None):
+    """
+    The shared process pool, with at least workers processes. It is only
+    ever replaced by a bigger one; callers that want fewer workers busy
+    limit how much they submit (see map_pages()).
+    """
+    global _pool, _pool_workers
+    workers = workers or os.cpu_count() or 1
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn, not fork: the app has threads (Tk, uploads) that a forked child would inherit mid-operation
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = _pool_workers = None
+
+
+atexit.register(shutdown_pool)
+
+
+class SharedBlocks:
+    """
+    Shared memory blocks that carry page pixels to the workers.
+
+    A page is copied into a block once, a band of rows at a time, and the
+    worker reads it from there, instead of the pixels being pickled and
+    pushed through the pool's pipe (several copies, and a feeder thread busy
+    for the whole transfer). Palette pages take their palette along. Blocks
+    are reused for later pages once their worker is done, so a batch maps
+    only as many blocks as there are pages in flight.
+    """
+
+    def __init__(self):
+        self._free = []
+        self._all = []
+
+    def put(self, image):
+        """Copy image into a free block; returns the block and the reference a worker opens it with"""
+        width, height = image.size
+        # rows take as many bytes in a band as in the page (bilevel rows are padded to whole bytes)
+        length = len(image.crop((0, 0, width, 1)).tobytes()) * height
+        block = self._take(length)
+        # band by band: tobytes() of the whole page would be one more full copy of it
+        offset = 0
+        for top in range(0, height, BAND_ROWS):
+            data = image.crop((0, top, width, min(top + BAND_ROWS, height))).tobytes()
+            block.buf[offset:offset + len(data)] = data
+            offset += len(data)
+        info = {key: image.info[key] for key in ('dpi', 'transparency') if key in image.info}
+        palette = (image.palette.mode, image.getpalette(image.palette.mode)) if image.palette is not None else None
+        return block, (block.name, image.mode, image.size, length, info, palette)
+
+    def _take(self, size):
+        for index, block in enumerate(self._free):
+            if block.size >= size:
+                return self._free.pop(index)
+        block = shared_memory.SharedMemory(create=True, size=max(1, size))
+        self._all.append(block)
+        return block
+
+    def release(self, block):
+        self._free.append(block)
+
+    def close(self):
+        for block in self._all:
+            block.close()
+            block.unlink()
+        self._free = []
+        self._all = []
+
+
+def open_shared(reference):
+    """Worker side of SharedBlocks.put(): the image, decoded straight out of its block (the block is reused)"""
+    name, mode, size, length, info, palette = reference
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        view = block.buf[:length]
+        try:
+            image = Image.frombytes(mode, size, view)
+        finally:
+            view.release()
+    finally:
+        block.close()
+    if palette is not None:
+        image.putpalette(palette[1], palette[0])
+    image.info.update(info)
+    return image
+
+
+def _run(func, reference, args, kwargs):
+    return func(open_shared(reference), *args, **kwargs)
+
+
+def map_pages(func, pages, workers=None, *args, **kwargs):
+    """
+    Run func(image, *args, **kwargs) on every page in the worker processes,
+    yielding the results in page order.
+
+    Each page is copied into shared memory and closed as soon as it
+    arrives. At most workers + 1 pages are in flight (enough to keep every
+    worker busy while a result is being used), so a long feeder batch does
+    not pile up in memory. func has to be a module-level function, the
+    workers import it by name.
+
+    Args:
+        func (callable): The work to do on each page
+        pages (iterable): PIL Images
+        workers (int, optional): Worker processes, one per core by default
+        *args, **kwargs: Passed on to func
+
+    Yields:
+        Whatever func returns, in page order
+    """
+    workers = workers or os.cpu_count() or 1
+    pool = get_pool(workers)
+    blocks = SharedBlocks()
+    in_flight = collections.deque()
+
+    def result():
+        block, future = in_flight.popleft()
+        value = future.result()
+        blocks.release(block)
+        return value
+
+    try:
+        for page in pages:
+            block, reference = blocks.put(page)
+            page.close()
+            in_flight.append((block, pool.submit(_run, func, reference, args, kwargs)))
+            if len(in_flight) > workers:
+                yield result()
+        while in_flight:
+            yield result()
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+        blocks.close()
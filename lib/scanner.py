@@ -1,49 +1,341 @@
-# pylint: disable=E1101, C0301, W0311, C0303, W0718, E0401
+# pylint: disable=E1101, C0301, W0311, C0303, W0718, E0401, C0415
 # pylint: disable = no-name-in-module
 from PIL import Image
 import requests
+from requests.adapters import HTTPAdapter
+import hashlib
+import importlib
 import os
+import threading
+from lib.document import Document
+from lib.multipart import MultipartEncoder
+from lib.pdf_writer import PdfPageWriter, encode_pdf_pages
 
-# SO this is a bit of a hack, but it works, I will just comment out the windows_scanner.py file when using debian based systems 
-# and use the linux scanner.py file on those systems
-# import lib.windows_scanner as scanclient
-if os.name == 'nt':
-    import lib.windows_scanner as scanclient
-else:
-    import lib.linux_scanner as scanclient
+# Scanner backends by name. WIA on Windows and SANE elsewhere, unless another
+# one is picked with the PAPERLESS_SCANNER_BACKEND environment variable or
+# set_backend() (the simulated scanner drives the app without hardware).
+BACKENDS = {
+    'wia': 'lib.windows_scanner',
+    'sane': 'lib.linux_scanner',
+    'simulated': 'lib.simulated_scanner',
+}
+DEFAULT_BACKEND = 'wia' if os.name == 'nt' else 'sane'
+
+def set_backend(name, **options):
+    """
+    Switch the scanner backend.
+
+    Args:
+        name (str): A key of BACKENDS
+        **options: Passed to the backend's configure() (simulated scanner settings)
+
+    Raises:
+        ValueError: For an unknown backend
+    """
+    global scanclient, backend_name
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown scanner backend '{name}', expected one of {', '.join(BACKENDS)}")
+    module = importlib.import_module(BACKENDS[name])
+    if options:
+        module.configure(**options)
+    scanclient, backend_name = module, name
+    return module
+
+scanclient = None
+backend_name = None
+set_backend(os.environ.get('PAPERLESS_SCANNER_BACKEND') or DEFAULT_BACKEND)
 
 def list_scanners():
     return scanclient.list_scanners()
 
-def scan_image():
-    return scanclient.scan_image()
+def scan_image(scanner_name=None, cleanup=None, store=None):
+    """
+    Scan one page and return it as a Document (None if the scan was cancelled).
+
+    cleanup, a dict of lib.cleanup.clean_page() options, runs the clean-up
+    steps on the page (here on the calling thread, a single page is not
+    worth the trip to a worker process). With store (a
+    lib.page_store.PageStore) the pixels go into it, so spilling pages to
+    disk happens here rather than on the caller's thread.
+    """
+    image = scanclient.scan_image(scanner_name)
+    if cleanup is not None and image is not None:
+        from lib.cleanup import clean_page
+        image = clean_page(Document.wrap(image).image, **cleanup)
+    document = Document.wrap(image)
+    return document.store_in(store) if document is not None else None
+
+def scan_pages(scanner_name=None):
+    """Yield every page the document feeder delivers as a PIL Image"""
+    return scanclient.scan_pages(scanner_name)
+
+def scan_batch(output_path, scanner_name=None, on_page=None, skip_blank=False, blank_threshold=None, on_blank=None,
+               cleanup=None, cleanup_workers=None, compact=False, encode_workers=0):
+    """
+    Scan a whole feeder stack into one multi-page PDF.
+
+    Pages are appended to the PDF as they arrive and released straight
+    away, so memory use does not grow with the size of the stack. With
+    encode_workers the pages are encoded in worker processes (handed over in
+    shared memory) while the feeder keeps scanning, and written in order.
+
+    Args:
+        output_path (str): Where to write the PDF
+        scanner_name (str, optional): Scanner to use, the default one when None
+        on_page (callable, optional): Called as on_page(page_number, image) for each page that goes into the PDF
+        skip_blank (bool): Leave out blank pages (e.g. the empty backs of a duplex scan)
+        blank_threshold (float, optional): Ink coverage below which a page is blank,
+            lib.blank_page.DEFAULT_THRESHOLD when None
+        on_blank (callable, optional): Called as on_blank(image) for each page left out
+        cleanup (dict, optional): lib.cleanup.clean_page() options; when given, the
+            (non-blank) pages are cleaned up in a process pool while the feeder keeps scanning
+        cleanup_workers (int, optional): Clean-up processes, one per core when None
+        compact (bool): Store each page in the most compact form for what is on it
+            (bilevel text, grayscale or colour, see lib.page_format)
+        encode_workers (int, optional): Encoding processes; 0 encodes on the calling
+            thread, None one per core (lib.process_pool.DEFAULT_WORKERS)
+
+    Returns:
+        int: Number of pages written
+    """
+    pages = scan_pages(scanner_name)
+    if skip_blank:
+        # NumPy is only loaded when blank pages are being looked for
+        from lib.blank_page import DEFAULT_THRESHOLD
+        threshold = DEFAULT_THRESHOLD if blank_threshold is None else blank_threshold
+        pages = _without_blank_pages(pages, threshold, on_blank)
+    if cleanup is not None:
+        from lib.cleanup import clean_pages
+        pages = clean_pages(pages, cleanup_workers, **cleanup)
+    if encode_workers is None:
+        from lib.process_pool import DEFAULT_WORKERS
+        encode_workers = DEFAULT_WORKERS
+    writer = PdfPageWriter(output_path, compact=compact)
+    if encode_workers:
+        for page in encode_pdf_pages(_announced(pages, on_page), encode_workers, compact):
+            writer.add_encoded(page)
+        return writer.pages
+    for page in pages:
+        try:
+            writer.add_page(page)
+            if on_page:
+                on_page(writer.pages, page)
+        finally:
+            page.close()
+    return writer.pages
+
+def _announced(pages, on_page=None):
+    for number, page in enumerate(pages, 1):
+        if on_page:
+            on_page(number, page)
+        yield page
+
+def _without_blank_pages(pages, threshold, on_blank=None):
+    from lib.blank_page import is_blank
+    for page in pages:
+        if is_blank(page, threshold):
+            if on_blank:
+                on_blank(page)
+            page.close()
+        else:
+            yield page
         
 
-def upload_to_paperlessngx(file_path, api_url, api_token, filename=None):
-    headers = {
-        "Authorization": f"Token {api_token}"
-    }
-    files = {
-        "document": open(file_path, "rb")
-    }
-    
-    # Prepare data with filename if provided
-    data = {}
-    if filename:
-        # Remove file extension for the title
-        title = os.path.splitext(filename)[0]
-        data["title"] = title
-    
-    response = requests.post(f"{api_url}/api/documents/post_document/", headers=headers, files=files, data=data)
-    # close the file
-    files["document"].close()
-    if response.status_code == 200:
-        print("Upload successful:", response.json())
-        return True, None, None
-    else:
-        print("Upload failed:", response.status_code, response.json())
-        return False,response.status_code, response.json()
-        # close the file
+# connections kept open per Paperless host; enough for the upload workers plus the UI
+DEFAULT_POOL_SIZE = 8
+# checksums asked about per /api/documents/ request
+CHECKSUM_BATCH_SIZE = 50
+# a checksum no document has, used to find out whether the server filters on checksum__in
+_NO_CHECKSUM = '0' * 32
+
+def file_checksum(file_path, chunk_size=1024 * 1024):
+    """
+    MD5 of a file, the checksum Paperless-ngx stores for each original document.
+    The file is read once in chunks, so memory use does not grow with its size.
+    """
+    digest = hashlib.md5(usedforsecurity=False)
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class PaperlessClient:
+    """
+    Paperless-ngx API client that reuses its connections.
+
+    All requests go through one requests.Session whose connection pool keeps
+    sockets (and TLS sessions) alive between uploads. The client holds no
+    per-request state, so a single instance can be shared by the upload
+    worker threads.
+
+    Args:
+        api_url (str): Paperless-ngx base URL (e.g. http://localhost:8010)
+        api_token (str): Paperless-ngx API token
+        pool_size (int): Maximum number of connections kept open to the server
+    """
+
+    def __init__(self, api_url, api_token, pool_size=DEFAULT_POOL_SIZE):
+        self.api_url = api_url.rstrip('/') if api_url else api_url
+        self.api_token = api_token
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Token {api_token}"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # whether the server understands checksum__in; None until that is proven either way
+        self.checksum_in_supported = None
+
+    def upload(self, file_path, filename=None, progress=None):
+        """
+        Upload a document to Paperless-ngx.
+
+        The request body is streamed from disk, so memory use does not grow
+        with the size of the document.
+
+        Args:
+            file_path (str): Path of the document to upload
+            filename (str, optional): Filename used as the document title
+            progress (callable, optional): Called as progress(bytes_sent, total_bytes) while uploading
+
+        Returns:
+            tuple: (success, status_code, response) - on success status_code is None and response
+            is the id of the consumption task Paperless queued for the document (None if the
+            server did not return one)
+        """
+        # Prepare data with filename if provided
+        data = {}
+        if filename:
+            # Remove file extension for the title
+            title = os.path.splitext(filename)[0]
+            data["title"] = title
+
+        with open(file_path, "rb") as document:
+            body = MultipartEncoder(
+                fields=data,
+                files={"document": (os.path.basename(file_path), document, "application/octet-stream")},
+                callback=progress,
+            )
+            response = self.session.post(f"{self.api_url}/api/documents/post_document/", data=body, headers={"Content-Type": body.content_type})
+        if response.status_code == 200:
+            task_id = response.json()
+            print("Upload successful:", task_id)
+            # post_document answers with the UUID of the consume task
+            return True, None, task_id if isinstance(task_id, str) else None
+        else:
+            print("Upload failed:", response.status_code, response.json())
+            return False,response.status_code, response.json()
+
+    def count_documents(self, **filters):
+        """Number of documents matching the given /api/documents/ filters (e.g. checksum__iexact=...)"""
+        response = self.session.get(f"{self.api_url}/api/documents/", params={**filters, "page_size": 1, "fields": "id"}, timeout=30)
+        response.raise_for_status()
+        return response.json().get("count", 0)
+
+    def existing_checksums(self, checksums, batch_size=CHECKSUM_BATCH_SIZE):
+        """
+        Find out which checksums Paperless already has a document for.
+
+        The documents API does not return checksums, so a batch is asked
+        about with one checksum__in query and judged by its count: none or
+        all of them found settles the whole batch in one request, a mixed
+        answer is split in two and each half asked again. Servers that
+        ignore checksum__in are asked one checksum__iexact query per checksum.
+
+        A count of none is right whether or not the filter is applied (a
+        server ignoring it has no documents at all). Anything else is only
+        read as a count of matches once the filter has been seen to narrow
+        the documents of a non-empty server down, so a server that ignores
+        it never has new files reported as uploaded.
+
+        Args:
+            checksums (iterable): MD5 checksums (see file_checksum)
+            batch_size (int): Checksums per request
+
+        Returns:
+            set: The checksums that already exist
+
+        Raises:
+            requests.RequestException: When the server cannot be reached or answers with an error
+        """
+        checksums = list(dict.fromkeys(checksums))
+        found = set()
+        for start in range(0, len(checksums), batch_size):
+            found |= self._find_checksums(checksums[start:start + batch_size])
+        return found
+
+    def _find_checksums(self, checksums):
+        if self.checksum_in_supported is False:
+            return {checksum for checksum in checksums if self.count_documents(checksum__iexact=checksum)}
+        count = self.count_documents(checksum__in=",".join(checksums))
+        if count == 0:
+            return set()
+        if self.checksum_in_supported is None:
+            # the server has documents: a working filter finds none for a checksum nobody has
+            self.checksum_in_supported = self.count_documents(checksum__in=_NO_CHECKSUM) == 0
+            if not self.checksum_in_supported:
+                return self._find_checksums(checksums)
+        if count > len(checksums):
+            # the filter was ignored and every document counted
+            self.checksum_in_supported = False
+            return self._find_checksums(checksums)
+        if count == len(checksums):
+            return set(checksums)
+        middle = len(checksums) // 2
+        return self._find_checksums(checksums[:middle]) | self._find_checksums(checksums[middle:])
+
+    def get_tasks(self, task_ids):
+        """
+        Fetch the state of several consumption tasks in one request.
+
+        Args:
+            task_ids (list): Task UUIDs as returned by upload()
+
+        Returns:
+            list: Task dicts (task_id, status, result, related_document...) for the ids Paperless knows
+
+        Raises:
+            requests.RequestException: When the server cannot be reached or answers with an error
+        """
+        response = self.session.get(f"{self.api_url}/api/tasks/", params={"task_id__in": ",".join(task_ids)}, timeout=30)
+        response.raise_for_status()
+        tasks = response.json()
+        if isinstance(tasks, dict):  # paginated answer
+            tasks = tasks.get("results", [])
+        wanted = set(task_ids)
+        # servers that do not know the filter answer with every task
+        return [task for task in tasks if task.get("task_id") in wanted]
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_url, api_token):
+    """Return the shared PaperlessClient for this server and token, creating it on first use"""
+    key = (api_url, api_token)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = PaperlessClient(api_url, api_token)
+        return client
+
+def close_clients():
+    """Close every shared PaperlessClient (e.g. after the credentials change)"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+def upload_to_paperlessngx(file_path, api_url, api_token, filename=None, progress=None):
+    return get_client(api_url, api_token).upload(file_path, filename, progress)
 
 # testing only
 if __name__ == "__main__":
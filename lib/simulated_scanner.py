@@ -0,0 +1,138 @@
+"""Simulated scanner backend producing synthetic document pages, for load tests and CI"""
+# pylint: disable=C0301, W0311, C0303
+import io
+import random
+import threading
+import time
+
+from PIL import Image, ImageDraw
+
+from lib.document import Document
+
+A4_INCHES = (8.27, 11.69)
+
+
+def make_page(dpi=300, color=True, seed=0, paper=A4_INCHES):
+    """
+    Draw a page (A4 by default) that looks enough like a scanned letter: a title,
+    paragraphs of 'text' lines, a table and (in color) a logo and a stamp.
+
+    Args:
+        dpi (int): Scan resolution; 600 gives a 4960x7016 page
+        color (bool): RGB with colored elements, or grayscale ('L')
+        seed (int): Varies the text layout, so pages differ from each other
+        paper (tuple): (width, height) in inches
+
+    Returns:
+        PIL.Image: The page
+    """
+    rng = random.Random(seed)
+    width, height = int(paper[0] * dpi), int(paper[1] * dpi)
+    unit = dpi / 100
+    page = Image.new('RGB', (width, height), (250, 248, 242))
+    draw = ImageDraw.Draw(page)
+
+    margin = int(60 * unit)
+    # logo and title
+    draw.rectangle([margin, margin, margin + 120 * unit, margin + 60 * unit], fill=(20, 80, 160))
+    draw.rectangle([margin + 160 * unit, margin + 10 * unit, margin + 560 * unit, margin + 40 * unit], fill=(30, 30, 30))
+
+    # paragraphs of text-like lines
+    y = margin + 120 * unit
+    line_height = 14 * unit
+    while y < height * 0.6:
+        x = margin
+        for _ in range(rng.randint(8, 14)):
+            word = rng.randint(15, 60) * unit
+            if x + word > width - margin:
+                break
+            draw.rectangle([x, y, x + word, y + 7 * unit], fill=(40, 40, 40))
+            x += word + 6 * unit
+        y += line_height
+        if rng.random() < 0.1:
+            y += line_height
+
+    # table
+    top = int(height * 0.65)
+    rows, cols = 8, 4
+    cell_w = (width - 2 * margin) / cols
+    for r in range(rows + 1):
+        draw.line([margin, top + r * 20 * unit, width - margin, top + r * 20 * unit], fill=(60, 60, 60), width=max(1, int(unit)))
+    for c in range(cols + 1):
+        draw.line([margin + c * cell_w, top, margin + c * cell_w, top + rows * 20 * unit], fill=(60, 60, 60), width=max(1, int(unit)))
+
+    # stamp
+    cx, cy, radius = width * 0.75, height * 0.88, 50 * unit
+    draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], outline=(200, 30, 30), width=int(4 * unit))
+
+    # scanner noise
+    noise = Image.effect_noise((width // 4, height // 4), 12).resize((width, height))
+    page = Image.blend(page, Image.merge('RGB', (noise, noise, noise)), 0.06)
+    page.info['dpi'] = (dpi, dpi)
+    return page if color else page.convert('L')
+
+
+# Settings of the simulated scanner, see configure()
+SETTINGS = {
+    'dpi': 300,
+    'color': True,
+    'paper': A4_INCHES,
+    'pages': 10,         # pages in the document feeder per batch scan
+    'delay': 0.0,        # seconds each page takes to "scan"
+    'variants': 4,       # distinct pages drawn, then reused round-robin
+    'quality': 90,       # JPEG quality of what the scanner hands over
+}
+SCANNER_NAMES = ["Simulated Scanner"]
+
+_pages = {}
+_counter = 0
+_lock = threading.Lock()
+
+
+def configure(**options):
+    """
+    Change the simulated scanner, e.g. configure(dpi=600, color=False, pages=200, delay=0.5).
+
+    Raises:
+        KeyError: For an unknown setting
+    """
+    for name, value in options.items():
+        if name not in SETTINGS:
+            raise KeyError(f"Unknown simulated scanner setting: {name}")
+        SETTINGS[name] = tuple(value) if name == 'paper' else value
+    with _lock:
+        _pages.clear()
+
+
+def list_scanners():
+    return list(SCANNER_NAMES)
+
+
+def _next_page():
+    """JPEG bytes of the next page. Drawing a page is slow, so a few variants are drawn once and reused."""
+    global _counter
+    with _lock:
+        variant = _counter % max(1, SETTINGS['variants'])
+        _counter += 1
+        if variant not in _pages:
+            page = make_page(SETTINGS['dpi'], SETTINGS['color'], seed=variant, paper=SETTINGS['paper'])
+            buffer = io.BytesIO()
+            page.save(buffer, format='JPEG', quality=SETTINGS['quality'], dpi=(SETTINGS['dpi'], SETTINGS['dpi']))
+            _pages[variant] = buffer.getvalue()
+        data = _pages[variant]
+    if SETTINGS['delay']:
+        time.sleep(SETTINGS['delay'])
+    return data
+
+
+def scan_image(scanner_name=None):
+    """Scan one page; like WIA the page arrives as JPEG bytes"""
+    return Document.from_bytes(_next_page())
+
+
+def scan_pages(scanner_name=None):
+    """Yield SETTINGS['pages'] pages from the simulated document feeder"""
+    for _ in range(SETTINGS['pages']):
+        image = Image.open(io.BytesIO(_next_page()))
+        image.load()
+        yield image
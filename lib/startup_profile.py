@@ -0,0 +1,67 @@
+"""Wall-clock and CPU timings for the phases of application start-up"""
+# pylint: disable=C0301, W0311, C0303
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+
+class StartupProfile:
+    """
+    Records how long each start-up phase took.
+
+    The clock starts when the profile is created; every mark() closes the
+    phase that ran since the previous mark. Marking is cheap, so the app
+    always records and only writes the report when asked to.
+
+    Usage:
+        profile = StartupProfile()
+        load_config()
+        profile.mark('load_config')
+        profile.write('startup.json')
+    """
+
+    def __init__(self):
+        self.started = datetime.datetime.now(datetime.timezone.utc)
+        # CPU the interpreter spent before we got here (start-up, site, ...)
+        self.interpreter_cpu = time.process_time()
+        self.phases = []
+        self._wall = time.perf_counter()
+        self._cpu = self.interpreter_cpu
+        self._start_wall = self._wall
+        self._start_cpu = self._cpu
+
+    def mark(self, name):
+        """Close the current phase under name and start the next one"""
+        wall, cpu = time.perf_counter(), time.process_time()
+        self.phases.append({
+            'name': name,
+            'wall_ms': round((wall - self._wall) * 1000, 3),
+            'cpu_ms': round((cpu - self._cpu) * 1000, 3),
+        })
+        self._wall, self._cpu = wall, cpu
+
+    def report(self):
+        """
+        Returns:
+            dict: The timings plus enough context to compare runs between releases
+        """
+        return {
+            'version': os.getenv('APP_VERSION', 'v0.0.1'),
+            'started': self.started.isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'frozen': bool(getattr(sys, 'frozen', False)),
+            'interpreter_cpu_ms': round(self.interpreter_cpu * 1000, 3),
+            'phases': self.phases,
+            'total_wall_ms': round((self._wall - self._start_wall) * 1000, 3),
+            'total_cpu_ms': round((self._cpu - self._start_cpu) * 1000, 3),
+        }
+
+    def write(self, path):
+        """Write the report as JSON"""
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=2)
+            file.write('\n')
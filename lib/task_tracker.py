@@ -0,0 +1,198 @@
+"""Follow Paperless-ngx consumption tasks after upload until the document is consumed or rejected"""
+# pylint: disable=C0301, W0311, C0303, W0718
+import threading
+import time
+
+from lib.scanner import get_client
+
+# Paperless task states (celery's)
+PENDING = 'PENDING'
+STARTED = 'STARTED'
+SUCCESS = 'SUCCESS'
+FAILURE = 'FAILURE'
+REVOKED = 'REVOKED'
+# given up on: Paperless never reported a final state within max_age
+UNKNOWN = 'UNKNOWN'
+
+FINAL_STATES = (SUCCESS, FAILURE, REVOKED, UNKNOWN)
+
+# task ids per /api/tasks/ request, keeps the query string well under common URL limits
+DEFAULT_BATCH_SIZE = 50
+
+
+class TrackedTask:
+    """The consumption task of one uploaded document"""
+
+    def __init__(self, task_id, api_url, api_token, name=None, delay=1.0):
+        self.task_id = task_id
+        self.api_url = api_url
+        self.api_token = api_token
+        self.name = name or task_id
+        self.status = PENDING
+        self.result = None
+        self.document_id = None
+        self.polls = 0
+        self.created = time.monotonic()
+        self.delay = delay
+        self.next_poll = self.created + delay
+
+    @property
+    def finished(self):
+        return self.status in FINAL_STATES
+
+    @property
+    def duplicate(self):
+        return self.status == FAILURE and 'duplicate' in str(self.result or '').lower()
+
+    @property
+    def summary(self):
+        """Short consume status shown to the user"""
+        if self.status == SUCCESS:
+            return 'consumed'
+        if self.duplicate:
+            return 'duplicate'
+        if self.status in (FAILURE, REVOKED):
+            return 'rejected'
+        if self.status == UNKNOWN:
+            return 'unknown'
+        return 'consuming'
+
+
+class TaskTracker:
+    """
+    Poll /api/tasks/ on a background thread until every tracked upload has
+    been consumed or rejected by Paperless.
+
+    Tasks that are due together share requests (up to batch_size ids per
+    request, one request per server; a task that is nearly due joins an
+    earlier request rather than getting its own), and each task waits twice as long
+    between polls as the last time, up to max_delay, so hundreds of
+    outstanding tasks cost a handful of requests every few seconds.
+
+    Args:
+        batch_size (int): Task ids per request
+        initial_delay (float): Seconds before a task is first polled
+        max_delay (float): Longest wait between two polls of a task
+        backoff (float): Factor the wait grows by after each unfinished poll
+        max_age (float): Seconds after which a task that never finished is marked UNKNOWN
+        fetch (callable, optional): fetch(api_url, api_token, task_ids) -> list of task dicts,
+            mostly here for testing; PaperlessClient.get_tasks by default
+        on_finished (callable, optional): Called with the TrackedTask once it is final. Runs on the tracker thread.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, initial_delay=1.0, max_delay=30.0, backoff=2.0,
+                 max_age=3600.0, fetch=None, on_finished=None):
+        self.batch_size = max(1, int(batch_size))
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.max_age = max_age
+        self.fetch = fetch or (lambda api_url, api_token, task_ids: get_client(api_url, api_token).get_tasks(task_ids))
+        self.on_finished = on_finished
+        self.requests = 0
+        self._tasks = {}
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._added = False
+        self._thread = None
+
+    def track(self, api_url, api_token, task_id, name=None):
+        """Start following a task; returns its TrackedTask (the same one when tracked twice)"""
+        with self._condition:
+            task = self._tasks.get(task_id)
+            if task is None:
+                task = self._tasks[task_id] = TrackedTask(task_id, api_url, api_token, name, self.initial_delay)
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="task-tracker", daemon=True)
+                self._thread.start()
+            self._added = True
+            self._condition.notify()
+        return task
+
+    def tasks(self):
+        """Return all tracked tasks in the order they were tracked"""
+        with self._condition:
+            return list(self._tasks.values())
+
+    def pending(self):
+        """Number of tasks Paperless has not finished yet"""
+        with self._condition:
+            return sum(1 for task in self._tasks.values() if not task.finished)
+
+    def forget(self, task_id):
+        with self._condition:
+            self._tasks.pop(task_id, None)
+
+    def stop(self, wait=False):
+        """Stop polling"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if wait and thread is not None:
+            thread.join()
+
+    def poll_due(self, now=None):
+        """
+        Poll every task that is due, batched per server.
+
+        Returns:
+            float: Seconds until the next task is due (None when nothing is left to poll)
+        """
+        now = time.monotonic() if now is None else now
+        with self._condition:
+            # tasks in their last half of waiting ride along, so uploads a few seconds apart share requests
+            due = [task for task in self._tasks.values() if not task.finished and task.next_poll - task.delay / 2 <= now]
+        groups = {}
+        for task in due:
+            groups.setdefault((task.api_url, task.api_token), []).append(task)
+        finished = []
+        for (api_url, api_token), group in groups.items():
+            for start in range(0, len(group), self.batch_size):
+                finished.extend(self._poll_batch(api_url, api_token, group[start:start + self.batch_size], now))
+        for task in finished:
+            if self.on_finished:
+                try:
+                    self.on_finished(task)
+                except Exception as e:
+                    print(f"Error handling consumed document {task.name}: {str(e)}")
+        with self._condition:
+            waiting = [task.next_poll for task in self._tasks.values() if not task.finished]
+        return max(0.0, min(waiting) - time.monotonic()) if waiting else None
+
+    def _poll_batch(self, api_url, api_token, batch, now):
+        self.requests += 1
+        try:
+            states = {state.get('task_id'): state for state in self.fetch(api_url, api_token, [task.task_id for task in batch])}
+        except Exception as e:
+            print(f"Error checking Paperless tasks: {str(e)}")
+            states = {}
+        finished = []
+        with self._condition:
+            for task in batch:
+                task.polls += 1
+                state = states.get(task.task_id)
+                if state is not None:
+                    task.status = state.get('status') or task.status
+                    task.result = state.get('result')
+                    task.document_id = state.get('related_document')
+                if not task.finished and now - task.created >= self.max_age:
+                    task.status = UNKNOWN
+                if task.finished:
+                    finished.append(task)
+                else:
+                    task.delay = min(self.max_delay, task.delay * self.backoff)
+                    task.next_poll = now + task.delay
+        return finished
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+            wait = self.poll_due()
+            with self._condition:
+                # a task tracked while polling may be due before the wait computed above
+                if not self._added and not self._stopped:
+                    self._condition.wait(wait)
+                self._added = False
@@ -0,0 +1,202 @@
+"""Background upload queue for sending documents to Paperless-ngx"""
+# pylint: disable=C0301, W0311, C0303, W0718
+import itertools
+import os
+import queue
+import threading
+
+from lib.scanner import upload_to_paperlessngx
+
+# job states
+PENDING = 'pending'
+UPLOADING = 'uploading'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+# skipped, Paperless already has a document with the same content
+DUPLICATE = 'duplicate'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED, DUPLICATE)
+
+
+class UploadJob:
+    """A single document waiting for (or going through) upload."""
+
+    def __init__(self, job_id, file_path, api_url, api_token, filename=None, remove_after=False):
+        self.id = job_id
+        self.file_path = file_path
+        self.api_url = api_url
+        self.api_token = api_token
+        self.filename = filename
+        # delete file_path once the job is done, skipped or cancelled (used for
+        # staged scan copies); a failed upload keeps it so it can be sent again
+        self.remove_after = remove_after
+        self.status = PENDING
+        self.progress = 0.0
+        self.error = None
+        # Paperless consumption task queued for the document, once uploaded
+        self.task_id = None
+
+    @property
+    def name(self):
+        """Name shown to the user for this job"""
+        return self.filename or os.path.basename(self.file_path)
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+
+class UploadQueue:
+    """
+    Upload documents on a pool of worker threads so the caller never blocks
+    on the HTTP round trip.
+
+    Args:
+        workers (int): Number of uploads allowed to run at the same time.
+        upload_func (callable): Function with the signature of
+            lib.scanner.upload_to_paperlessngx, mostly here for testing.
+        on_finished (callable, optional): Called with the UploadJob once it is
+            done, failed or skipped as a duplicate. Runs on the worker thread.
+        duplicates (lib.dedupe.DuplicateChecker, optional): When given, each
+            file is checked against Paperless before upload and skipped if its
+            content is already there. The worker asks about the jobs waiting
+            behind it in the same request.
+    """
+
+    def __init__(self, workers=2, upload_func=upload_to_paperlessngx, on_finished=None, duplicates=None):
+        self.upload_func = upload_func
+        self.on_finished = on_finished
+        self.duplicates = duplicates
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._threads = []
+        for i in range(max(1, int(workers))):
+            thread = threading.Thread(target=self._worker, name=f"upload-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def workers(self):
+        return len(self._threads)
+
+    def submit(self, file_path, api_url, api_token, filename=None, remove_after=False):
+        """Queue a document for upload and return its UploadJob right away."""
+        job = UploadJob(next(self._ids), file_path, api_url, api_token, filename, remove_after)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a job that has not started uploading yet.
+
+        Returns:
+            bool: True if the job was cancelled, False if it was unknown or already running/finished
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != PENDING:
+                return False
+            job.status = CANCELLED
+        self._discard(job)
+        return True
+
+    def jobs(self):
+        """Return all known jobs in submission order"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def depth(self):
+        """Number of jobs that are still waiting or uploading"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def clear_finished(self):
+        """Forget about jobs that are done, failed or cancelled"""
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished]:
+                del self._jobs[job_id]
+
+    def forget(self, job_id):
+        """Forget one finished job, e.g. once a long-running caller has dealt with it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.finished:
+                return False
+            del self._jobs[job_id]
+            return True
+
+    def shutdown(self, wait=False):
+        """Cancel anything still pending and stop the workers."""
+        for job in self.jobs():
+            self.cancel(job.id)
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != PENDING:
+                    continue
+                job.status = UPLOADING
+            self._run(job)
+
+    def _run(self, job):
+        def report(sent, total):
+            job.progress = sent / total if total else 1.0
+
+        try:
+            if self._is_duplicate(job):
+                job.progress = 1.0
+                job.status = DUPLICATE
+                return
+            success, status_code, response = self.upload_func(job.file_path, job.api_url, job.api_token, job.filename, progress=report)
+            if success:
+                job.task_id = response
+                job.progress = 1.0
+                job.status = DONE
+            else:
+                job.error = f"{status_code} {response}"
+                job.status = FAILED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            if job.status != FAILED:
+                self._discard(job)
+            self._notify(job)
+
+    def _notify(self, job):
+        if self.on_finished:
+            try:
+                self.on_finished(job)
+            except Exception as e:
+                print(f"Error handling finished upload {job.name}: {str(e)}")
+
+    def _is_duplicate(self, job):
+        duplicates = self.duplicates
+        if duplicates is None:
+            return False
+        with self._lock:
+            waiting = [other for other in self._jobs.values()
+                       if other.status == PENDING and other.api_url == job.api_url]
+        batch = [job.file_path] + [other.file_path for other in waiting[:duplicates.batch_size - 1]]
+        return job.file_path in duplicates.find_duplicates(job.api_url, job.api_token, batch)
+
+    @staticmethod
+    def _discard(job):
+        if job.remove_after and os.path.exists(job.file_path):
+            try:
+                os.remove(job.file_path)
+            except OSError as e:
+                print(f"Could not remove staged upload {job.file_path}: {str(e)}")
@@ -0,0 +1,254 @@
+"""Headless hot-folder watcher that uploads new documents to Paperless-ngx (Linux only)"""
+# pylint: disable=C0301, W0311, C0303, W0718
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import shutil
+import struct
+import threading
+import time
+
+from lib.scanner import upload_to_paperlessngx
+from lib.upload_queue import UploadQueue, DONE, DUPLICATE
+
+# inotify event masks, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o0004000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+# files that are still being written by most copy tools / scanners
+IGNORED_SUFFIXES = ('.tmp', '.part', '.partial', '.crdownload', '~')
+
+
+class Inotify:
+    """
+    Minimal ctypes wrapper around the Linux inotify API.
+
+    Raises:
+        OSError: When inotify is not available (e.g. not running on Linux)
+    """
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform")
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read(self, timeout=None):
+        """
+        Wait up to timeout seconds for events.
+
+        Returns:
+            list: (wd, mask, cookie, name) tuples, empty if the timeout expired
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class HotFolderWatcher:
+    """
+    Upload every document dropped into a folder.
+
+    A file is picked up when its writer closes it (IN_CLOSE_WRITE) or when it
+    is moved into the folder (IN_MOVED_TO), and only after no further writes
+    were seen for ``settle`` seconds. Uploads run on an UploadQueue with a
+    bounded number of workers; the directory itself is only listed once at
+    start-up (and again if the kernel event queue overflows).
+
+    Args:
+        directory (str): Folder to watch
+        api_url (str): Paperless-ngx base URL
+        api_token (str): Paperless-ngx API token
+        workers (int): Number of concurrent uploads
+        done_dir (str, optional): Move uploaded files here instead of deleting them
+        failed_dir (str, optional): Move files that failed to upload here (they stay put otherwise)
+        settle (float): Seconds without writes before a closed file is uploaded
+        upload_func (callable): Upload function, mostly here for testing
+        duplicates (lib.dedupe.DuplicateChecker, optional): Skip files Paperless already has;
+            they are treated like uploaded ones (deleted or moved to done_dir)
+    """
+
+    def __init__(self, directory, api_url, api_token, workers=4, done_dir=None, failed_dir=None,
+                 settle=1.0, upload_func=upload_to_paperlessngx, duplicates=None):
+        self.directory = os.path.abspath(directory)
+        self.api_url = api_url
+        self.api_token = api_token
+        self.done_dir = done_dir
+        self.failed_dir = failed_dir
+        self.settle = settle
+        self.queue = UploadQueue(workers=workers, upload_func=upload_func, on_finished=self._finished, duplicates=duplicates)
+        self.uploaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self._due = {}  # path -> time it can be uploaded
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._inotify = None
+        self._watch = None  # watch descriptor of the folder
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start watching and queue the files that are already in the folder"""
+        for path in (self.done_dir, self.failed_dir):
+            if path:
+                os.makedirs(path, exist_ok=True)
+        self._inotify = Inotify()
+        self._watch = self._inotify.add_watch(self.directory, IN_CLOSE_WRITE | IN_MOVED_TO | IN_MODIFY)
+        self._scan_directory()
+
+    def run(self):
+        """
+        Process events until stop() is called.
+
+        Raises:
+            OSError: When the folder is deleted or unmounted and the kernel drops its watch
+        """
+        if self._inotify is None:
+            self.start()
+        try:
+            while not self._stop.is_set():
+                for wd, mask, _, name in self._inotify.read(self._next_timeout()):
+                    if mask & IN_IGNORED and wd == self._watch:
+                        # nothing will ever arrive on this watch again
+                        raise OSError(errno.ENOENT, "Watched folder was removed or unmounted", self.directory)
+                    self._handle_event(mask, name)
+                self._submit_due()
+        finally:
+            self._inotify.close()
+
+    def stop(self, wait=True):
+        """Stop watching; uploads already running are allowed to finish when wait is True"""
+        self._stop.set()
+        self.queue.shutdown(wait=wait)
+
+    def _handle_event(self, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            print("Watcher event queue overflowed, rescanning folder")
+            self._scan_directory()
+            return
+        if mask & (IN_ISDIR | IN_IGNORED) or not name:
+            return
+        if mask & IN_MODIFY:
+            # still being written, wait for the close
+            self._due.pop(os.path.join(self.directory, name), None)
+            return
+        self._schedule(name)
+
+    def _schedule(self, name):
+        if name.startswith('.') or name.lower().endswith(IGNORED_SUFFIXES):
+            return
+        path = os.path.join(self.directory, name)
+        self._due[path] = time.monotonic() + self.settle
+
+    def _scan_directory(self):
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    self._schedule(entry.name)
+
+    def _next_timeout(self):
+        if not self._due:
+            # wake up now and then so stop() is noticed
+            return 0.5
+        return max(0.0, min(min(self._due.values()) - time.monotonic(), 0.5))
+
+    def _submit_due(self):
+        now = time.monotonic()
+        for path in [p for p, due in self._due.items() if due <= now]:
+            del self._due[path]
+            with self._lock:
+                if path in self._in_flight or not os.path.isfile(path):
+                    continue
+                self._in_flight.add(path)
+            self.queue.submit(path, self.api_url, self.api_token, os.path.basename(path))
+
+    def _finished(self, job):
+        try:
+            if job.status in (DONE, DUPLICATE):
+                print(f"Uploaded {job.file_path}" if job.status == DONE else f"Already in Paperless, skipped {job.file_path}")
+                if self.done_dir:
+                    shutil.move(job.file_path, unique_path(self.done_dir, os.path.basename(job.file_path)))
+                else:
+                    os.remove(job.file_path)
+            else:
+                print(f"Upload of {job.file_path} failed: {job.error}")
+                if self.failed_dir:
+                    shutil.move(job.file_path, unique_path(self.failed_dir, os.path.basename(job.file_path)))
+        finally:
+            # the watcher runs indefinitely: keep the queue down to the jobs still in progress
+            self.queue.forget(job.id)
+            with self._lock:
+                self._in_flight.discard(job.file_path)
+                if job.status == DONE:
+                    self.uploaded += 1
+                elif job.status == DUPLICATE:
+                    self.skipped += 1
+                else:
+                    self.failed += 1
+
+
+def unique_path(directory, name):
+    """Path for name in directory that does not replace an existing file (report.pdf, report_1.pdf, ...)"""
+    stem, extension = os.path.splitext(name)
+    path = os.path.join(directory, name)
+    number = 0
+    while os.path.exists(path):
+        number += 1
+        path = os.path.join(directory, f"{stem}_{number}{extension}")
+    return path
+
+
+def watch(directory, api_url, api_token, workers=4, done_dir=None, failed_dir=None, settle=1.0, duplicates=None):
+    """Run the hot-folder watcher in the foreground until interrupted"""
+    watcher = HotFolderWatcher(directory, api_url, api_token, workers=workers,
+                               done_dir=done_dir, failed_dir=failed_dir, settle=settle, duplicates=duplicates)
+    watcher.start()
+    print(f"Watching {watcher.directory} with {workers} upload worker(s), press Ctrl+C to stop")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print("Stopping, waiting for running uploads to finish...")
+    finally:
+        watcher.stop(wait=True)
+        print(f"Uploaded {watcher.uploaded} file(s), {watcher.skipped} already in Paperless, {watcher.failed} failed")
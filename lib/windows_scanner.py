@@ -1,9 +1,19 @@
 from PIL import Image
 import win32com.client
-import os
+import pythoncom
+import pywintypes
+import io
+from lib.document import Document
 # Windows only functionality
 # pylint: disable=E1101, C0301, W0311, C0303, W0718
 
+# WIA constants, see https://learn.microsoft.com/en-us/windows/win32/wia/-wia-wia-property-constant-definitions
+WIA_DPS_DOCUMENT_HANDLING_SELECT = 3088
+WIA_DPS_PAGES = 3096
+FEEDER = 0x001
+WIA_FORMAT_JPEG = "{B96B3CAE-0728-11D3-9D7B-0000F81EF32E}"
+WIA_ERROR_PAPER_EMPTY = -2145320957  # 0x80210003
+
 def list_scanners():
         wia = win32com.client.Dispatch("WIA.DeviceManager")
         devices = wia.DeviceInfos
@@ -13,20 +23,59 @@ def list_scanners():
                 scanners.append(device.Properties("Name").Value)
         return scanners
 
-def scan_image():
-    """Scan an image and return a PIL Image object"""
-    ## cleanup previous temp files. this should never be the case but just in case
-    if os.path.exists('tmp.jpg'):
-        os.remove('tmp.jpg')
+def scan_image(scanner_name=None):
+    """Scan an image and return it as a Document (the WIA dialog picks the scanner)"""
+    # scans run on a worker thread, which needs COM set up for itself
+    pythoncom.CoInitialize()
     wia = win32com.client.Dispatch("WIA.CommonDialog")
-    wia_image = wia.ShowAcquireImage()
+    # ask for JPEG (the default is BMP) and keep the scanner's bytes: saving or
+    # uploading the page as JPEG then needs no encode at all
+    wia_image = wia.ShowAcquireImage(FormatID=WIA_FORMAT_JPEG)
     
     if wia_image is None:
         return None
 
-    temp_path = 'tmp.jpg'
-    wia_image.SaveFile(temp_path)
+    return Document.from_bytes(bytes(wia_image.FileData.BinaryData))
+
+def connect_scanner(scanner_name=None):
+    """Connect to the scanner with the given name (or the first scanner found)"""
+    wia = win32com.client.Dispatch("WIA.DeviceManager")
+    for device in wia.DeviceInfos:
+        if device.Type == 1 and (scanner_name is None or device.Properties("Name").Value == scanner_name):
+            return device.Connect()
+    return None
+
+def set_property(properties, property_id, value):
+    for prop in properties:
+        if prop.PropertyID == property_id:
+            prop.Value = value
+            return True
+    return False
+
+def is_paper_empty(error):
+    """True when a WIA transfer failed because the feeder ran out of paper"""
+    hresult = error.args[0] if error.args else None
+    excepinfo = error.args[2] if len(error.args) > 2 else None
+    scode = excepinfo[5] if excepinfo and len(excepinfo) > 5 else None
+    return WIA_ERROR_PAPER_EMPTY in (hresult, scode)
 
-    # Load with PIL
-    pil_image = Image.open(temp_path)
-    return pil_image
\ No newline at end of file
+def scan_pages(scanner_name=None):
+    """Yield each page from the document feeder as a PIL Image until it is empty"""
+    pythoncom.CoInitialize()
+    device = connect_scanner(scanner_name)
+    if device is None:
+        return
+    set_property(device.Properties, WIA_DPS_DOCUMENT_HANDLING_SELECT, FEEDER)
+    set_property(device.Properties, WIA_DPS_PAGES, 1)
+    item = device.Items(1)
+    while True:
+        try:
+            wia_image = item.Transfer(WIA_FORMAT_JPEG)
+        except pywintypes.com_error as e:
+            if is_paper_empty(e):
+                return
+            raise
+        # decode straight from the transferred bytes, no temp file needed
+        pil_image = Image.open(io.BytesIO(bytes(wia_image.FileData.BinaryData)))
+        pil_image.load()
+        yield pil_image
@@ -0,0 +1 @@
+# Benchmarks for the scanner application (run individually, not part of the unit tests)
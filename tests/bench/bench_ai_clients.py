@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: AI filename request latency when a new OpenAI client is built for
+every request (the old behaviour) versus the shared client registry in
+lib.ai, against a local OpenAI-compatible stub.
+
+    python -m tests.bench.bench_ai_clients [--requests 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import openai  # noqa: E402
+
+from lib import ai  # noqa: E402
+from tests.bench.fixtures import make_page  # noqa: E402
+from tests.bench.openai_stub import OpenAIStub  # noqa: E402
+
+
+def fresh_client(api_key, base_url=None):
+    return openai.OpenAI(api_key=api_key, base_url=base_url)
+
+
+def time_requests(image_bytes, base_url, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        ai.apirequest("key", image_bytes, base_url=base_url)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, timings, connections):
+    print(f"{label:<18} mean {statistics.mean(timings) * 1000:7.2f} ms  "
+          f"median {statistics.median(timings) * 1000:7.2f} ms  "
+          f"first {timings[0] * 1000:7.2f} ms  connections {connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="consecutive requests per run")
+    args = parser.parse_args()
+
+    image_bytes = ai.prepare_image_bytes(make_page(dpi=150), "openai")
+    # the stub is on localhost, keep proxies out of it
+    os.environ["NO_PROXY"] = "127.0.0.1"
+
+    with OpenAIStub() as stub, patch.object(ai, "get_openai_client", fresh_client):
+        cold = time_requests(image_bytes, stub.url, args.requests)
+        cold_connections = stub.connections
+
+    ai.invalidate_clients()
+    with OpenAIStub() as stub:
+        warm = time_requests(image_bytes, stub.url, args.requests)
+        warm_connections = stub.connections
+    ai.invalidate_clients()
+
+    print(f"{args.requests} requests with a {len(image_bytes)} byte image")
+    report("client per request", cold, cold_connections)
+    report("shared client", warm, warm_connections)
+    saved = statistics.mean(cold) - statistics.mean(warm)
+    print(f"saved per request: {saved * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: encode time and payload size of the image sent to the AI provider,
+full-resolution JPEG (the old PIL_to_bytes path) versus each provider's
+prepared image.
+
+    python -m tests.bench.bench_ai_payload
+
+With --corpus, every image in a folder is also sent to a real provider twice
+(full resolution and prepared) to record whether the suggested filename
+changes. This needs credentials and costs API calls:
+
+    python -m tests.bench.bench_ai_payload --corpus ~/scans --provider openai --api-key sk-... --output payload.json
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib import ai  # noqa: E402
+from tests.bench.fixtures import make_page  # noqa: E402
+
+FULL_SIZE = {'max_edge': None, 'grayscale': False, 'quality': 75, 'crop_top': None}
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def payload_table():
+    rows = []
+    for dpi in (300, 600):
+        for color in (True, False):
+            page = make_page(dpi, color)
+            label = f"{dpi} dpi {'color' if color else 'gray'}"
+            elapsed, data = timed(lambda: ai.PIL_to_bytes(page))
+            rows.append({'page': label, 'variant': 'full JPEG', 'ms': elapsed * 1000,
+                         'bytes': len(data), 'base64_bytes': len(base64.b64encode(data))})
+            for provider in ai.PREPARE_DEFAULTS:
+                elapsed, data = timed(lambda: ai.prepare_image_bytes(page, provider))
+                rows.append({'page': label, 'variant': provider, 'ms': elapsed * 1000,
+                             'bytes': len(data), 'base64_bytes': len(base64.b64encode(data))})
+    return rows
+
+
+def suggest(provider, image, args):
+    if provider == 'openai':
+        return ai.get_recommended_filename_from_pil_image(image, args.api_key)
+    if provider == 'gemini':
+        return ai.get_recommended_filename_from_pil_image_gemini(image, args.api_key)
+    return ai.get_recommended_filename_from_pil_image_custom(image, args.endpoint, args.model, args.api_key)
+
+
+def compare_corpus(args):
+    prepared_defaults = dict(ai.PREPARE_DEFAULTS[args.provider])
+    results = []
+    for name in sorted(os.listdir(args.corpus)):
+        try:
+            image = Image.open(os.path.join(args.corpus, name))
+            image.load()
+        except OSError:
+            continue
+        ai.PREPARE_DEFAULTS[args.provider] = dict(FULL_SIZE)
+        full = suggest(args.provider, image, args)
+        ai.PREPARE_DEFAULTS[args.provider] = dict(prepared_defaults)
+        prepared = suggest(args.provider, image, args)
+        results.append({'file': name, 'full': full, 'prepared': prepared, 'same': full == prepared})
+        print(f"{name:<40} {'same' if full == prepared else 'DIFFERENT':<10} {full!r} / {prepared!r}")
+    if results:
+        same = sum(r['same'] for r in results)
+        print(f"{same}/{len(results)} filenames unchanged with {args.provider} defaults {prepared_defaults}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="folder of scanned pages to compare suggestions on")
+    parser.add_argument("--provider", choices=sorted(ai.PREPARE_DEFAULTS), default="openai")
+    parser.add_argument("--api-key")
+    parser.add_argument("--endpoint", help="custom provider base URL")
+    parser.add_argument("--model", help="custom provider model")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    rows = payload_table()
+    print(f"{'page':<16} {'variant':<10} {'encode ms':>10} {'bytes':>10} {'base64':>10}")
+    for row in rows:
+        print(f"{row['page']:<16} {row['variant']:<10} {row['ms']:10.1f} {row['bytes']:10d} {row['base64_bytes']:10d}")
+
+    report = {'payload': rows, 'defaults': ai.PREPARE_DEFAULTS}
+    if args.corpus:
+        report['corpus'] = compare_corpus(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Cost and benefit of the page clean-up stage (lib/cleanup.py), on synthetic
+pages tilted by a couple of degrees and framed by the dark scanner
+background, as a feeder delivers them.
+
+    python -m tests.bench.bench_cleanup [--dpi 300] [--pages 8] [--workers 1 2 4] [--repeat 3]
+
+Reports:
+  * each step (background, skew estimate, rotation, crop box, threshold)
+    and the whole clean_page() per page, best of --repeat runs
+  * pages per second through clean_pages() for each --workers count,
+    against cleaning the pages one after the other in this process
+  * what a page costs to store/upload: the raw page as JPEG (quality 90)
+    against the cleaned bilevel page as PNG and as a one-page PDF
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+from PIL import Image, ImageOps
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib import cleanup  # noqa: E402
+from lib.process_pool import shutdown_pool  # noqa: E402
+from tests.bench.fixtures import make_page  # noqa: E402
+
+PAPER = (250, 248, 242)
+
+
+def fed_page(dpi, color=True, seed=0, angle=2.0):
+    """A page as the feeder hands it over: slightly tilted, on the dark background"""
+    page = make_page(dpi, color, seed=seed)
+    page = page.rotate(angle, resample=Image.BICUBIC, fillcolor=PAPER if color else PAPER[0])
+    page = ImageOps.expand(page, border=dpi // 8, fill=(15, 15, 15) if color else 15)
+    page.info['dpi'] = (dpi, dpi)
+    return page
+
+
+def best_ms(run, repeat):
+    run()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def encoded_size(image, fmt, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **params)
+    return buffer.tell()
+
+
+def steps(page, repeat):
+    plain = cleanup.remove_background(page)
+    gray = cleanup._gray(plain)
+    angle = cleanup.estimate_skew(gray)
+    level = cleanup.deskew(gray, angle)
+    return {
+        'background': best_ms(lambda: cleanup.remove_background(page), repeat),
+        'skew estimate': best_ms(lambda: cleanup.estimate_skew(gray), repeat),
+        'rotate': best_ms(lambda: cleanup.deskew(gray, angle), repeat),
+        'crop box': best_ms(lambda: cleanup.content_box(level), repeat),
+        'threshold': best_ms(lambda: cleanup.adaptive_threshold(level), repeat),
+        'clean_page': best_ms(lambda: cleanup.clean_page(page), repeat),
+        'clean_page (no binarize)': best_ms(lambda: cleanup.clean_page(page, binarize=False), repeat),
+    }
+
+
+def throughput(pages, workers):
+    """Pages per second through the pool (started beforehand, start-up is a one-off)"""
+    list(cleanup.clean_pages([page.copy() for page in pages[:workers]], workers=workers))
+    copies = [page.copy() for page in pages]
+    start = time.perf_counter()
+    for _ in cleanup.clean_pages(copies, workers=workers):
+        pass
+    return len(pages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, default=300, help="page resolution (default 300)")
+    parser.add_argument("--pages", type=int, default=8, help="pages pushed through the pool (default 8)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="pool sizes to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per step (after one warm-up)")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s), {args.dpi} dpi pages")
+    for color in (False, True):
+        page = fed_page(args.dpi, color)
+        label = 'color' if color else 'gray'
+        print(f"\nper page, {label} {page.width}x{page.height}")
+        for step, ms in steps(page, args.repeat).items():
+            print(f"  {step:<26} {ms:8.1f} ms")
+
+        cleaned = cleanup.clean_page(page)
+        raw_jpeg = encoded_size(page, 'JPEG', quality=90)
+        print(f"  {'raw JPEG q90':<26} {raw_jpeg / 1024:8.0f} KiB")
+        for fmt in ('PNG', 'PDF'):
+            size = encoded_size(cleaned, fmt, **({'resolution': args.dpi} if fmt == 'PDF' else {}))
+            print(f"  {'cleaned ' + fmt:<26} {size / 1024:8.0f} KiB  ({size / raw_jpeg:.0%} of the JPEG)")
+
+    pages = [fed_page(args.dpi, True, seed=seed) for seed in range(args.pages)]
+    start = time.perf_counter()
+    for page in pages:
+        cleanup.clean_page(page)
+    serial = len(pages) / (time.perf_counter() - start)
+    print(f"\nthroughput, {args.pages} color pages")
+    print(f"  {'in process':<26} {serial:8.2f} pages/s")
+    for workers in args.workers:
+        rate = throughput(pages, workers)
+        print(f"  {f'pool, {workers} worker(s)':<26} {rate:8.2f} pages/s  (x{rate / serial:.2f})")
+    shutdown_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
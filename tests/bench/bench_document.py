@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CPU and disk work for one scanned page from acquisition to
+upload, the old way (tmp.jpg round trip, a JPEG encode for each step)
+versus an encode-once Document.
+
+    python -m tests.bench.bench_document [--dpi 300] [--repeat 5]
+
+Both pipelines start from the JPEG bytes a WIA scanner hands over and end
+with the page saved under the user's filename and staged for the upload
+queue; the AI payload is prepared twice (e.g. a retried suggestion).
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib.ai import prepare_image_bytes  # noqa: E402
+from lib.document import Document  # noqa: E402
+from tests.bench.fixtures import make_page  # noqa: E402
+
+
+def old_pipeline(scanner_bytes, workdir):
+    tmp = os.path.join(workdir, "tmp.jpg")
+    with open(tmp, "wb") as f:
+        f.write(scanner_bytes)
+    image = Image.open(tmp)
+    image.load()
+    for _ in range(2):
+        prepare_image_bytes(image, "openai")
+    image.save(os.path.join(workdir, "saved.jpg"))
+    staged = os.path.join(workdir, "staged.jpg")
+    shutil.copyfile(tmp, staged)
+    written = len(scanner_bytes) + os.path.getsize(os.path.join(workdir, "saved.jpg")) + os.path.getsize(staged)
+    return written
+
+
+def new_pipeline(scanner_bytes, workdir):
+    document = Document.from_bytes(scanner_bytes)
+    for _ in range(2):
+        prepare_image_bytes(document, "openai")
+    document.save(os.path.join(workdir, "saved.jpg"))
+    staged = document.write_temp()
+    written = os.path.getsize(os.path.join(workdir, "saved.jpg")) + os.path.getsize(staged)
+    os.remove(staged)
+    return written
+
+
+def measure(pipeline, scanner_bytes, repeat):
+    wall, cpu, written = [], [], 0
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as workdir:
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            written = pipeline(scanner_bytes, workdir)
+            wall.append(time.perf_counter() - start_wall)
+            cpu.append(time.process_time() - start_cpu)
+    return statistics.median(wall) * 1000, statistics.median(cpu) * 1000, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, default=300, help="scan resolution of the test page")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per pipeline (median is shown)")
+    args = parser.parse_args()
+
+    buffer = io.BytesIO()
+    make_page(dpi=args.dpi).save(buffer, format="JPEG", quality=90)
+    scanner_bytes = buffer.getvalue()
+    print(f"{args.dpi} dpi page, {len(scanner_bytes)} bytes from the scanner")
+
+    for label, pipeline in (("tmp.jpg + re-encodes", old_pipeline), ("Document", new_pipeline)):
+        wall, cpu, written = measure(pipeline, scanner_bytes, args.repeat)
+        print(f"{label:<22} wall {wall:7.1f} ms  cpu {cpu:7.1f} ms  written {written / 1e6:5.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
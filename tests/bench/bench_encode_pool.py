@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Throughput of PDF page encoding in worker processes (lib.pdf_writer.encode_pdf_pages)
+against encoding on one thread, on synthetic pages.
+
+    python -m tests.bench.bench_encode_pool [--dpi 600] [--pages 16] [--workers 1 2 4 8] [--compact]
+
+For each worker count the pages go through the pool twice: handed over in
+shared memory (what the app does) and, for comparison, pickled through the
+pool's pipe. Reports pages/s, the speed-up over one thread and the
+scaling efficiency (speed-up / workers). The pool is started before the
+timing, its start-up is a one-off per app session.
+"""
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib.pdf_writer import encode_pdf_image, encode_pdf_pages  # noqa: E402
+from lib.process_pool import get_pool, shutdown_pool  # noqa: E402
+from tests.bench.fixtures import make_page  # noqa: E402
+
+
+def encode_raw(mode, size, data, compact):
+    # the pickling baseline: pixels arrive as bytes through the pool's pipe
+    return encode_pdf_image(Image.frombytes(mode, size, data), compact)
+
+
+def pickled(pages, workers, compact):
+    pool = get_pool(workers)
+    futures = [pool.submit(encode_raw, page.mode, page.size, page.tobytes(), compact) for page in pages]
+    return [future.result() for future in futures]
+
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, default=600, help="page resolution (default 600)")
+    parser.add_argument("--pages", type=int, default=16, help="pages per run (default 16)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="pool sizes to compare")
+    parser.add_argument("--gray", action="store_true", help="grayscale pages instead of colour")
+    parser.add_argument("--compact", action="store_true", help="content-aware compact encoding (lib.page_format)")
+    args = parser.parse_args()
+
+    template = make_page(args.dpi, not args.gray)
+    pages = [template.copy() for _ in range(args.pages)]
+    print(f"{os.cpu_count()} CPU(s), {args.pages} pages {template.width}x{template.height} {template.mode}"
+          f"{', compact' if args.compact else ''}")
+
+    serial = args.pages / timed(lambda: [encode_pdf_image(page, args.compact) for page in pages])
+    print(f"{'one thread':<24} {serial:8.2f} pages/s")
+    for workers in args.workers:
+        get_pool(workers)
+        list(encode_pdf_pages([template.copy() for _ in range(workers)], workers, args.compact))  # warm the workers up
+        # the pool closes the pages it is given
+        copies = [page.copy() for page in pages]
+        shared = args.pages / timed(lambda: list(encode_pdf_pages(copies, workers, args.compact)))
+        piped = args.pages / timed(lambda: pickled(pages, workers, args.compact))
+        speedup = shared / serial
+        print(f"{f'{workers} worker(s), shared':<24} {shared:8.2f} pages/s  x{speedup:.2f}  efficiency {speedup / workers:.0%}")
+        print(f"{f'{workers} worker(s), pickled':<24} {piped:8.2f} pages/s  x{piped / serial:.2f}")
+    shutdown_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the image pipeline hot paths, on fixed synthetic pages
+at 150, 300 and 600 dpi in grayscale and color.
+
+    python -m tests.bench.bench_micro [--repeat 5] [--dpi 150 300] [--case jpeg_encode ...]
+                                      [--output results.json] [--baseline base.json --threshold 0.15]
+
+Each case reports the median and best time, the peak memory of one run
+and the size of what it produced. --output stores the results as JSON
+(with the commit they were taken on); --baseline compares against such a
+file and exits with status 1 if any case got slower (best time, the
+least noisy figure) or bigger (peak memory, output bytes) by more than
+--threshold.
+
+Peak memory is the resident set size above the level before the run,
+sampled every millisecond from /proc (Pillow's pixel buffers are not
+visible to tracemalloc); where /proc is missing, tracemalloc's peak of
+Python allocations is used instead.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import PIL
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib import ai  # noqa: E402
+from lib.page_format import encode_page  # noqa: E402
+from lib.preview import PreviewRenderer  # noqa: E402
+from tests.bench.fixtures import make_page  # noqa: E402
+from tests.bench.memory import PeakMemory  # noqa: E402
+
+DPIS = (150, 300, 600)
+PREVIEW_BOX = (980, 880)
+
+
+def rendered_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+# name -> (setup(page) -> argument, run(argument) -> output, size(output) -> bytes)
+CASES = {
+    # full-resolution JPEG encode (Save/upload of a page without scanner bytes)
+    'jpeg_encode': (lambda page: page, ai.PIL_to_bytes, len),
+    # content-aware encode (classify, then group 4 TIFF / grayscale or colour JPEG)
+    'compact_encode': (lambda page: page, lambda page: encode_page(page)[2], len),
+    # shrunk image sent to the AI provider
+    'ai_prepare_openai': (lambda page: page, lambda page: ai.prepare_image_bytes(page, 'openai'), len),
+    'ai_prepare_gemini': (lambda page: page, lambda page: ai.prepare_image_bytes(page, 'gemini'), len),
+    # first preview of a scan
+    'preview_render': (lambda page: page, lambda page: PreviewRenderer(page).render(PREVIEW_BOX), rendered_bytes),
+    # base64 data URL of the prepared AI image, as built by apirequest
+    'base64_payload': (lambda page: ai.prepare_image_bytes(page, 'openai'), ai.image_data_url, len),
+}
+
+
+def run_case(name, page, repeat):
+    setup, run, size = CASES[name]
+    argument = setup(page)
+    output = run(argument)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = run(argument)
+        timings.append(time.perf_counter() - start)
+    del output
+    with PeakMemory() as memory:
+        output = run(argument)
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'peak_mb': round(memory.peak / 1e6, 2),
+        'memory_method': memory.method,
+        'output_bytes': size(output),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Return a list of human readable regressions against baseline results"""
+    previous = {(r['case'], r['page']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['case'], result['page']))
+        if before is None:
+            continue
+        for metric in ('min_ms', 'peak_mb', 'output_bytes'):
+            old, new = before[metric], result[metric]
+            # ignore noise on metrics that are tiny to begin with
+            floor = {'min_ms': 1.0, 'peak_mb': 1.0, 'output_bytes': 1024}[metric]
+            if new > max(old, floor) * (1 + threshold):
+                regressions.append(f"{result['case']} {result['page']}: {metric} {old} -> {new} "
+                                   f"(+{(new / max(old, floor) - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (after one warm-up)")
+    parser.add_argument("--dpi", type=int, nargs="+", default=list(DPIS), help="page resolutions")
+    parser.add_argument("--case", nargs="+", choices=sorted(CASES), default=list(CASES), help="cases to run")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative regression (default 0.15)")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'case':<18} {'page':<14} {'median ms':>10} {'min ms':>9} {'peak MB':>8} {'output':>10}")
+    for dpi in args.dpi:
+        for color in (False, True):
+            page = make_page(dpi, color)
+            label = f"{dpi}dpi-{'color' if color else 'gray'}"
+            for name in args.case:
+                result = {'case': name, 'page': label, **run_case(name, page, args.repeat)}
+                results.append(result)
+                print(f"{name:<18} {label:<14} {result['median_ms']:10.2f} {result['min_ms']:9.2f} "
+                      f"{result['peak_mb']:8.1f} {result['output_bytes']:10d}")
+            del page
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\ncompared with {args.baseline} (commit {baseline.get('commit')}), threshold {args.threshold:.0%}")
+        for line in regressions:
+            print(f"  REGRESSION {line}")
+        if regressions:
+            return 1
+        print("  no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Memory held by a session of large scans with and without a page store
+ceiling (lib.page_store.PageStore), and what spilling costs.
+
+    python -m tests.bench.bench_page_store [--dpi 600] [--pages 4] [--max-mb 256] [--a4]
+
+Each page (A3 by default) is scanned, kept as a Document and previewed
+like the app does. Reports the peak RSS growth for the whole session and
+what it holds at the end, split (on Linux) into anonymous memory, which
+can only go to swap, and mapped file pages, which the kernel drops when it
+needs the RAM; then the time to spill a page, and preview and full-page
+load times for a page in memory against a spilled one.
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib.document import Document  # noqa: E402
+from lib.page_store import MB, PageStore  # noqa: E402
+from lib.preview import PreviewRenderer  # noqa: E402
+from tests.bench.fixtures import A4_INCHES, make_page  # noqa: E402
+from tests.bench.memory import PeakMemory  # noqa: E402
+
+A3_INCHES = (11.69, 16.54)
+BOX = (1000, 900)
+STATUS = '/proc/self/status'
+
+
+def held():
+    """(anonymous, file-backed) resident MB, None where /proc is missing"""
+    if not os.path.exists(STATUS):
+        return None
+    values = {}
+    with open(STATUS) as f:
+        for line in f:
+            if line.startswith(('RssAnon:', 'RssFile:')):
+                name, value = line.split(':')
+                values[name] = int(value.split()[0]) / 1024
+    return values['RssAnon'], values['RssFile']
+
+
+def session(template, pages, store):
+    documents = []
+    for _ in range(pages):
+        document = Document(template.copy()).store_in(store)
+        PreviewRenderer(document).render(BOX)
+        documents.append(document)
+    return documents
+
+
+def timed(run, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, default=600, help="page resolution (default 600)")
+    parser.add_argument("--pages", type=int, default=4, help="pages kept in the session (default 4)")
+    parser.add_argument("--max-mb", type=float, default=256, help="page store ceiling in MB (default 256)")
+    parser.add_argument("--a4", action="store_true", help="A4 pages instead of A3")
+    args = parser.parse_args()
+
+    template = make_page(args.dpi, paper=A4_INCHES if args.a4 else A3_INCHES)
+    print(f"{args.pages} pages {template.width}x{template.height} {template.mode}, ceiling {args.max_mb:g} MB")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, store in (("no page store", None), (f"{args.max_mb:g} MB ceiling", PageStore(int(args.max_mb * MB), workdir))):
+            gc.collect()
+            before = held()
+            with PeakMemory() as memory:
+                documents = session(template, args.pages, store)
+            gc.collect()
+            after = held()
+            line = f"{label:<20} peak {memory.peak / MB:8.1f} MB ({memory.method})"
+            if before and after:
+                line += f"  held: anonymous {after[0] - before[0]:8.1f} MB, mapped files {after[1] - before[1]:8.1f} MB"
+            print(line)
+            del documents
+
+        store = PageStore(0, workdir)
+        spill_ms = timed(lambda: store.add(template.copy()), repeat=1)
+        resident = Document(template)
+        spilled = Document(template.copy()).store_in(store)
+        print(f"spilling a page       {spill_ms:8.1f} ms")
+        print(f"preview, in memory    {timed(lambda: PreviewRenderer(resident).render(BOX)):8.1f} ms")
+        print(f"preview, spilled      {timed(lambda: PreviewRenderer(spilled).render(BOX)):8.1f} ms")
+        print(f"full page, spilled    {timed(lambda: spilled.image):8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Load test: push hundreds of simulated scans through the app's pipeline,
+scan -> preview -> AI filename (local OpenAI-compatible stub) -> upload
+queue (local Paperless stub), and report per-stage times and throughput.
+
+    python -m tests.bench.bench_pipeline [--pages 200] [--dpi 300] [--gray] [--delay 0] [--workers 2] [--no-ai]
+
+This is the throughput baseline later optimisations are measured against.
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib import ai, scanner, simulated_scanner  # noqa: E402
+from lib.preview import PreviewRenderer  # noqa: E402
+from lib.upload_queue import UploadQueue, DONE  # noqa: E402
+from tests.bench.openai_stub import OpenAIStub  # noqa: E402
+from tests.bench.paperless_stub import PaperlessStub  # noqa: E402
+
+PREVIEW_BOX = (980, 880)
+
+
+def run(args, paperless, openai_stub):
+    stages = {name: [] for name in ("scan", "preview", "ai", "stage upload")}
+    queue = UploadQueue(workers=args.workers)
+    jobs = []
+    start = time.perf_counter()
+    for number in range(args.pages):
+        t0 = time.perf_counter()
+        document = scanner.scan_image()
+        t1 = time.perf_counter()
+        PreviewRenderer(document.image).render(PREVIEW_BOX)
+        t2 = time.perf_counter()
+        filename = f"page_{number}"
+        if openai_stub is not None:
+            filename = ai.get_recommended_filename_from_pil_image_custom(document, openai_stub.url, "stub") or filename
+        t3 = time.perf_counter()
+        jobs.append(queue.submit(document.write_temp(), paperless.url, "token", filename, remove_after=True))
+        t4 = time.perf_counter()
+        for name, seconds in zip(stages, (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+            stages[name].append(seconds)
+    scanned = time.perf_counter() - start
+    # shutdown() cancels what is still pending, wait for the queue to drain first
+    while queue.depth():
+        time.sleep(0.01)
+    queue.shutdown(wait=True)
+    finished = time.perf_counter() - start
+    return stages, scanned, finished, sum(1 for job in jobs if job.status == DONE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200, help="pages to scan")
+    parser.add_argument("--dpi", type=int, default=300, help="scan resolution")
+    parser.add_argument("--gray", action="store_true", help="grayscale instead of color pages")
+    parser.add_argument("--delay", type=float, default=0.0, help="simulated acquisition time per page (s)")
+    parser.add_argument("--workers", type=int, default=2, help="upload workers")
+    parser.add_argument("--no-ai", action="store_true", help="skip the AI filename step")
+    args = parser.parse_args()
+
+    scanner.set_backend("simulated", dpi=args.dpi, color=not args.gray, delay=args.delay)
+    os.environ["NO_PROXY"] = "127.0.0.1"
+
+    with PaperlessStub() as paperless, OpenAIStub() as openai_stub:
+        # draw the page variants before the clock starts
+        for _ in range(simulated_scanner.SETTINGS["variants"]):
+            scanner.scan_image()
+        # the upload and AI helpers print every result
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            stages, scanned, finished, uploaded = run(args, paperless, None if args.no_ai else openai_stub)
+
+    print(f"{args.pages} pages, {args.dpi} dpi {'gray' if args.gray else 'color'}, "
+          f"{args.delay * 1000:.0f} ms acquisition, {args.workers} upload workers")
+    for name, timings in stages.items():
+        print(f"  {name:<13} mean {statistics.mean(timings) * 1000:7.2f} ms  "
+              f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1000:7.2f} ms")
+    print(f"scanned in {scanned:.2f} s ({args.pages / scanned:.1f} pages/s), "
+          f"all uploaded in {finished:.2f} s ({args.pages / finished:.1f} pages/s), {uploaded} succeeded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: preview rendering of a scanned page, full-resolution LANCZOS
+resize (the old display_image_object) versus PreviewRenderer, for the
+first render, a resize to a new size and a resize back to a cached size.
+Also compares opening a scan from disk with and without JPEG draft decoding.
+
+    python -m tests.bench.bench_preview [--dpi 600] [--repeat 5]
+
+Times cover the PIL work only; the ImageTk.PhotoImage conversion (which
+needs a display) is the same for both and is cached per size by the app.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib.preview import PreviewRenderer, fit_size, open_for_preview  # noqa: E402
+from tests.bench.fixtures import make_page  # noqa: E402
+
+BOX = (980, 880)
+RESIZED_BOX = (1180, 1040)
+
+
+def old_preview(page, box):
+    return page.resize(fit_size(page.size, box), Image.Resampling.LANCZOS)
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def report(label, ms):
+    print(f"{label:<34} {ms:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, default=600, help="scan resolution of the test page")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median is shown)")
+    args = parser.parse_args()
+
+    page = make_page(dpi=args.dpi)
+    print(f"{page.size[0]}x{page.size[1]} page, preview box {BOX[0]}x{BOX[1]}")
+
+    report("old: LANCZOS from full resolution", timed(lambda: old_preview(page, BOX), args.repeat))
+
+    def first_render():
+        PreviewRenderer(page).render(BOX)
+    report("new: first render", timed(first_render, args.repeat))
+
+    renderer = PreviewRenderer(page, cached_sizes=1)
+    renderer.render(BOX)
+    # with one cached size, alternating between two sizes re-renders every time
+    report("new: resize (uncached)", timed(lambda: (renderer.render(RESIZED_BOX), renderer.render(BOX)), args.repeat) / 2)
+    renderer = PreviewRenderer(page)
+    renderer.render(BOX)
+    report("new: resize back (cached)", timed(lambda: renderer.render(BOX), args.repeat))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "scan.jpg")
+        page.save(path, quality=90)
+
+        def open_full():
+            with Image.open(path) as image:
+                old_preview(image, BOX)
+
+        def open_draft():
+            PreviewRenderer(open_for_preview(path)).render(BOX)
+
+        report("old: open JPEG + preview", timed(open_full, args.repeat))
+        report("new: draft open JPEG + preview", timed(open_draft, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
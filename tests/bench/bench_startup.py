@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: application cold start, measured in fresh interpreters with
+python -X importtime.
+
+    python -m tests.bench.bench_startup [--runs 5] [--top 10]
+
+Reports the import time of app.py (what runs before any window appears),
+the same with both provider SDKs imported eagerly (the old behaviour), the
+slowest imports, and, when a display is available, the time from process
+start to the first drawn window.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EAGER_PROVIDERS = "import openai, google.genai, google.genai.types"
+
+FIRST_WINDOW = """
+import sys, tkinter as tk
+import app
+root = tk.Tk()
+app.PaperlessScanApp(root)
+root.update()
+print(repr(__import__('time').time()))
+sys.stdout.flush()
+root.destroy()
+"""
+
+
+def importtime(code):
+    """Run code in a fresh interpreter; return {module: cumulative microseconds} for top-level imports"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # one separator space, then two spaces per nesting level
+        modules[name[1:].rstrip()] = int(cumulative)
+    return modules
+
+
+def top_level_total(modules):
+    """Import time of the top-level (unindented) imports, in ms"""
+    return sum(us for name, us in modules.items() if not name.startswith(" ")) / 1000
+
+
+def first_window():
+    start = time.time()
+    result = subprocess.run([sys.executable, "-c", FIRST_WINDOW], cwd=ROOT, capture_output=True, text=True, check=True)
+    return (float(result.stdout.strip().splitlines()[-1]) - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement (median is shown)")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports to list")
+    args = parser.parse_args()
+
+    lazy = [importtime("import app") for _ in range(args.runs)]
+    eager = [importtime(f"import app; {EAGER_PROVIDERS}") for _ in range(args.runs)]
+
+    print(f"import app (lazy providers)    {statistics.median(top_level_total(m) for m in lazy):8.1f} ms")
+    print(f"import app + provider SDKs     {statistics.median(top_level_total(m) for m in eager):8.1f} ms")
+
+    print("\nslowest imports for 'import app' (cumulative, last run):")
+    for name, us in sorted(lazy[-1].items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name.strip()}")
+
+    if os.name == "nt" or os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+        timings = [first_window() for _ in range(args.runs)]
+        print(f"\ntime to first window           {statistics.median(timings):8.1f} ms")
+    else:
+        print("\nno display, skipping time to first window")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Load test for the upload path: push N documents through the app's
+UploadQueue and upload_to_paperlessngx against the local Paperless stub,
+and report throughput, latency percentiles and client memory.
+
+    python -m tests.bench.bench_upload_load [--documents 200] [--size 500000] [--concurrency 4]
+                                            [--latency 0.05] [--jitter 0.02] [--error-rate 0.01]
+                                            [--bandwidth 5000000] [--seed 1] [--output results.json]
+
+Latency is measured two ways: "upload" is the HTTP request alone (what a
+faster client or server changes), "end-to-end" also includes the time the
+job waited in the queue for a free worker. Client memory is the peak
+resident set growth of this process during the run.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib.scanner import close_clients, upload_to_paperlessngx  # noqa: E402
+from lib.upload_queue import UploadQueue, DONE  # noqa: E402
+from tests.bench.memory import PeakMemory  # noqa: E402
+from tests.bench.paperless_stub import PaperlessStub  # noqa: E402
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values (fraction between 0 and 1)"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(timings):
+    return {
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+        'max_ms': round(max(timings, default=0.0) * 1000, 2),
+    }
+
+
+def run(args, stub, path):
+    upload_times = []
+    lock = threading.Lock()
+
+    def timed_upload(*upload_args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return upload_to_paperlessngx(*upload_args, **kwargs)
+        finally:
+            with lock:
+                upload_times.append(time.perf_counter() - start)
+
+    submitted = {}
+    finished = {}
+
+    def on_finished(job):
+        finished[job.id] = time.perf_counter()
+
+    queue = UploadQueue(workers=args.concurrency, upload_func=timed_upload, on_finished=on_finished)
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        jobs = []
+        for number in range(args.documents):
+            job = queue.submit(path, stub.url, "token", f"document_{number}.pdf")
+            submitted[job.id] = time.perf_counter()
+            jobs.append(job)
+        # shutdown() cancels what is still pending, wait for the queue to drain first
+        while queue.depth():
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - start
+    queue.shutdown(wait=True)
+    close_clients()
+
+    end_to_end = [finished[job.id] - submitted[job.id] for job in jobs if job.id in finished]
+    succeeded = sum(1 for job in jobs if job.status == DONE)
+    return {
+        'documents': args.documents,
+        'size_bytes': args.size,
+        'concurrency': args.concurrency,
+        'stub': {'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+                 'bandwidth': args.bandwidth},
+        'succeeded': succeeded,
+        'failed': args.documents - succeeded,
+        'elapsed_s': round(elapsed, 3),
+        'documents_per_s': round(args.documents / elapsed, 2),
+        'mb_per_s': round(args.documents * args.size / elapsed / 1e6, 2),
+        'upload': summarize(upload_times),
+        'end_to_end': summarize(end_to_end),
+        'client_peak_mb': round(memory.peak / 1e6, 2),
+        'client_base_mb': round(memory.base / 1e6, 2),
+        'memory_method': memory.method,
+        'connections': stub.connections,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200, help="documents to upload")
+    parser.add_argument("--size", type=int, default=500_000, help="document size in bytes")
+    parser.add_argument("--concurrency", type=int, default=4, help="upload workers")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub answer delay per upload (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="stub latency varies by up to this (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of uploads the stub fails")
+    parser.add_argument("--bandwidth", type=int, help="stub upload bandwidth per connection (bytes/s)")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the stub's jitter and errors")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    os.environ["NO_PROXY"] = "127.0.0.1"
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "document.pdf")
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.size))
+        with PaperlessStub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           bandwidth=args.bandwidth, seed=args.seed) as stub:
+            # the upload helper prints every result
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results = run(args, stub, path)
+
+    print(f"{results['documents']} documents of {args.size / 1e6:.2f} MB, concurrency {args.concurrency}, "
+          f"stub latency {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms, error rate {args.error_rate:.1%}, "
+          f"bandwidth {f'{args.bandwidth / 1e6:.1f} MB/s' if args.bandwidth else 'unlimited'}")
+    print(f"  throughput   {results['documents_per_s']:8.2f} documents/s  {results['mb_per_s']:8.2f} MB/s  "
+          f"({results['elapsed_s']:.2f} s)")
+    for label in ('upload', 'end_to_end'):
+        stats = results[label]
+        print(f"  {label.replace('_', '-'):<12} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+              f"p99 {stats['p99_ms']:8.2f} ms  max {stats['max_ms']:8.2f} ms")
+    print(f"  client peak  +{results['client_peak_mb']:.1f} MB over {results['client_base_mb']:.1f} MB "
+          f"({results['memory_method']})")
+    print(f"  {results['succeeded']} succeeded, {results['failed']} failed, {results['connections']} connections")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
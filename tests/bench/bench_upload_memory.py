@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark: peak Python memory while uploading one large document with
+requests' in-memory multipart encoding (files=, the old behaviour) versus
+the streaming MultipartEncoder used by PaperlessClient.
+
+    python -m tests.bench.bench_upload_memory [--size-mb 100]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib.scanner import PaperlessClient  # noqa: E402
+from tests.bench.paperless_stub import PaperlessStub  # noqa: E402
+
+
+def upload_in_memory(file_path, api_url):
+    with open(file_path, "rb") as document:
+        requests.post(f"{api_url}/api/documents/post_document/", files={"document": document})
+
+
+def measure(upload):
+    tracemalloc.start()
+    start = time.perf_counter()
+    upload()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=100, help="document size in MB")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "document.pdf")
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        with PaperlessStub() as stub, PaperlessClient(stub.url, "token") as client:
+            results = {
+                "files= (in memory)": measure(lambda: upload_in_memory(path, stub.url)),
+                "MultipartEncoder": measure(lambda: client.upload(path, progress=lambda sent, total: None)),
+            }
+
+    print(f"upload of a {args.size_mb} MB document")
+    for label, (elapsed, peak) in results.items():
+        print(f"{label:<20} peak {peak / 1024 / 1024:8.2f} MB  time {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
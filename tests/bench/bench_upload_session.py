@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-document upload latency with a fresh connection per upload
+(plain requests.post, the old behaviour) versus the pooled, keep-alive
+PaperlessClient.
+
+    python -m tests.bench.bench_upload_session [--uploads 100] [--size 200000] [--tls]
+
+--tls serves the stub over HTTPS with a throwaway self-signed certificate
+(needs the openssl command), which is where connection reuse pays off most.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from lib.scanner import PaperlessClient  # noqa: E402
+from tests.bench.paperless_stub import PaperlessStub  # noqa: E402
+
+
+def upload_without_pool(file_path, api_url, api_token, verify=True):
+    with open(file_path, "rb") as document:
+        return requests.post(f"{api_url}/api/documents/post_document/",
+                             headers={"Authorization": f"Token {api_token}"},
+                             files={"document": document}, verify=verify)
+
+
+def make_certificate(directory):
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", keyfile, "-out", certfile],
+                   check=True, capture_output=True)
+    return certfile, keyfile
+
+
+def time_uploads(upload, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        upload()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label, timings, connections):
+    print(f"{label:<22} mean {statistics.mean(timings) * 1000:7.2f} ms  "
+          f"median {statistics.median(timings) * 1000:7.2f} ms  "
+          f"total {sum(timings):6.2f} s  connections {connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=100, help="consecutive uploads per run")
+    parser.add_argument("--size", type=int, default=200_000, help="document size in bytes")
+    parser.add_argument("--tls", action="store_true", help="serve the stub over HTTPS")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "document.pdf")
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.size))
+        certfile = keyfile = None
+        verify = True
+        if args.tls:
+            certfile, keyfile = make_certificate(workdir)
+            verify = certfile
+
+        with PaperlessStub(certfile=certfile, keyfile=keyfile) as stub:
+            fresh = time_uploads(lambda: upload_without_pool(path, stub.url, "token", verify), args.uploads)
+            fresh_connections = stub.connections
+
+        with PaperlessStub(certfile=certfile, keyfile=keyfile) as stub, PaperlessClient(stub.url, "token") as client:
+            client.session.verify = verify
+            # REQUESTS_CA_BUNDLE would otherwise take precedence over session.verify
+            client.session.trust_env = False
+            pooled = time_uploads(lambda: client.upload(path), args.uploads)
+            pooled_connections = stub.connections
+
+    print(f"{args.uploads} uploads of {args.size} bytes over {'https' if args.tls else 'http'}")
+    report("requests.post", fresh, fresh_connections)
+    report("PaperlessClient", pooled, pooled_connections)
+    saved = statistics.mean(fresh) - statistics.mean(pooled)
+    print(f"saved per document: {saved * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+"""Synthetic document pages used by the benchmarks"""
+from lib.simulated_scanner import A4_INCHES, make_page  # noqa: F401
@@ -0,0 +1,61 @@
+"""Peak memory measurement shared by the benchmarks"""
+import ctypes
+import ctypes.util
+import os
+import threading
+import time
+import tracemalloc
+
+
+class PeakMemory:
+    """
+    Context manager measuring the peak memory growth of the code inside it (bytes).
+
+    Samples the resident set size every millisecond from /proc, because
+    Pillow's pixel buffers and socket buffers are not visible to
+    tracemalloc; where /proc is missing, tracemalloc's peak of Python
+    allocations is used instead. base is the RSS when the block started.
+    """
+
+    STATM = '/proc/self/statm'
+
+    def __init__(self):
+        self.peak = 0
+        self.method = 'rss' if os.path.exists(self.STATM) else 'tracemalloc'
+        self._libc = None
+        if self.method == 'rss':
+            libc_name = ctypes.util.find_library('c')
+            self._libc = ctypes.CDLL(libc_name) if libc_name else None
+        self._stop = threading.Event()
+        self._thread = None
+        self.base = 0
+
+    def _rss(self):
+        with open(self.STATM, 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss() - self.base)
+            time.sleep(0.001)
+
+    def __enter__(self):
+        if self.method == 'rss':
+            # hand memory freed by earlier runs back to the OS, or it is reused without showing up
+            if self._libc is not None and hasattr(self._libc, 'malloc_trim'):
+                self._libc.malloc_trim(0)
+            self.base = self._rss()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        else:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.method == 'rss':
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, self._rss() - self.base)
+        else:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
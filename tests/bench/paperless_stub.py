@@ -0,0 +1,207 @@
+"""
+Minimal local stand-in for the Paperless-ngx document upload and task APIs.
+
+Used by the benchmarks so upload changes can be measured without a real
+Paperless instance. Latency, an error rate and a bandwidth limit can be
+set to look like a slow or flaky server. It can also run on its own, to
+point the app at:
+
+    python -m tests.bench.paperless_stub [--port 8010] [--latency 0.2] [--jitter 0.05]
+                                         [--error-rate 0.05] [--bandwidth 1000000]
+"""
+import argparse
+import json
+import random
+import ssl
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class PaperlessStubHandler(BaseHTTPRequestHandler):
+    # keep-alive needs HTTP/1.1 and an explicit Content-Length on every response
+    protocol_version = "HTTP/1.1"
+    # like nginx/gunicorn; otherwise Nagle + delayed ACK adds ~40ms per keep-alive response
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # one handler instance per TCP connection
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        if self.path.rstrip('/') != "/api/documents/post_document":
+            self._reply(404, {"detail": "Not found."})
+            return
+        received = self._drain_body()
+        server = self.server
+        with server.lock:
+            delay = max(0.0, server.latency + server.random.uniform(-server.jitter, server.jitter))
+            failed = server.random.random() < server.error_rate
+            server.bytes_received += received
+            if failed:
+                server.errors += 1
+            else:
+                server.uploads += 1
+        if delay:
+            time.sleep(delay)  # server-side processing time
+        if failed:
+            self._reply(500, {"detail": "Simulated server error."})
+            return
+        task_id = str(uuid.uuid4())
+        with server.lock:
+            # consumed straight away
+            server.tasks[task_id] = {"task_id": task_id, "status": "SUCCESS",
+                                     "result": f"Success. New document id {len(server.tasks) + 1} created",
+                                     "related_document": str(len(server.tasks) + 1)}
+        self._reply(200, task_id)
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path.rstrip('/') != "/api/tasks":
+            self._reply(404, {"detail": "Not found."})
+            return
+        params = parse_qs(query)
+        wanted = set(",".join(params.get("task_id__in", [])).split(",")) | set(params.get("task_id", []))
+        with self.server.lock:
+            self.server.task_requests += 1
+            tasks = [task for task_id, task in self.server.tasks.items() if task_id in wanted]
+        self._reply(200, tasks)
+
+    def _drain_body(self):
+        """Read and discard the request body, no faster than server.bandwidth bytes/s; returns its size"""
+        remaining = int(self.headers.get("Content-Length", 0))
+        bandwidth = self.server.bandwidth
+        chunk_size = min(65536, bandwidth) if bandwidth else 65536
+        start = time.perf_counter()
+        received = 0
+        while remaining > 0:
+            chunk = self.rfile.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            received += len(chunk)
+            if bandwidth:
+                ahead = received / bandwidth - (time.perf_counter() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+        return received
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class PaperlessStub:
+    """
+    Run the stub server on a background thread.
+
+    Usage:
+        with PaperlessStub() as stub:
+            upload_to_paperlessngx(path, stub.url, "token")
+
+    Args:
+        certfile (str, optional): PEM certificate; when given (with keyfile)
+            the stub serves HTTPS so TLS handshake costs show up.
+        keyfile (str, optional): PEM private key for certfile.
+        latency (float): Seconds each upload takes to be answered once received
+        jitter (float): Latency varies uniformly by up to this many seconds either way
+        error_rate (float): Fraction of uploads answered with a 500 error
+        bandwidth (int, optional): Upload bandwidth per connection in bytes/s, unlimited when None
+        seed (int, optional): Seed for the jitter and errors, for repeatable runs
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, certfile=None, keyfile=None,
+                 latency=0.0, jitter=0.0, error_rate=0.0, bandwidth=None, seed=None):
+        self.server = ThreadingHTTPServer((host, port), PaperlessStubHandler)
+        self.scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+            self.scheme = "https"
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.uploads = 0
+        self.server.errors = 0
+        self.server.bytes_received = 0
+        self.server.tasks = {}
+        self.server.task_requests = 0
+        self.server.connections = 0
+        self.server.latency = latency
+        self.server.jitter = jitter
+        self.server.error_rate = error_rate
+        self.server.bandwidth = int(bandwidth) if bandwidth else None
+        self.server.random = random.Random(seed)
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"{self.scheme}://{host}:{port}"
+
+    @property
+    def uploads(self):
+        return self.server.uploads
+
+    @property
+    def errors(self):
+        return self.server.errors
+
+    @property
+    def bytes_received(self):
+        return self.server.bytes_received
+
+    @property
+    def connections(self):
+        return self.server.connections
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each upload is answered")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency varies by up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of uploads answered with 500")
+    parser.add_argument("--bandwidth", type=int, help="upload bandwidth per connection in bytes/s")
+    args = parser.parse_args()
+
+    stub = PaperlessStub(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, bandwidth=args.bandwidth)
+    print(f"Paperless stub listening on {stub.url} (any API token is accepted), Ctrl+C to stop")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+        print(f"{stub.uploads} uploads, {stub.errors} errors, {stub.bytes_received} bytes received")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 import io
 import os
+import subprocess
+import sys
 import tempfile
+import threading
 from PIL import Image
 
 import lib.ai as ai
+from lib.document import Document
 
 class TestAI(unittest.TestCase):
     def setUp(self):
         self.api_key = "test_key_123"
+        # every test starts without cached provider clients
+        ai.invalidate_clients()
+        self.addCleanup(ai.invalidate_clients)
         # Create a small test image
         self.test_image = Image.new('RGB', (100, 100), color='red')
         # Create a temporary file for testing
@@ -33,6 +40,66 @@ class TestAI(unittest.TestCase):
         img = Image.open(io.BytesIO(img_bytes))
         self.assertEqual(img.format, 'JPEG')
 
+    def test_prepare_image_downscales_to_max_edge(self):
+        page = Image.new('RGB', (4960, 7016), color='white')
+
+        prepared = ai.prepare_image(page, max_edge=1024)
+
+        self.assertEqual(max(prepared.size), 1024)
+        # aspect ratio is kept
+        self.assertAlmostEqual(prepared.width / prepared.height, 4960 / 7016, places=2)
+        # original untouched
+        self.assertEqual(page.size, (4960, 7016))
+
+    def test_prepare_image_never_upscales(self):
+        prepared = ai.prepare_image(self.test_image, max_edge=1024)
+        self.assertEqual(prepared.size, (100, 100))
+
+    def test_prepare_image_grayscale_and_crop(self):
+        page = Image.new('RGB', (1000, 2000), color='red')
+
+        prepared = ai.prepare_image(page, grayscale=True, crop_top=0.25)
+
+        self.assertEqual(prepared.mode, 'L')
+        self.assertEqual(prepared.size, (1000, 500))
+
+    def test_prepare_image_bytes_uses_provider_defaults(self):
+        page = Image.new('RGB', (2480, 3508), color='white')
+
+        for provider, defaults in ai.PREPARE_DEFAULTS.items():
+            img = Image.open(io.BytesIO(ai.prepare_image_bytes(page, provider)))
+            self.assertEqual(img.format, 'JPEG')
+            self.assertEqual(max(img.size), defaults['max_edge'])
+
+        # overrides win over the defaults
+        img = Image.open(io.BytesIO(ai.prepare_image_bytes(page, 'openai', max_edge=512, grayscale=False)))
+        self.assertEqual(max(img.size), 512)
+        self.assertEqual(img.mode, 'RGB')
+
+    def test_lower_quality_gives_smaller_payload(self):
+        page = Image.effect_noise((800, 800), 40).convert('RGB')
+        self.assertLess(len(ai.PIL_to_bytes(page, quality=40)), len(ai.PIL_to_bytes(page, quality=90)))
+
+    def test_set_prepare_options_overrides_known_keys_only(self):
+        saved = {k: dict(v) for k, v in ai.PREPARE_DEFAULTS.items()}
+        self.addCleanup(lambda: [ai.PREPARE_DEFAULTS[k].update(v) for k, v in saved.items()])
+
+        ai.set_prepare_options({'openai': {'max_edge': 2048, 'bogus': 1}, 'unknown': {'max_edge': 1}})
+
+        self.assertEqual(ai.PREPARE_DEFAULTS['openai']['max_edge'], 2048)
+        self.assertNotIn('bogus', ai.PREPARE_DEFAULTS['openai'])
+        self.assertNotIn('unknown', ai.PREPARE_DEFAULTS)
+
+    @patch('lib.ai.apirequest')
+    def test_openai_receives_prepared_image(self, mock_apirequest):
+        mock_apirequest.return_value = "doc"
+        page = Image.new('RGB', (4960, 7016), color='white')
+
+        ai.get_recommended_filename_from_pil_image(page, self.api_key)
+
+        sent = Image.open(io.BytesIO(mock_apirequest.call_args[0][1]))
+        self.assertEqual(max(sent.size), ai.PREPARE_DEFAULTS['openai']['max_edge'])
+
     @patch('openai.OpenAI')
     def test_apirequest_success(self, mock_openai):
         """Test successful OpenAI API request with proper response parsing"""
@@ -58,6 +125,34 @@ class TestAI(unittest.TestCase):
         self.assertEqual(call_kwargs['max_tokens'], 50)
         self.assertAlmostEqual(call_kwargs['temperature'], 0.3)
 
+    @patch('openai.OpenAI')
+    def test_apirequest_streams_and_stops_once_cancelled(self, mock_openai):
+        """With a cancel event the answer is streamed and the stream closed when cancelled"""
+        mock_client = Mock()
+        mock_openai.return_value = mock_client
+        stream = MagicMock()
+        stream.__enter__.return_value = stream
+        chunks = [Mock(choices=[Mock(delta=Mock(content=part))]) for part in ('Tax ', 'Return', ' 2024')]
+        cancel = threading.Event()
+        read = []
+
+        def produce():
+            for chunk in chunks:
+                read.append(chunk)
+                yield chunk
+        stream.__iter__.side_effect = lambda: produce()
+        mock_client.chat.completions.create.return_value = stream
+
+        self.assertEqual(ai.apirequest(self.api_key, b'image', cancel=cancel), 'Tax_Return_2024')
+        self.assertTrue(mock_client.chat.completions.create.call_args[1]['stream'])
+
+        # once the hedge has its answer the rest is not read
+        read.clear()
+        cancel.set()
+        self.assertIsNone(ai.apirequest(self.api_key, b'image', cancel=cancel))
+        self.assertEqual(len(read), 1)
+        stream.__exit__.assert_called()
+
     @patch('openai.OpenAI')
     def test_apirequest_custom_base_url_and_model(self, mock_openai):
         """apirequest should forward a custom base_url and model to the client"""
@@ -79,6 +174,8 @@ class TestAI(unittest.TestCase):
         mock_openai.assert_called_once_with(
             api_key=self.api_key,
             base_url='http://localhost:11434/v1',
+            timeout=ai.DEFAULT_REQUEST_TIMEOUT,
+            max_retries=ai.MAX_RETRIES,
         )
         # Custom model forwarded to the request
         call_kwargs = mock_client.chat.completions.create.call_args[1]
@@ -98,6 +195,8 @@ class TestAI(unittest.TestCase):
         mock_openai.assert_called_once_with(
             api_key='not-needed',
             base_url='http://localhost:11434/v1',
+            timeout=ai.DEFAULT_REQUEST_TIMEOUT,
+            max_retries=ai.MAX_RETRIES,
         )
 
     @patch('lib.ai.apirequest')
@@ -148,9 +247,46 @@ class TestAI(unittest.TestCase):
         )
         
         self.assertEqual(result, "recommended_filename")
-        mock_client_class.assert_called_once_with(api_key=self.api_key)
+        mock_client_class.assert_called_once()
+        self.assertEqual(mock_client_class.call_args.kwargs['api_key'], self.api_key)
+        # a real request timeout (milliseconds), not the SDK's unbounded default
+        self.assertEqual(mock_client_class.call_args.kwargs['http_options'].timeout, ai.DEFAULT_REQUEST_TIMEOUT * 1000)
         mock_from_bytes.assert_called_once()
 
+    @patch('openai.OpenAI')
+    def test_openai_client_reused_between_requests(self, mock_openai):
+        mock_client = mock_openai.return_value
+        mock_client.chat.completions.create.return_value = Mock(choices=[Mock(message=Mock(content="doc"))])
+
+        ai.apirequest(self.api_key, b'one')
+        ai.apirequest(self.api_key, b'two')
+        ai.apirequest(self.api_key, b'three', base_url='http://localhost:11434/v1')
+
+        # one client for OpenAI, one for the custom endpoint
+        self.assertEqual(mock_openai.call_count, 2)
+        self.assertEqual(mock_client.chat.completions.create.call_count, 3)
+
+    @patch('openai.OpenAI')
+    def test_invalidate_clients_rebuilds_client(self, mock_openai):
+        mock_openai.return_value.chat.completions.create.return_value = Mock(choices=[Mock(message=Mock(content="doc"))])
+
+        ai.apirequest(self.api_key, b'data')
+        ai.invalidate_clients()
+        ai.apirequest(self.api_key, b'data')
+
+        self.assertEqual(mock_openai.call_count, 2)
+
+    @patch('google.genai.types.Part.from_bytes')
+    @patch('google.genai.Client')
+    def test_gemini_client_reused_per_key(self, mock_client_class, mock_from_bytes):
+        mock_client_class.return_value.models.generate_content_stream.side_effect = lambda **kw: [Mock(text="name")]
+
+        ai.gemini_request('key1', b'img')
+        ai.gemini_request('key1', b'img')
+        ai.gemini_request('key2', b'img')
+
+        self.assertEqual(mock_client_class.call_count, 2)
+
     @patch('lib.ai.apirequest')
     def test_get_recommended_filename_handles_errors(self, mock_apirequest):
         """Test error handling in get_recommended_filename"""
@@ -174,6 +310,39 @@ class TestAI(unittest.TestCase):
         result = ai.get_recommended_filename_from_pil_image(self.test_image, self.api_key)
         self.assertEqual(result, "")
 
+    def test_prepare_image_bytes_cached_on_document(self):
+        """The AI payload of a Document is prepared once per settings"""
+        document = Document(Image.new('RGB', (2000, 1000), color='white'))
+        with patch('lib.ai.prepare_image', wraps=ai.prepare_image) as prepare:
+            first = ai.prepare_image_bytes(document, 'openai')
+            second = ai.prepare_image_bytes(document, 'openai')
+            ai.prepare_image_bytes(document, 'openai', max_edge=512)
+
+        self.assertIs(first, second)
+        self.assertEqual(prepare.call_count, 2)
+
+    def test_provider_sdks_not_imported_with_module(self):
+        """Importing lib.ai must not pull in the provider SDKs"""
+        code = "import sys, lib.ai; print(sorted(m for m in ('openai', 'google.genai') if m in sys.modules))"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    @patch('lib.ai.importlib.import_module')
+    def test_preload_providers_imports_in_background(self, mock_import):
+        """Test preload_providers imports only the requested SDKs"""
+        thread = ai.preload_providers(['gemini'])
+        thread.join(5)
+
+        imported = [c.args[0] for c in mock_import.call_args_list]
+        self.assertEqual(imported, ['google.genai', 'google.genai.types'])
+
+    @patch('lib.ai.importlib.import_module')
+    def test_preload_providers_nothing_to_do(self, mock_import):
+        self.assertIsNone(ai.preload_providers([]))
+        self.assertIsNone(ai.preload_providers(['unknown']))
+        mock_import.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+
+import lib.ai as ai
+from lib.ai_cache import SuggestionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSuggestionCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache', 'ai.sqlite3')
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def make_cache(self, **kwargs):
+        cache = SuggestionCache(self.path, clock=self.clock, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_miss_then_hit_counts(self):
+        cache = self.make_cache()
+        key = cache.make_key(b'image', 'openai', 'gpt-4o-mini', 'prompt')
+
+        self.assertIsNone(cache.get(key))
+        cache.put(key, 'invoice_2025', latency=2.5)
+        self.assertEqual(cache.get(key), 'invoice_2025')
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+        self.assertEqual(stats['saved_seconds'], 2.5)
+
+    def test_key_depends_on_provider_model_and_prompt(self):
+        keys = {
+            SuggestionCache.make_key(b'image', 'openai', 'gpt-4o-mini', 'prompt'),
+            SuggestionCache.make_key(b'image', 'gemini', 'gpt-4o-mini', 'prompt'),
+            SuggestionCache.make_key(b'image', 'openai', 'gpt-4o', 'prompt'),
+            SuggestionCache.make_key(b'image', 'openai', 'gpt-4o-mini', 'other prompt'),
+            SuggestionCache.make_key(b'image2', 'openai', 'gpt-4o-mini', 'prompt'),
+        }
+        self.assertEqual(len(keys), 5)
+
+    def test_entries_expire_after_ttl(self):
+        cache = self.make_cache(ttl=60)
+        cache.put('k', 'name')
+
+        self.clock.now += 59
+        self.assertEqual(cache.get('k'), 'name')
+        self.clock.now += 2
+        self.assertIsNone(cache.get('k'))
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.make_cache(max_entries=2)
+        cache.put('a', 'A')
+        self.clock.now += 1
+        cache.put('b', 'B')
+        self.clock.now += 1
+        # touching 'a' makes 'b' the least recently used
+        self.assertEqual(cache.get('a'), 'A')
+        self.clock.now += 1
+        cache.put('c', 'C')
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(cache.get('c'), 'C')
+
+    def test_cache_persists_on_disk(self):
+        cache = self.make_cache()
+        cache.put('k', 'name')
+        cache.close()
+
+        reopened = self.make_cache()
+        self.assertEqual(reopened.get('k'), 'name')
+
+
+class TestAICaching(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        ai.configure_cache(os.path.join(self.dir, 'ai.sqlite3'))
+        self.image = Image.new('RGB', (300, 400), color='white')
+
+    def tearDown(self):
+        ai.configure_cache(None)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    @patch('lib.ai.apirequest')
+    def test_openai_second_call_served_from_cache(self, mock_apirequest):
+        mock_apirequest.return_value = 'cached_doc'
+
+        first = ai.get_recommended_filename_from_pil_image(self.image, 'key')
+        second = ai.get_recommended_filename_from_pil_image(self.image, 'key')
+
+        self.assertEqual((first, second), ('cached_doc', 'cached_doc'))
+        mock_apirequest.assert_called_once()
+        self.assertEqual(ai.cache_stats()['hits'], 1)
+
+    @patch('lib.ai.apirequest')
+    def test_custom_endpoints_do_not_share_entries(self, mock_apirequest):
+        mock_apirequest.side_effect = ['from_a', 'from_b']
+
+        a = ai.get_recommended_filename_from_pil_image_custom(self.image, 'http://a/v1', 'llava')
+        b = ai.get_recommended_filename_from_pil_image_custom(self.image, 'http://b/v1', 'llava')
+
+        self.assertEqual((a, b), ('from_a', 'from_b'))
+
+    @patch('lib.ai.gemini_request')
+    def test_gemini_uses_cache(self, mock_request):
+        mock_request.return_value = 'gemini_doc'
+
+        ai.get_recommended_filename_from_pil_image_gemini(self.image, 'key')
+        result = ai.get_recommended_filename_from_pil_image_gemini(self.image, 'key')
+
+        self.assertEqual(result, 'gemini_doc')
+        mock_request.assert_called_once()
+
+    @patch('lib.ai.apirequest')
+    def test_failures_are_not_cached(self, mock_apirequest):
+        mock_apirequest.side_effect = [Exception('down'), 'second_try']
+
+        self.assertEqual(ai.get_recommended_filename_from_pil_image(self.image, 'key'), '')
+        self.assertEqual(ai.get_recommended_filename_from_pil_image(self.image, 'key'), 'second_try')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import threading
+import time
+import unittest
+
+from lib.ai_hedge import Candidate, LatencyStats, first_valid_suggestion
+
+
+def answering(name, filename, delay=0.0, calls=None):
+    def fetch(document, cancel):
+        if calls is not None:
+            calls.append(name)
+        time.sleep(delay)
+        return filename
+    return Candidate(name, 'openai', fetch)
+
+
+class TestFirstValidSuggestion(unittest.TestCase):
+    def test_fast_primary_is_the_only_one_asked(self):
+        calls = []
+        candidates = [answering('primary', 'invoice_2024', calls=calls), answering('secondary', 'other', calls=calls)]
+
+        self.assertEqual(first_valid_suggestion(None, candidates, budget=1.0), 'invoice_2024')
+        self.assertEqual(calls, ['primary'])
+
+    def test_slow_primary_is_hedged_after_the_budget(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        stats = LatencyStats()
+        slow = Candidate('slow', 'gemini', lambda document, cancel: release.wait(5) and 'late_name')
+        candidates = [slow, answering('fast', 'fast_name')]
+
+        start = time.monotonic()
+        filename = first_valid_suggestion(None, candidates, budget=0.2, stats=stats)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(filename, 'fast_name')
+        self.assertGreaterEqual(elapsed, 0.2)
+        self.assertLess(elapsed, 2)
+        # the abandoned request still counts once it is done
+        release.set()
+        for _ in range(100):
+            if 'slow' in stats.summary():
+                break
+            time.sleep(0.01)
+        self.assertEqual(stats.summary()['slow'][1], 1)
+
+    def test_losing_request_is_cancelled(self):
+        stopped = threading.Event()
+
+        def slow(document, cancel):
+            if cancel.wait(5):
+                stopped.set()
+            return 'late_name'
+        candidates = [Candidate('slow', 'gemini', slow), answering('fast', 'fast_name')]
+
+        self.assertEqual(first_valid_suggestion(None, candidates, budget=0.05), 'fast_name')
+        # the slow request is told to stop rather than left to run to its end
+        self.assertTrue(stopped.wait(1))
+
+    def test_failure_hands_over_without_waiting_for_the_budget(self):
+        calls = []
+        candidates = [answering('broken', '', calls=calls), answering('working', 'name', calls=calls)]
+
+        start = time.monotonic()
+        self.assertEqual(first_valid_suggestion(None, candidates, budget=10), 'name')
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(calls, ['broken', 'working'])
+
+    def test_gives_up_at_the_timeout(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        hanging = [Candidate(name, 'openai', lambda document, cancel: release.wait(5) and 'late') for name in ('a', 'b')]
+
+        start = time.monotonic()
+        self.assertEqual(first_valid_suggestion(None, hanging, budget=0.05, timeout=0.3), '')
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 0.3)
+        self.assertLess(elapsed, 2)
+
+    def test_no_valid_answer(self):
+        def raises(document, cancel):
+            raise RuntimeError('quota exceeded')
+        candidates = [answering('a', None), Candidate('b', 'gemini', raises), answering('c', '  ')]
+        self.assertEqual(first_valid_suggestion(None, candidates, budget=0.05), '')
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_fastest_reliable_candidate_goes_first(self):
+        stats = LatencyStats()
+        candidates = [answering(name, 'x') for name in ('pro', 'flash', 'untried', 'failing')]
+        stats.record('pro', 4.0, True)
+        stats.record('flash', 1.5, True)
+        stats.record('failing', 0.1, False)
+
+        self.assertEqual([c.name for c in stats.order(candidates)], ['flash', 'pro', 'untried', 'failing'])
+
+        # failures make a fast candidate less attractive
+        for _ in range(6):
+            stats.record('flash', 1.5, False)
+        self.assertEqual([c.name for c in stats.order(candidates)][:2], ['pro', 'flash'])
+
+    def test_latency_is_smoothed(self):
+        stats = LatencyStats(smoothing=0.5)
+        stats.record('a', 2.0, True)
+        stats.record('a', 4.0, True)
+        self.assertEqual(stats.summary()['a'], (3.0, 2, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
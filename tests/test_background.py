@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+
+from lib.background import TkExecutor
+
+
+class FakeRoot:
+    """Collects after() callbacks so the test can run the 'Tk' loop by hand"""
+    def __init__(self):
+        self.callbacks = []
+        self.thread = threading.current_thread()
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+
+    def run_until(self, predicate, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            callbacks, self.callbacks = self.callbacks, []
+            for callback in callbacks:
+                callback()
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return predicate()
+
+
+class TestTkExecutor(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.executor = TkExecutor(self.root, max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_success_callback_runs_on_tk_thread(self):
+        results = []
+
+        def work():
+            return threading.current_thread()
+
+        self.executor.submit(work, on_success=lambda worker: results.append((worker, threading.current_thread())))
+
+        self.assertTrue(self.root.run_until(lambda: results))
+        worker, callback_thread = results[0]
+        self.assertIsNot(worker, self.root.thread)
+        self.assertIs(callback_thread, self.root.thread)
+
+    def test_error_callback_receives_exception(self):
+        errors = []
+
+        def boom():
+            raise ValueError('bad page')
+
+        self.executor.submit(boom, on_error=errors.append)
+
+        self.assertTrue(self.root.run_until(lambda: errors))
+        self.assertIsInstance(errors[0], ValueError)
+
+    def test_cancelled_task_never_calls_back(self):
+        release = threading.Event()
+        results = []
+        task = self.executor.submit(release.wait, 5, on_success=results.append)
+
+        task.cancel()
+        release.set()
+        self.root.run_until(lambda: not self.root.callbacks, timeout=0.5)
+
+        self.assertFalse(task.pending)
+        self.assertEqual(results, [])
+
+    def test_timeout_cancels_and_notifies(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        timed_out = []
+        results = []
+        task = self.executor.submit(release.wait, 5, on_success=results.append,
+                                    timeout=0.05, on_timeout=lambda: timed_out.append(True))
+
+        self.assertTrue(self.root.run_until(lambda: timed_out))
+        self.assertTrue(task.cancelled)
+        release.set()
+        self.root.run_until(lambda: False, timeout=0.1)
+        self.assertEqual(results, [])
+
+    def test_call_in_ui_from_worker(self):
+        seen = []
+
+        def work():
+            self.executor.call_in_ui(seen.append, threading.current_thread())
+            time.sleep(0.05)
+
+        self.executor.submit(work)
+
+        self.assertTrue(self.root.run_until(lambda: seen))
+        self.assertIsNot(seen[0], self.root.thread)
+
+    def test_polling_stops_when_idle(self):
+        done = []
+        self.executor.submit(lambda: 1, on_success=done.append)
+        self.assertTrue(self.root.run_until(lambda: done))
+
+        callbacks, self.root.callbacks = self.root.callbacks, []
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.root.callbacks, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import time
+import types
+import unittest
+
+from PIL import Image, ImageDraw
+
+import lib.scanner as scanner
+from lib.blank_page import DEFAULT_THRESHOLD, ink_coverage, is_blank
+from lib.simulated_scanner import make_page
+
+
+def blank_page(dpi=150, color=True):
+    """An empty sheet with a little scanner noise"""
+    size = (int(8.27 * dpi), int(11.69 * dpi))
+    noise = Image.effect_noise(size, 12)
+    page = Image.blend(Image.new('L', size, 246), noise, 0.06)
+    return page.convert('RGB') if color else page
+
+
+class TestBlankPage(unittest.TestCase):
+    def test_empty_sheet_is_blank(self):
+        self.assertTrue(is_blank(blank_page()))
+        self.assertTrue(is_blank(blank_page(color=False)))
+        self.assertEqual(ink_coverage(blank_page()), 0.0)
+
+    def test_scanner_noise_is_not_ink(self):
+        size = (1240, 1754)
+        # grey paper with the pixel noise of a cheap sensor (sigma 8)
+        page = Image.eval(Image.effect_noise(size, 8), lambda value: min(255, value + 100))
+        self.assertTrue(is_blank(page))
+
+    def test_printed_page_is_not_blank(self):
+        self.assertFalse(is_blank(make_page(150, color=True)))
+        self.assertFalse(is_blank(make_page(150, color=False)))
+
+    def test_single_line_of_text_is_not_blank(self):
+        page = blank_page()
+        ImageDraw.Draw(page).rectangle([200, 300, 900, 311], fill=(30, 30, 30))
+        self.assertFalse(is_blank(page))
+
+    def test_margins_and_faint_show_through_are_ignored(self):
+        page = blank_page()
+        draw = ImageDraw.Draw(page)
+        # lid shadow along the edge and a punch hole in the margin
+        draw.rectangle([0, 0, 30, page.height], fill=(20, 20, 20))
+        draw.ellipse([40, 800, 70, 830], fill=(0, 0, 0))
+        # text from the other side showing through
+        page = Image.blend(page, make_page(150).resize(page.size), 0.15)
+        self.assertTrue(is_blank(page))
+
+    def test_threshold_is_tunable(self):
+        page = blank_page()
+        ImageDraw.Draw(page).rectangle([600, 1500, 640, 1520], fill=(30, 30, 30))  # a page number
+        coverage = ink_coverage(page)
+        self.assertGreater(coverage, DEFAULT_THRESHOLD)
+        self.assertFalse(is_blank(page))
+        self.assertTrue(is_blank(page, threshold=coverage * 2))
+
+    def test_coloured_paper_is_not_ink(self):
+        page = Image.new('RGB', (1240, 1754), (120, 160, 210))
+        self.assertTrue(is_blank(page))
+
+    def test_bilevel_and_palette_pages(self):
+        self.assertTrue(is_blank(Image.new('1', (1240, 1754), 1)))
+        page = make_page(150, color=False)
+        self.assertFalse(is_blank(page.convert('1')))
+        self.assertFalse(is_blank(page.convert('P')))
+
+    def test_fast_enough_for_the_scan_loop(self):
+        page = make_page(300, color=False)
+        is_blank(page)
+        start = time.perf_counter()
+        for _ in range(5):
+            is_blank(page)
+        # a few milliseconds in practice; generous for slow CI machines
+        self.assertLess((time.perf_counter() - start) / 5, 0.1)
+
+    def test_scan_batch_leaves_out_blank_pages(self):
+        pages = [make_page(100, seed=1), blank_page(100), make_page(100, seed=2), blank_page(100)]
+        dummy = types.SimpleNamespace(scan_pages=lambda scanner_name=None: iter(pages))
+        orig = scanner.scanclient
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        blanks = []
+        try:
+            scanner.scanclient = dummy
+            count = scanner.scan_batch(path, skip_blank=True, on_blank=blanks.append)
+        finally:
+            scanner.scanclient = orig
+
+        self.assertEqual(count, 2)
+        self.assertEqual(len(blanks), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
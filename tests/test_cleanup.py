@@ -0,0 +1,149 @@
+import os
+import tempfile
+import types
+import unittest
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageOps
+
+import lib.scanner as scanner
+from lib import cleanup, process_pool
+from lib.simulated_scanner import make_page
+
+PAPER = (250, 248, 242)
+
+
+def tearDownModule():
+    # tests/run_tests.py leaves with os._exit(), which skips the atexit shutdown
+    process_pool.shutdown_pool()
+
+
+def page(dpi=150, seed=0):
+    image = make_page(dpi, color=True, seed=seed)
+    image.info['dpi'] = (dpi, dpi)
+    return image
+
+
+def tilted(image, angle):
+    return image.rotate(angle, resample=Image.BICUBIC, fillcolor=PAPER)
+
+
+def on_scanner_background(image, border=40):
+    """The page as a flatbed or feeder delivers it: on the dark lid/background"""
+    framed = ImageOps.expand(image, border=border, fill=(15, 15, 15))
+    framed.info['dpi'] = image.info['dpi']
+    return framed
+
+
+class TestCleanup(unittest.TestCase):
+    def test_skew_is_measured(self):
+        straight = page()
+        for angle in (-3.0, -0.8, 1.5, 4.0):
+            self.assertAlmostEqual(cleanup.estimate_skew(tilted(straight, angle)), angle, delta=0.2)
+        self.assertAlmostEqual(cleanup.estimate_skew(straight), 0.0, delta=0.2)
+
+    def test_deskew_levels_the_page(self):
+        deskewed = cleanup.deskew(tilted(page(), 2.5))
+        self.assertAlmostEqual(cleanup.estimate_skew(deskewed), 0.0, delta=0.2)
+
+    def test_blank_page_has_no_skew(self):
+        self.assertEqual(cleanup.estimate_skew(Image.new('L', (1240, 1754), 250)), 0.0)
+
+    def test_scanner_background_is_cropped_away(self):
+        framed = on_scanner_background(tilted(page(), 2.0))
+        left, top, right, bottom = cleanup.content_box(framed)
+        # the dark frame (40 px) and the dark corners of the tilted sheet are not content
+        self.assertGreater(left, 40)
+        self.assertGreater(top, 40)
+        self.assertLess(right, framed.width - 40)
+        self.assertLess(bottom, framed.height - 40)
+
+    def test_empty_page_is_not_cropped(self):
+        blank = Image.new('L', (400, 600), 250)
+        self.assertEqual(cleanup.content_box(blank), (0, 0, 400, 600))
+
+    def test_threshold_keeps_text_and_drops_shading(self):
+        gray = Image.new('L', (600, 400), 230)
+        draw = ImageDraw.Draw(gray)
+        # a shadow across half the page, with text on both sides of it
+        draw.rectangle([300, 0, 600, 400], fill=150)
+        draw.rectangle([50, 100, 250, 110], fill=40)
+        draw.rectangle([350, 100, 550, 110], fill=20)
+        gray.info['dpi'] = (150, 150)
+
+        result = cleanup.adaptive_threshold(gray)
+        pixels = np.asarray(result)
+
+        self.assertEqual(result.mode, '1')
+        self.assertEqual(result.info['dpi'], (150, 150))
+        self.assertFalse(pixels[100:110, 60:240].any())   # text is black
+        self.assertFalse(pixels[100:110, 360:540].any())
+        self.assertTrue(pixels[200:300, 50:250].all())    # paper is white
+        self.assertTrue(pixels[200:300, 350:550].all())   # shadowed paper too
+
+    def test_clean_page_runs_the_chosen_steps(self):
+        framed = on_scanner_background(tilted(page(), 1.5))
+
+        cleaned = cleanup.clean_page(framed)
+        self.assertEqual(cleaned.mode, '1')
+        self.assertLess(cleaned.width, framed.width)
+        self.assertEqual(cleaned.info['dpi'], (150, 150))
+
+        color = cleanup.clean_page(framed, binarize=False)
+        self.assertEqual(color.mode, 'RGB')
+        self.assertAlmostEqual(cleanup.estimate_skew(color), 0.0, delta=0.2)
+
+        untouched = cleanup.clean_page(framed, deskew=False, crop=False, binarize=False)
+        self.assertEqual(untouched.size, framed.size)
+
+    def test_unknown_option(self):
+        with self.assertRaises(KeyError):
+            cleanup.clean_page(page(), sharpen=True)
+
+    def test_pool_returns_pages_in_order(self):
+        pages = [tilted(page(100, seed=seed), 1.0) for seed in range(3)]
+        for image in pages:
+            image.info['dpi'] = (100, 100)
+        expected = [cleanup.clean_page(image.copy(), crop=False) for image in pages]
+
+        results = list(cleanup.clean_pages(pages, workers=1, crop=False))
+
+        self.assertEqual([image.tobytes() for image in results], [image.tobytes() for image in expected])
+        self.assertEqual(results[0].info['dpi'], (100, 100))
+
+    def test_scan_batch_cleans_pages(self):
+        pages = [on_scanner_background(page(100, seed=seed)) for seed in range(2)]
+        dummy = types.SimpleNamespace(scan_pages=lambda scanner_name=None: iter(pages))
+        orig = scanner.scanclient
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        seen = []
+        try:
+            scanner.scanclient = dummy
+            count = scanner.scan_batch(path, on_page=lambda number, image: seen.append(image.mode),
+                                       cleanup={}, cleanup_workers=1)
+        finally:
+            scanner.scanclient = orig
+
+        self.assertEqual(count, 2)
+        self.assertEqual(seen, ['1', '1'])
+
+    def test_scan_image_cleans_the_page(self):
+        dummy = types.SimpleNamespace(scan_image=lambda scanner_name=None: on_scanner_background(page()))
+        orig = scanner.scanclient
+        try:
+            scanner.scanclient = dummy
+            document = scanner.scan_image(cleanup={'binarize': True})
+        finally:
+            scanner.scanclient = orig
+
+        self.assertEqual(document.image.mode, '1')
+        # a bilevel page is uploaded bilevel, not blown up into a JPEG
+        path = document.write_temp()
+        self.addCleanup(os.remove, path)
+        self.assertFalse(path.endswith('.jpg'))
+
+
+if __name__ == '__main__':
+    unittest.main()
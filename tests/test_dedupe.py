@@ -0,0 +1,207 @@
+import hashlib
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+import lib.scanner as scanner
+from lib import upload_queue
+from lib.dedupe import ChecksumCache, DuplicateChecker
+from lib.upload_queue import UploadQueue
+from tests.test_upload_queue import wait_for
+
+
+class FakeDocumentsApi:
+    """Answers /api/documents/ count queries from a set of stored checksums"""
+
+    def __init__(self, checksums, supports_in=True):
+        self.checksums = set(checksums)
+        self.supports_in = supports_in
+        self.queries = []
+
+    def __call__(self, url, params=None, **kwargs):
+        self.queries.append(params)
+        if 'checksum__iexact' in params:
+            count = int(params['checksum__iexact'] in self.checksums)
+        elif 'checksum__in' in params and self.supports_in:
+            count = len(self.checksums & set(params['checksum__in'].split(',')))
+        else:
+            count = len(self.checksums)  # unknown filters are ignored
+        response = Mock()
+        response.json = lambda: {'count': count, 'results': []}
+        return response
+
+
+def checksum(number):
+    return hashlib.md5(str(number).encode()).hexdigest()
+
+
+class TestChecksums(unittest.TestCase):
+    def setUp(self):
+        scanner.close_clients()
+        self.addCleanup(scanner.close_clients)
+        self.client = scanner.get_client('http://localhost:8000', 'token123')
+
+    def test_file_checksum_streams_the_file(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        data = os.urandom(100_000)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        self.assertEqual(scanner.file_checksum(path, chunk_size=4096), hashlib.md5(data).hexdigest())
+
+    def test_batch_of_new_documents_costs_one_request(self):
+        api = FakeDocumentsApi([checksum(n) for n in range(1000, 1010)])
+        with patch('lib.scanner.requests.Session.get', side_effect=api):
+            found = self.client.existing_checksums([checksum(n) for n in range(40)])
+
+        self.assertEqual(found, set())
+        # none found is right whether or not the server filters: no probe needed
+        self.assertEqual(len(api.queries), 1)
+        self.assertEqual(api.queries[0]['checksum__in'].count(','), 39)
+
+    def test_mixed_batches_are_split(self):
+        api = FakeDocumentsApi([checksum(3), checksum(17)])
+        with patch('lib.scanner.requests.Session.get', side_effect=api):
+            found = self.client.existing_checksums([checksum(n) for n in range(32)], batch_size=16)
+
+        self.assertEqual(found, {checksum(3), checksum(17)})
+        # far fewer requests than one per checksum
+        self.assertLess(len(api.queries), 20)
+
+    def test_servers_without_checksum_in_are_asked_one_by_one(self):
+        api = FakeDocumentsApi([checksum(1), checksum(100)], supports_in=False)
+        with patch('lib.scanner.requests.Session.get', side_effect=api):
+            found = self.client.existing_checksums([checksum(n) for n in range(5)])
+
+        self.assertEqual(found, {checksum(1)})
+        self.assertFalse(self.client.checksum_in_supported)
+        self.assertEqual(sum('checksum__iexact' in query for query in api.queries), 5)
+
+    def test_empty_server_does_not_prove_checksum_in(self):
+        api = FakeDocumentsApi([], supports_in=False)
+        with patch('lib.scanner.requests.Session.get', side_effect=api):
+            self.assertEqual(self.client.existing_checksums([checksum(1)]), set())
+            self.assertIsNone(self.client.checksum_in_supported)
+
+            # one document later, the ignored filter counts it for any checksum
+            api.checksums.add(checksum(100))
+            found = self.client.existing_checksums([checksum(2)])
+
+        self.assertEqual(found, set())
+        self.assertFalse(self.client.checksum_in_supported)
+
+    def test_checksum_in_is_trusted_once_it_narrows_the_documents_down(self):
+        api = FakeDocumentsApi([checksum(1)])
+        with patch('lib.scanner.requests.Session.get', side_effect=api):
+            self.assertEqual(self.client.existing_checksums([checksum(1)]), {checksum(1)})
+
+        self.assertTrue(self.client.checksum_in_supported)
+        self.assertEqual(api.queries[1]['checksum__in'], '0' * 32)
+        self.assertEqual(len(api.queries), 2)
+
+
+class TestChecksumCache(unittest.TestCase):
+    def test_known_checksums_expire(self):
+        now = [1000.0]
+        cache = ChecksumCache(':memory:', ttl=60, clock=lambda: now[0])
+        cache.add('http://paperless', ['a', 'b'])
+
+        self.assertEqual(cache.known('http://paperless', ['a', 'c']), {'a'})
+        self.assertEqual(cache.known('http://other', ['a']), set())
+        now[0] += 61
+        self.assertEqual(cache.known('http://paperless', ['a', 'b']), set())
+        cache.close()
+
+
+class TestDuplicateChecker(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.paths = []
+        for number in range(3):
+            path = os.path.join(self.directory.name, f'doc{number}.pdf')
+            with open(path, 'wb') as f:
+                f.write(str(number).encode())
+            self.paths.append(path)
+        self.client = Mock()
+        self.client.existing_checksums.side_effect = lambda checksums, batch_size: {c for c in checksums if c == checksum(0)}
+        self.cache = ChecksumCache(':memory:')
+        self.addCleanup(self.cache.close)
+        self.checker = DuplicateChecker(self.cache, client_factory=lambda url, token: self.client)
+
+    def test_finds_duplicates_in_one_request_and_caches_them(self):
+        found = self.checker.find_duplicates('http://paperless/', 'token', self.paths)
+
+        self.assertEqual(found, {self.paths[0]})
+        self.assertEqual(self.client.existing_checksums.call_count, 1)
+        self.assertEqual(self.cache.known('http://paperless', [checksum(0)]), {checksum(0)})
+
+        # asked again: the duplicate comes from the cache, the new files from the recent "not found"
+        self.assertEqual(self.checker.find_duplicates('http://paperless', 'token', self.paths), {self.paths[0]})
+        self.assertEqual(self.client.existing_checksums.call_count, 1)
+
+    def test_changed_file_is_checksummed_again(self):
+        self.checker.find_duplicates('http://paperless', 'token', [self.paths[1]])
+        with open(self.paths[1], 'wb') as f:
+            f.write(b'0')
+        os.utime(self.paths[1], ns=(0, 0))
+
+        self.assertEqual(self.checker.find_duplicates('http://paperless', 'token', [self.paths[1]]), {self.paths[1]})
+
+    def test_memory_is_bounded(self):
+        now = [0.0]
+        checker = DuplicateChecker(self.cache, client_factory=lambda url, token: self.client, clock=lambda: now[0],
+                                   negative_ttl=60, max_files=2)
+        for path in self.paths:
+            checker.find_duplicates('http://paperless', 'token', [path])
+            now[0] += 70
+
+        # only the two most recent file versions keep their checksum
+        self.assertEqual(len(checker._checksums), 2)
+        self.assertNotIn(os.path.abspath(self.paths[0]), [key[0] for key in checker._checksums])
+        # and "not found" answers are dropped once they expire
+        self.assertEqual(list(checker._not_found), [('http://paperless', checksum(2))])
+
+    def test_unreachable_server_means_upload_anyway(self):
+        self.client.existing_checksums.side_effect = ConnectionError("down")
+
+        self.assertEqual(self.checker.find_duplicates('http://paperless', 'token', self.paths), set())
+        # not remembered as "not found"
+        self.client.existing_checksums.side_effect = lambda checksums, batch_size: set(checksums)
+        self.assertEqual(len(self.checker.find_duplicates('http://paperless', 'token', self.paths)), 3)
+
+
+class TestUploadQueueDuplicates(unittest.TestCase):
+    def test_duplicates_are_skipped_and_waiting_jobs_checked_together(self):
+        release = threading.Event()
+        uploaded = []
+
+        def fake_upload(file_path, *args, **kwargs):
+            release.wait(5)
+            uploaded.append(file_path)
+            return True, None, 'task'
+
+        duplicates = Mock()
+        duplicates.batch_size = 50
+        duplicates.find_duplicates.side_effect = lambda url, token, paths: {'b.pdf'} & set(paths)
+        q = UploadQueue(workers=1, upload_func=fake_upload, duplicates=duplicates)
+        # the jobs pile up behind a first upload
+        q.submit('first.pdf', 'http://paperless', 'token')
+        jobs = [q.submit(name, 'http://paperless', 'token') for name in ('a.pdf', 'b.pdf', 'c.pdf')]
+        release.set()
+
+        self.assertTrue(wait_for(lambda: all(job.finished for job in jobs)))
+        self.assertEqual([job.status for job in jobs], [upload_queue.DONE, upload_queue.DUPLICATE, upload_queue.DONE])
+        self.assertEqual(uploaded, ['first.pdf', 'a.pdf', 'c.pdf'])
+        # the check made for a.pdf covered every waiting job
+        self.assertEqual(duplicates.find_duplicates.call_args_list[1][0],
+                         ('http://paperless', 'token', ['a.pdf', 'b.pdf', 'c.pdf']))
+        q.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+
+from lib.document import Document
+
+
+def jpeg_bytes(image, **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', **params)
+    return buffer.getvalue()
+
+
+class TestDocument(unittest.TestCase):
+    def setUp(self):
+        self.image = Image.new('RGB', (120, 80), 'white')
+
+    def test_encode_once_per_format(self):
+        document = Document(self.image)
+        with patch.object(self.image, 'save', wraps=self.image.save) as save:
+            first = document.encode('JPEG')
+            second = document.encode('JPEG')
+            document.encode('PNG')
+
+        self.assertIs(first, second)
+        self.assertEqual(save.call_count, 2)
+
+    def test_parameters_are_part_of_the_key(self):
+        document = Document(self.image)
+        self.assertIsNot(document.encode('JPEG', quality=30), document.encode('JPEG', quality=90))
+
+    def test_scanner_bytes_are_reused(self):
+        data = jpeg_bytes(self.image, quality=95)
+        document = Document.from_bytes(data)
+
+        self.assertEqual(document.size, (120, 80))
+        self.assertIs(document.encode('JPEG'), data)
+
+    def test_save_uses_extension_format(self):
+        document = Document(self.image)
+        with tempfile.TemporaryDirectory() as workdir:
+            png_path = document.save(os.path.join(workdir, 'page.png'))
+            jpg_path = document.save(os.path.join(workdir, 'page.jpg'))
+            with Image.open(png_path) as png, Image.open(jpg_path) as jpg:
+                self.assertEqual((png.format, jpg.format), ('PNG', 'JPEG'))
+
+    def test_jpeg_of_rgba_page(self):
+        document = Document(Image.new('RGBA', (10, 10)))
+        with Image.open(io.BytesIO(document.encode('JPEG'))) as image:
+            self.assertEqual(image.mode, 'RGB')
+
+    def test_write_temp(self):
+        document = Document(self.image)
+        path = document.write_temp('JPEG')
+        self.addCleanup(os.remove, path)
+        self.assertTrue(path.endswith('.jpg'))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), document.encode('JPEG'))
+
+    def test_write_temp_picks_compact_format(self):
+        # an empty white page has no colour and no grey: bilevel group 4 TIFF
+        document = Document(self.image)
+        path = document.write_temp()
+        self.addCleanup(os.remove, path)
+        self.assertEqual(os.path.splitext(path)[1], document.compact_extension())
+        with Image.open(path) as image:
+            self.assertEqual(image.mode, '1')
+
+    def test_memo_builds_once_across_threads(self):
+        document = Document(self.image)
+        calls = []
+        started = threading.Event()
+
+        def build():
+            calls.append(1)
+            started.wait(1)
+            return b'payload'
+
+        threads = [threading.Thread(target=document.memo, args=('ai', build)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(document.memo('ai', build), b'payload')
+
+    def test_wrap(self):
+        document = Document(self.image)
+        self.assertIs(Document.wrap(document), document)
+        self.assertIsNone(Document.wrap(None))
+        self.assertIs(Document.wrap(self.image).image, self.image)
+
+
+if __name__ == '__main__':
+    unittest.main()
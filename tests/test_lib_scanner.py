@@ -4,6 +4,7 @@ import importlib
 import types
 import unittest
 from unittest.mock import patch, Mock
+from PIL import Image
 
 import lib.scanner as scanner
 
@@ -12,6 +13,8 @@ class TestLibScanner(unittest.TestCase):
     def setUp(self):
         self.api_url = 'http://localhost:8000'
         self.api_token = 'token123' # clearly fake
+        scanner.close_clients()
+        self.addCleanup(scanner.close_clients)
 
     def test_upload_success_closes_file_and_returns_true(self):
         # create a temp file
@@ -23,19 +26,20 @@ class TestLibScanner(unittest.TestCase):
 
         captured = {}
 
-        def fake_post(url, headers=None, files=None, data=None):
-            # capture what was passed
+        def fake_post(url, data=None, headers=None, **kwargs):
+            # capture what was passed, reading the streamed body like the server would
             captured['url'] = url
             captured['headers'] = headers
-            captured['files'] = files
             captured['data'] = data
+            captured['file'] = next(part for part in data._parts if hasattr(part, 'name'))
+            captured['body'] = data.read()
             # return a response-like object
             resp = Mock()
             resp.status_code = 200
             resp.json = lambda: {'status': 'ok'}
             return resp
 
-        with patch('lib.scanner.requests.post', side_effect=fake_post) as mock_post:
+        with patch('lib.scanner.requests.Session.post', side_effect=fake_post) as mock_post:
             ok, code, resp = scanner.upload_to_paperlessngx(path, self.api_url, self.api_token, filename='mydoc.pdf')
 
         # Should return success
@@ -45,28 +49,85 @@ class TestLibScanner(unittest.TestCase):
 
         # Ensure post was called and url formed correctly
         self.assertEqual(captured['url'], f'{self.api_url}/api/documents/post_document/')
-        # Data should include title without extension
-        self.assertEqual(captured['data'].get('title'), 'mydoc')
+        # Body should include title without extension and the document
+        self.assertIn(b'name="title"\r\n\r\nmydoc\r\n', captured['body'])
+        self.assertIn(b'\r\n\r\nhello\r\n', captured['body'])
+        self.assertEqual(captured['headers']['Content-Type'], captured['data'].content_type)
 
         # The file object used should be closed by the function
-        fileobj = captured['files']['document']
+        fileobj = captured['file']
         self.assertTrue(fileobj.closed)
 
         os.remove(path)
 
+    def test_upload_reports_progress(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 50000)
+
+        def fake_post(url, data=None, **kwargs):
+            while data.read(8192):
+                pass
+            resp = Mock()
+            resp.status_code = 200
+            resp.json = lambda: 'task-id'
+            return resp
+
+        progress = []
+        with patch('lib.scanner.requests.Session.post', side_effect=fake_post):
+            scanner.upload_to_paperlessngx(path, self.api_url, self.api_token,
+                                           progress=lambda sent, total: progress.append((sent, total)))
+
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(progress[-1][0], progress[-1][1])
+        self.assertGreater(progress[-1][1], 50000)
+
+    def test_upload_returns_consume_task_id(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        resp = Mock()
+        resp.status_code = 200
+        resp.json = lambda: '3e6e9ab7-03a9-4a0b-a8c8-5c3a2a0e5f0c'
+        with patch('lib.scanner.requests.Session.post', return_value=resp):
+            ok, code, task_id = scanner.upload_to_paperlessngx(path, self.api_url, self.api_token)
+
+        self.assertTrue(ok)
+        self.assertIsNone(code)
+        self.assertEqual(task_id, '3e6e9ab7-03a9-4a0b-a8c8-5c3a2a0e5f0c')
+
+    def test_get_tasks_asks_for_many_ids_at_once(self):
+        resp = Mock()
+        resp.json = lambda: [
+            {'task_id': 'a', 'status': 'SUCCESS'},
+            {'task_id': 'b', 'status': 'PENDING'},
+            {'task_id': 'other', 'status': 'SUCCESS'},
+        ]
+        with patch('lib.scanner.requests.Session.get', return_value=resp) as mock_get:
+            tasks = scanner.get_client(self.api_url, self.api_token).get_tasks(['a', 'b'])
+
+        args, kwargs = mock_get.call_args
+        self.assertEqual(args[0], f'{self.api_url}/api/tasks/')
+        self.assertEqual(kwargs['params'], {'task_id__in': 'a,b'})
+        # tasks that were not asked for (a server ignoring the filter) are dropped
+        self.assertEqual([task['task_id'] for task in tasks], ['a', 'b'])
+
     def test_upload_failure_returns_false_and_response(self):
         fd, path = tempfile.mkstemp(suffix='.pdf')
         os.close(fd)
         with open(path, 'wb') as f:
             f.write(b'content')
 
-        def fake_post(url, headers=None, files=None, data=None):
+        def fake_post(url, files=None, data=None, **kwargs):
             resp = Mock()
             resp.status_code = 400
             resp.json = lambda: {'error': 'bad'}
             return resp
 
-        with patch('lib.scanner.requests.post', side_effect=fake_post):
+        with patch('lib.scanner.requests.Session.post', side_effect=fake_post):
             ok, code, resp = scanner.upload_to_paperlessngx(path, self.api_url, self.api_token, filename='file.txt')
 
         self.assertFalse(ok)
@@ -75,6 +136,36 @@ class TestLibScanner(unittest.TestCase):
 
         os.remove(path)
 
+    def test_upload_reuses_one_client_per_server(self):
+        def fake_post(url, files=None, data=None, **kwargs):
+            resp = Mock()
+            resp.status_code = 200
+            resp.json = lambda: {'status': 'ok'}
+            return resp
+
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        with patch('lib.scanner.requests.Session.post', side_effect=fake_post):
+            scanner.upload_to_paperlessngx(path, self.api_url, self.api_token)
+            client = scanner.get_client(self.api_url, self.api_token)
+            scanner.upload_to_paperlessngx(path, self.api_url, self.api_token)
+
+        # same session for both uploads, authenticated once
+        self.assertIs(scanner.get_client(self.api_url, self.api_token), client)
+        self.assertEqual(client.session.headers['Authorization'], f'Token {self.api_token}')
+        # a different token gets its own client
+        self.assertIsNot(scanner.get_client(self.api_url, 'other'), client)
+
+    def test_client_pool_size_is_configurable(self):
+        client = scanner.PaperlessClient(self.api_url + '/', self.api_token, pool_size=3)
+        self.addCleanup(client.close)
+
+        adapter = client.session.get_adapter('https://example.com')
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertEqual(client.api_url, self.api_url)
+
     def test_list_scanners_delegates_to_scanclient(self):
         # patch the scanclient on the module to a dummy object
         dummy = types.SimpleNamespace()
@@ -87,17 +178,76 @@ class TestLibScanner(unittest.TestCase):
         finally:
             scanner.scanclient = orig
 
+    def test_scan_batch_writes_every_page_to_one_pdf(self):
+        pages = [Image.new('RGB', (100, 150), color=c) for c in ('red', 'green', 'blue')]
+        dummy = types.SimpleNamespace()
+        dummy.scan_pages = lambda scanner_name=None: iter(pages)
+        orig = scanner.scanclient
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        seen = []
+        try:
+            scanner.scanclient = dummy
+            count = scanner.scan_batch(path, on_page=lambda number, page: seen.append(number))
+        finally:
+            scanner.scanclient = orig
+
+        self.assertEqual(count, 3)
+        self.assertEqual(seen, [1, 2, 3])
+        with open(path, 'rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF'))
+
+    def test_scan_batch_with_empty_feeder(self):
+        dummy = types.SimpleNamespace()
+        dummy.scan_pages = lambda scanner_name=None: iter(())
+        orig = scanner.scanclient
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            scanner.scanclient = dummy
+            count = scanner.scan_batch(path)
+        finally:
+            scanner.scanclient = orig
+
+        self.assertEqual(count, 0)
+        self.assertFalse(os.path.exists(path))
+
     def test_scan_image_delegates_to_scanclient(self):
+        page = Image.new('RGB', (10, 10), 'white')
         dummy = types.SimpleNamespace()
-        dummy.scan_image = lambda: 'IMG'
+        dummy.scan_image = lambda scanner_name=None: page
         orig = scanner.scanclient
         try:
             scanner.scanclient = dummy
-            img = scanner.scan_image()
-            self.assertEqual(img, 'IMG')
+            doc = scanner.scan_image()
+            self.assertIs(doc.image, page)
         finally:
             scanner.scanclient = orig
 
+    def test_scan_image_cancelled(self):
+        dummy = types.SimpleNamespace()
+        dummy.scan_image = lambda scanner_name=None: None
+        orig = scanner.scanclient
+        try:
+            scanner.scanclient = dummy
+            self.assertIsNone(scanner.scan_image())
+        finally:
+            scanner.scanclient = orig
+
+    def test_set_backend(self):
+        orig, orig_name = scanner.scanclient, scanner.backend_name
+        try:
+            scanner.set_backend('simulated')
+            self.assertEqual(scanner.backend_name, 'simulated')
+            self.assertEqual(scanner.list_scanners(), ['Simulated Scanner'])
+        finally:
+            scanner.scanclient, scanner.backend_name = orig, orig_name
+
+    def test_set_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            scanner.set_backend('twain')
+
 
 if __name__ == '__main__':
     unittest.main()
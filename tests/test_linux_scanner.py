@@ -0,0 +1,138 @@
+import threading
+import types
+import unittest
+from unittest.mock import Mock, patch
+
+from PIL import Image
+
+import lib.linux_scanner as linux_scanner
+
+
+class FakeDevice:
+    """Just enough of python-sane's SaneDev for the backend logic"""
+    def __init__(self, sources=('Flatbed', 'Automatic Document Feeder'), pages=3):
+        self.opt = {
+            'mode': types.SimpleNamespace(constraint=['Color', 'Gray']),
+            'resolution': types.SimpleNamespace(constraint=(75, 600, 1)),
+            'source': types.SimpleNamespace(constraint=list(sources)),
+        }
+        self.source = sources[0]
+        self.pages = pages
+        self.start = Mock()
+        self.close = Mock()
+
+    def snap(self):
+        return Image.new('RGB', (10, 10), 'white')
+
+    def multi_scan(self):
+        return iter([Image.new('RGB', (10, 10), 'white') for _ in range(self.pages)])
+
+
+class TestLinuxScanner(unittest.TestCase):
+    def setUp(self):
+        self.device = FakeDevice()
+        self.sane = Mock()
+        self.sane.get_devices.return_value = [('test:0', 'Noname', 'frontend-tester', 'virtual device')]
+        self.sane.open.return_value = self.device
+        patcher = patch.object(linux_scanner, 'sane', self.sane)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        linux_scanner._devices.clear()
+        self.addCleanup(linux_scanner._devices.clear)
+
+    def test_list_scanners_returns_device_names(self):
+        self.assertEqual(linux_scanner.list_scanners(), ['test:0'])
+
+    def test_list_scanners_without_sane(self):
+        with patch.object(linux_scanner, 'sane', None):
+            self.assertEqual(linux_scanner.list_scanners(), [])
+
+    def test_device_is_opened_once_and_configured(self):
+        linux_scanner.scan_image('test:0')
+        linux_scanner.scan_image('test:0')
+
+        self.sane.open.assert_called_once_with('test:0')
+        self.assertEqual(self.device.mode, 'Color')
+        self.assertEqual(self.device.resolution, 300)
+        self.assertEqual(self.device.start.call_count, 2)
+
+    def test_scan_image_uses_first_device_by_default(self):
+        image = linux_scanner.scan_image()
+        self.assertEqual(image.size, (10, 10))
+        self.sane.open.assert_called_once_with('test:0')
+        self.assertEqual(self.device.source, 'Flatbed')
+
+    def test_failed_scan_closes_handle(self):
+        self.device.start.side_effect = RuntimeError("Error during device I/O")
+        with self.assertRaises(RuntimeError):
+            linux_scanner.scan_image('test:0')
+
+        self.device.close.assert_called_once()
+        self.assertNotIn('test:0', linux_scanner._devices)
+
+    def test_scan_pages_selects_feeder(self):
+        pages = list(linux_scanner.scan_pages('test:0'))
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(self.device.source, 'Automatic Document Feeder')
+
+    def test_lock_is_released_between_pages(self):
+        pages = linux_scanner.scan_pages('test:0')
+        next(pages)
+
+        # the batch is still open, another thread can use the scanners meanwhile
+        other = threading.Thread(target=linux_scanner.list_scanners)
+        other.start()
+        other.join(2)
+        self.assertFalse(other.is_alive())
+        self.assertEqual(len(list(pages)), 2)
+
+    def test_failed_feeder_page_closes_handle(self):
+        def failing():
+            yield Image.new('RGB', (10, 10), 'white')
+            raise RuntimeError("Error during device I/O")
+        self.device.multi_scan = failing
+
+        pages = linux_scanner.scan_pages('test:0')
+        next(pages)
+        with self.assertRaises(RuntimeError):
+            next(pages)
+        self.device.close.assert_called_once()
+        self.assertNotIn('test:0', linux_scanner._devices)
+
+    def test_no_scanners_found(self):
+        self.sane.get_devices.return_value = []
+        with self.assertRaises(RuntimeError):
+            linux_scanner.scan_image()
+
+
+@unittest.skipUnless(linux_scanner.sane is not None, "python-sane is not installed")
+class TestSaneTestDevice(unittest.TestCase):
+    """Runs against SANE's built-in 'test' backend (enable it in /etc/sane.d/dll.conf)"""
+
+    @classmethod
+    def setUpClass(cls):
+        if 'test:0' not in linux_scanner.list_scanners():
+            raise unittest.SkipTest("SANE test device not available")
+
+    def tearDown(self):
+        linux_scanner.close_devices()
+
+    def test_scan_image(self):
+        image = linux_scanner.scan_image('test:0')
+        self.assertIsInstance(image, Image.Image)
+        self.assertGreater(image.width, 0)
+
+    def test_handle_reused_between_scans(self):
+        linux_scanner.scan_image('test:0')
+        device = linux_scanner._devices['test:0']
+        linux_scanner.scan_image('test:0')
+        self.assertIs(linux_scanner._devices['test:0'], device)
+
+    def test_scan_pages_from_feeder(self):
+        pages = list(linux_scanner.scan_pages('test:0'))
+        self.assertGreater(len(pages), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import io
+import os
+import tempfile
+import unittest
+
+from urllib3 import encode_multipart_formdata
+
+from lib.multipart import MultipartEncoder
+
+
+class TestMultipartEncoder(unittest.TestCase):
+    def test_body_matches_urllib3_encoding(self):
+        """Streaming output must be byte-for-byte what requests would have sent"""
+        content = b'%PDF-1.4 ' + os.urandom(5000)
+        expected, expected_type = encode_multipart_formdata(
+            {'title': 'my doc', 'document': ('scan "1".pdf', content, 'application/octet-stream')},
+            boundary='testboundary',
+        )
+        encoder = MultipartEncoder(
+            fields={'title': 'my doc'},
+            files={'document': ('scan "1".pdf', io.BytesIO(content), 'application/octet-stream')},
+            boundary='testboundary',
+        )
+
+        self.assertEqual(len(encoder), len(expected))
+        self.assertEqual(encoder.content_type, expected_type)
+        # read in odd-sized chunks to cross part boundaries
+        body = b''
+        while True:
+            chunk = encoder.read(777)
+            if not chunk:
+                break
+            body += chunk
+        self.assertEqual(body, expected)
+
+    def test_reads_file_in_bounded_chunks(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'x' * 100000)
+        self.addCleanup(os.remove, path)
+
+        with open(path, 'rb') as document:
+            encoder = MultipartEncoder(files={'document': ('doc.pdf', document, None)})
+            sizes = []
+            while True:
+                chunk = encoder.read(8192)
+                if not chunk:
+                    break
+                sizes.append(len(chunk))
+
+        self.assertLessEqual(max(sizes), 8192)
+        self.assertEqual(sum(sizes), len(encoder))
+
+    def test_callback_reports_bytes_sent(self):
+        progress = []
+        encoder = MultipartEncoder(
+            fields={'title': 'doc'},
+            files={'document': ('doc.pdf', io.BytesIO(b'a' * 1000), 'application/pdf')},
+            callback=lambda sent, total: progress.append((sent, total)),
+        )
+
+        while encoder.read(100):
+            pass
+
+        sent = [p[0] for p in progress]
+        self.assertEqual(sent, sorted(sent))
+        self.assertEqual(progress[-1], (len(encoder), len(encoder)))
+        self.assertTrue(all(total == len(encoder) for _, total in progress))
+
+
+if __name__ == '__main__':
+    unittest.main()
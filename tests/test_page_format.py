@@ -0,0 +1,97 @@
+import io
+import os
+import tempfile
+import unittest
+
+from PIL import Image, ImageFilter
+
+from lib import page_format
+from lib.document import Document
+from lib.page_format import COLOR, GRAY, TEXT, classify, encode_page
+from lib.pdf_writer import PdfPageWriter
+from lib.simulated_scanner import make_page
+
+
+def photo_page(dpi=150):
+    """A grayscale letter with a photo (gradient and grain) of about 3 x 2.5 inches on it"""
+    page = make_page(dpi, color=False)
+    size = (3 * dpi, int(2.5 * dpi))
+    photo = Image.blend(Image.linear_gradient('L').resize(size), Image.effect_noise(size, 40), 0.3)
+    page.paste(photo, (dpi, 6 * dpi))
+    return page
+
+
+def jpeg_size(image):
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, format='JPEG')
+    return buffer.tell()
+
+
+class TestPageFormat(unittest.TestCase):
+    def test_pages_are_classified(self):
+        self.assertEqual(classify(make_page(150, color=False)), TEXT)
+        self.assertEqual(classify(make_page(150, color=True)), COLOR)
+        self.assertEqual(classify(photo_page()), GRAY)
+        self.assertEqual(classify(Image.new('1', (100, 100), 1)), TEXT)
+        self.assertEqual(classify(Image.new('RGB', (1240, 1754), (250, 248, 242))), TEXT)
+
+    def test_colour_scan_of_a_black_and_white_letter_is_text(self):
+        # scanned in colour mode, with the tint of recycled paper
+        page = make_page(150, color=False).convert('RGB')
+        tinted = Image.blend(page, Image.new('RGB', page.size, (235, 225, 200)), 0.3)
+        self.assertEqual(classify(tinted), TEXT)
+
+    def test_soft_text_edges_are_not_midtones(self):
+        page = make_page(300, color=False).filter(ImageFilter.GaussianBlur(1.5))
+        self.assertEqual(classify(page), TEXT)
+
+    def test_text_is_stored_bilevel_and_much_smaller(self):
+        page = make_page(150, color=False).convert('RGB')
+        page.info['dpi'] = (150, 150)
+
+        fmt, extension, data = encode_page(page)
+
+        self.assertEqual((fmt, extension), page_format.output_format(TEXT)[::2])
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.mode, '1')
+            self.assertEqual(image.size, page.size)
+        self.assertLess(len(data), jpeg_size(page) / 10)
+
+    def test_gray_and_colour_pages_stay_jpeg(self):
+        for page, mode in ((photo_page(), 'L'), (make_page(150, color=True), 'RGB')):
+            fmt, extension, data = encode_page(page)
+            self.assertEqual((fmt, extension), ('JPEG', '.jpg'))
+            with Image.open(io.BytesIO(data)) as image:
+                self.assertEqual(image.mode, mode)
+
+    def test_document_saves_in_compact_format_once(self):
+        document = Document(make_page(150, color=False))
+        extension = document.compact_extension()
+        with tempfile.TemporaryDirectory() as workdir:
+            path = document.save(os.path.join(workdir, 'letter' + extension), compact=True)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), document.encode_compact()[2])
+        self.assertIs(document.encode_compact(), document.encode_compact())
+
+    def test_compact_pdf_pages(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        pages = [make_page(150, color=False, seed=1).convert('RGB'), make_page(150, color=True), photo_page()]
+
+        sizes = {}
+        for compact in (False, True):
+            writer = PdfPageWriter(path, compact=compact)
+            for page in pages:
+                writer.add_page(page)
+            sizes[compact] = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        self.assertEqual(writer.pages, 3)
+        self.assertIn(b'/CCITTFaxDecode', data)
+        self.assertLess(sizes[True], sizes[False] * 0.85)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import gc
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+
+from lib import page_store
+from lib.ai import prepare_image_bytes
+from lib.document import Document
+from lib.page_store import PageStore, pixel_bytes
+from lib.preview import PreviewRenderer
+from lib.simulated_scanner import make_page
+
+
+def noisy(mode, size=(300, 410)):
+    image = Image.effect_noise(size, 60)
+    return image.convert(mode) if mode != 'RGB' else Image.merge('RGB', [image, image.rotate(90, expand=False), image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)])
+
+
+class TestPageStore(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def store(self, max_bytes):
+        return PageStore(max_bytes, directory=self.workdir.name)
+
+    def test_least_recently_used_pages_spill_past_the_ceiling(self):
+        store = self.store(25_000)
+        a, b = store.add(Image.new('L', (100, 100), 10)), store.add(Image.new('L', (100, 100), 20))
+        self.assertEqual(store.resident_bytes, 20_000)
+
+        # a was used last, so b goes when a third page does not fit
+        self.assertEqual(a.image.getpixel((0, 0)), 10)
+        c = store.add(Image.new('L', (100, 100), 30))
+
+        self.assertEqual((a.spilled, b.spilled, c.spilled), (False, True, False))
+        self.assertEqual(store.resident_bytes, 20_000)
+        self.assertEqual(b.image.getpixel((0, 0)), 20)
+
+    def test_a_page_over_the_ceiling_is_spilled_straight_away(self):
+        page = self.store(1000).add(Image.new('RGB', (100, 100)))
+        self.assertTrue(page.spilled)
+        self.assertEqual(pixel_bytes(page.image), 40_000)
+
+    def test_spilled_pixels_round_trip(self):
+        store = self.store(0)
+        for mode in ('1', 'L', 'RGB', 'CMYK', 'I;16'):
+            image = noisy('L').convert(mode)
+            image.info['dpi'] = (300, 300)
+            page = store.add(image)
+
+            self.assertTrue(page.spilled)
+            self.assertEqual(page.image.mode, mode)
+            self.assertEqual(page.image.tobytes(), image.tobytes())
+            self.assertEqual(page.image.info['dpi'], (300, 300))
+            self.assertEqual(page.tile((10, 20, 110, 70)).tobytes(), image.crop((10, 20, 110, 70)).tobytes())
+
+    def test_views_of_spilled_pages_match_reducing_the_page(self):
+        for mode in ('RGB', 'L', '1'):
+            image = noisy(mode)
+            with patch.object(page_store, 'BAND_ROWS', 50):
+                view = self.store(0).add(image).view(100)
+            expected = page_store.reduce_by(image, 4)
+            self.assertEqual((view.mode, view.size), (expected.mode, expected.size))
+            self.assertEqual(view.tobytes(), expected.tobytes())
+
+    def test_samples_of_spilled_pages_match_nearest_resizing(self):
+        for mode in ('RGB', 'L', '1', 'I;16'):
+            image = noisy('L').convert(mode)
+            sample = self.store(0).add(image).sample((97, 131))
+            self.assertEqual(sample.tobytes(), image.resize((97, 131), Image.NEAREST).tobytes())
+
+    def test_classify_and_ai_preparation_leave_a_spilled_page_on_disk(self):
+        # big enough for the AI payload to be a reduced view
+        image = make_page(300, color=True)
+        expected = Document(image.copy())
+        document = Document(image).store_in(self.store(0))
+
+        with patch.object(page_store.StoredPage, 'image', property(lambda page: self.fail("whole page loaded"))):
+            self.assertEqual(document.compact_extension(), expected.compact_extension())
+            self.assertEqual(prepare_image_bytes(document, 'openai'), prepare_image_bytes(expected, 'openai'))
+
+    def test_dropped_pages_take_their_file_with_them(self):
+        store = self.store(0)
+        page = store.add(Image.new('RGB', (50, 50)))
+        self.assertEqual(len(os.listdir(self.workdir.name)), 1)
+
+        del page
+        gc.collect()
+
+        self.assertEqual(os.listdir(self.workdir.name), [])
+        self.assertEqual(store.pages(), [])
+
+    def test_document_works_from_a_spilled_page(self):
+        image = make_page(100, color=True)
+        expected = Document(image.copy()).encode('PNG')
+        document = Document(image).store_in(self.store(0))
+
+        self.assertEqual(document.size, image.size)
+        self.assertEqual(document.encode('PNG'), expected)
+        preview = PreviewRenderer(document, base_max_edge=200).render((120, 120))
+        self.assertEqual(preview.size, PreviewRenderer(image, base_max_edge=200).render((120, 120)).size)
+
+
+if __name__ == '__main__':
+    unittest.main()
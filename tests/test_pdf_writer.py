@@ -0,0 +1,100 @@
+import io
+import os
+import struct
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PIL import Image, PdfParser, TiffImagePlugin, features
+
+from lib.pdf_writer import PdfPageWriter
+
+
+def decode_group4(width, height, stream):
+    """Decode a CCITT group 4 stream by wrapping it in a single-strip TIFF"""
+    ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=b'II')
+    # bilevel TIFF tags as Pillow writes them; the strip offset counts from the end of the IFD
+    for tag, value in ((256, width), (257, height), (258, 1), (259, 4), (262, 1), (273, 0), (277, 1), (278, height), (279, len(stream))):
+        ifd[tag] = value
+    image = Image.open(io.BytesIO(b'II*\x00' + struct.pack('<I', 8) + ifd.tobytes(8) + stream))
+    image.load()
+    return image
+
+
+class TestPdfPageWriter(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def page_count(self):
+        parser = PdfParser.PdfParser(self.path)
+        try:
+            return len(parser.pages)
+        finally:
+            parser.close()
+
+    def test_pages_are_appended_to_one_pdf(self):
+        writer = PdfPageWriter(self.path)
+        for color in ('red', 'green', 'blue'):
+            writer.add_page(Image.new('RGB', (200, 300), color=color))
+
+        self.assertEqual(writer.pages, 3)
+        self.assertEqual(self.page_count(), 3)
+
+    def test_file_grows_with_each_page(self):
+        writer = PdfPageWriter(self.path)
+        sizes = []
+        for _ in range(3):
+            writer.add_page(Image.new('L', (200, 300), color=128))
+            sizes.append(os.path.getsize(self.path))
+
+        self.assertEqual(sizes, sorted(sizes))
+        self.assertEqual(len(set(sizes)), 3)
+
+    def test_unsupported_modes_are_converted(self):
+        writer = PdfPageWriter(self.path)
+        writer.add_page(Image.new('RGBA', (100, 100), color=(255, 0, 0, 128)))
+        writer.add_page(Image.new('P', (100, 100)))
+        self.assertEqual(self.page_count(), 2)
+
+    def page_images(self):
+        parser = PdfParser.PdfParser(self.path)
+        try:
+            return [parser.read_indirect(parser.read_indirect(ref).Resources.XObject.image) for ref in parser.pages]
+        finally:
+            parser.close()
+
+    @unittest.skipUnless(features.check('libtiff'), "group 4 needs Pillow built with libtiff")
+    def test_bilevel_pages_decode_back(self):
+        pages = [Image.effect_noise((203, 150), 90).convert('1'), Image.new('1', (64, 40), 1)]
+        writer = PdfPageWriter(self.path)
+        for page in pages:
+            writer.add_page(page)
+
+        for page, image in zip(pages, self.page_images()):
+            self.assertEqual(image.dictionary.Filter, [PdfParser.PdfName('CCITTFaxDecode')])
+            decoded = decode_group4(page.width, page.height, bytes(image.buf))
+            self.assertEqual(decoded.tobytes(), page.tobytes())
+
+    def test_bilevel_page_written_in_strips_falls_back_to_jpeg(self):
+        # what Pillow versions without strip_size do with a big page
+        with patch('lib.pdf_writer._group4_stream', return_value=None):
+            PdfPageWriter(self.path).add_page(Image.new('1', (64, 40), 1))
+
+        self.assertEqual(self.page_images()[0].dictionary.Filter, PdfParser.PdfName('DCTDecode'))
+
+    def test_existing_file_is_replaced(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a pdf')
+
+        writer = PdfPageWriter(self.path)
+        writer.add_page(Image.new('RGB', (100, 100)))
+        self.assertEqual(self.page_count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
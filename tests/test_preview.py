@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from PIL import Image
+
+from lib.preview import PreviewRenderer, downsample, fit_size, open_for_preview
+
+
+class TestFitSize(unittest.TestCase):
+    def test_keeps_aspect_ratio(self):
+        self.assertEqual(fit_size((4960, 7016), (980, 880)), (622, 880))
+        self.assertEqual(fit_size((2000, 1000), (500, 500)), (500, 250))
+
+    def test_never_zero(self):
+        self.assertEqual(fit_size((10000, 10), (100, 100)), (100, 1))
+
+
+class TestDownsample(unittest.TestCase):
+    def test_exact_target_size(self):
+        image = Image.new('RGB', (4960, 7016), 'white')
+        self.assertEqual(downsample(image, (622, 880)).size, (622, 880))
+
+    def test_small_reduction_skips_reduce(self):
+        image = Image.new('L', (1000, 1000), 128)
+        image.reduce = Mock(side_effect=AssertionError("reduce should not be used"))
+        self.assertEqual(downsample(image, (600, 600)).size, (600, 600))
+
+
+class TestPreviewRenderer(unittest.TestCase):
+    def setUp(self):
+        self.image = Image.new('RGB', (3000, 4000), 'white')
+
+    def test_renders_to_fit_box(self):
+        renderer = PreviewRenderer(self.image)
+        self.assertEqual(renderer.render((600, 600)).size, (450, 600))
+
+    def test_source_is_not_modified(self):
+        PreviewRenderer(self.image).render((300, 300))
+        self.assertEqual(self.image.size, (3000, 4000))
+
+    def test_base_is_capped(self):
+        renderer = PreviewRenderer(self.image, base_max_edge=1000)
+        self.assertEqual(renderer.base.size, (750, 1000))
+
+    def test_base_is_source_when_small_enough(self):
+        renderer = PreviewRenderer(self.image, base_max_edge=2560)
+        self.assertIs(renderer.base, self.image)
+
+    def test_base_converts_to_displayable_mode(self):
+        renderer = PreviewRenderer(Image.new('RGBA', (100, 100)))
+        self.assertEqual(renderer.base.mode, 'RGB')
+
+    def test_cached_per_size(self):
+        factory = Mock(side_effect=lambda image: image.size)
+        renderer = PreviewRenderer(self.image, factory=factory)
+
+        first = renderer.render((600, 600))
+        again = renderer.render((600, 600))
+
+        self.assertEqual(first, again)
+        self.assertEqual(factory.call_count, 1)
+
+    def test_only_recent_sizes_kept(self):
+        factory = Mock(side_effect=lambda image: image.size)
+        renderer = PreviewRenderer(self.image, factory=factory, cached_sizes=2)
+
+        renderer.render((300, 300))
+        renderer.render((400, 400))
+        renderer.render((500, 500))
+        renderer.render((300, 300))
+
+        self.assertEqual(factory.call_count, 4)
+
+
+class TestOpenForPreview(unittest.TestCase):
+    def test_jpeg_decoded_at_reduced_scale(self):
+        fd, path = tempfile.mkstemp(suffix='.jpg')
+        os.close(fd)
+        try:
+            Image.new('RGB', (4000, 4000), 'white').save(path)
+            image = open_for_preview(path, max_edge=1000)
+            self.assertEqual(image.size, (1000, 1000))
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import tempfile
+import types
+import unittest
+from multiprocessing import shared_memory
+from unittest.mock import patch
+
+from PIL import Image, PdfParser
+
+import lib.scanner as scanner
+from lib import process_pool
+from lib.pdf_writer import PdfPageWriter, encode_pdf_image, encode_pdf_pages
+from lib.process_pool import SharedBlocks, map_pages, open_shared
+from lib.simulated_scanner import make_page
+
+
+def tearDownModule():
+    # tests/run_tests.py leaves with os._exit(), which skips the atexit shutdown
+    process_pool.shutdown_pool()
+
+
+def page_streams(path):
+    """The image stream of each page of the PDF at path, in page order"""
+    pdf = PdfParser.PdfParser(path)
+    try:
+        return [bytes(pdf.read_indirect(pdf.read_indirect(ref).Resources.XObject.image).buf) for ref in pdf.pages]
+    finally:
+        pdf.close()
+
+
+def page_info(image, label):
+    # module level, the worker processes import it by name
+    return label, image.mode, image.size, image.info.get('dpi'), image.getpixel((0, 0))
+
+
+class TestSharedBlocks(unittest.TestCase):
+    def test_pixels_round_trip(self):
+        blocks = SharedBlocks()
+        self.addCleanup(blocks.close)
+        for mode in ('1', 'L', 'RGB'):
+            image = make_page(50, color=True).convert(mode)
+            image.info['dpi'] = (50, 50)
+            _, reference = blocks.put(image)
+
+            copy = open_shared(reference)
+
+            self.assertEqual(copy.tobytes(), image.tobytes())
+            self.assertEqual(copy.info['dpi'], (50, 50))
+
+    def test_pages_are_copied_a_band_at_a_time(self):
+        blocks = SharedBlocks()
+        self.addCleanup(blocks.close)
+        # odd sizes: bilevel rows end mid-byte
+        for mode in ('1', 'L', 'RGB', 'I;16'):
+            image = make_page(40, color=True).convert(mode).crop((0, 0, 203, 157))
+            with patch.object(process_pool, 'BAND_ROWS', 10):
+                _, reference = blocks.put(image)
+            self.assertEqual(open_shared(reference).tobytes(), image.tobytes())
+
+    def test_palette_pages_keep_their_colours(self):
+        blocks = SharedBlocks()
+        self.addCleanup(blocks.close)
+        image = make_page(50, color=True).convert('P', palette=Image.Palette.ADAPTIVE, colors=16)
+        image.info['transparency'] = 3
+
+        copy = open_shared(blocks.put(image)[1])
+
+        self.assertEqual(copy.convert('RGB').tobytes(), image.convert('RGB').tobytes())
+        self.assertEqual(copy.info['transparency'], 3)
+
+    def test_blocks_are_reused_and_unlinked(self):
+        blocks = SharedBlocks()
+        first, _ = blocks.put(Image.new('L', (100, 100)))
+        blocks.release(first)
+        second, _ = blocks.put(Image.new('L', (50, 50)))
+        name = second.name
+
+        self.assertIs(second, first)
+        blocks.close()
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+class TestMapPages(unittest.TestCase):
+    def test_results_come_back_in_page_order(self):
+        pages = [Image.new('L', (20 + n, 10), n * 10) for n in range(6)]
+        for image in pages:
+            image.info['dpi'] = (200, 200)
+
+        results = list(map_pages(page_info, pages, 2, 'page'))
+
+        self.assertEqual(results, [('page', 'L', (20 + n, 10), (200, 200), n * 10) for n in range(6)])
+
+    def test_pdf_pages_encoded_in_workers_match_in_process(self):
+        pages = [make_page(60, color=True), make_page(60, color=False), make_page(60, color=False).convert('1')]
+        expected = [encode_pdf_image(image) for image in pages]
+
+        encoded = list(encode_pdf_pages([image.copy() for image in pages], workers=2))
+
+        self.assertEqual([page.stream for page in encoded], [page.stream for page in expected])
+
+    def test_scan_batch_with_encode_workers(self):
+        pages = [make_page(60, seed=seed) for seed in range(4)]
+        dummy = types.SimpleNamespace(scan_pages=lambda scanner_name=None: iter([image.copy() for image in pages]))
+        orig = scanner.scanclient
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        seen = []
+        try:
+            scanner.scanclient = dummy
+            count = scanner.scan_batch(path, on_page=lambda number, image: seen.append(number), encode_workers=2)
+            pooled = page_streams(path)
+            writer = PdfPageWriter(path)
+            for image in pages:
+                writer.add_page(image)
+        finally:
+            scanner.scanclient = orig
+
+        self.assertEqual((count, seen), (4, [1, 2, 3, 4]))
+        # the very same encoded pages, in the same order, as writing them in-process
+        in_process = page_streams(path)
+        self.assertEqual(len(set(in_process)), 4)
+        self.assertEqual(pooled, in_process)
+
+    def test_pool_only_grows(self):
+        small = process_pool.get_pool(1)
+        self.assertIs(process_pool.get_pool(1), small)
+        bigger = process_pool.get_pool(2)
+        self.assertIs(process_pool.get_pool(1), bigger)
+
+
+if __name__ == '__main__':
+    unittest.main()
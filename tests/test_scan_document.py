@@ -2,7 +2,10 @@ import os
 import unittest
 from unittest.mock import patch, Mock
 
+from PIL import Image
+
 import app
+from lib.document import Document
 from tests.ui_guard import UIErrorGuardTestCase
 
 
@@ -17,6 +20,29 @@ class DummyVar:
         return self.value
 
 
+class InlineTasks:
+    """Stand-in for TkExecutor that runs work immediately on the calling thread"""
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args, on_success=None, on_error=None, timeout=None, on_timeout=None, **kwargs):
+        self.submitted.append((fn, timeout))
+        task = Mock()
+        task.pending = False
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if on_error:
+                on_error(e)
+        else:
+            if on_success:
+                on_success(result)
+        return task
+
+    def call_in_ui(self, fn, *args):
+        fn(*args)
+
+
 class TestScanDocument(UIErrorGuardTestCase):
     def setUp(self):
         super().setUp()
@@ -42,21 +68,34 @@ class TestScanDocument(UIErrorGuardTestCase):
         self.instance.custom_endpoint = None
         self.instance.custom_model = None
         self.instance.custom_api_key = None
-        # Ensure cleanup won't error
-        if os.path.exists('tmp.jpg'):
-            os.remove('tmp.jpg')
-
-    def tearDown(self):
-        if os.path.exists('tmp.jpg'):
-            os.remove('tmp.jpg')
-        super().tearDown()
+        self.instance.openai_model = app.OPENAI_MODEL
+        self.instance.gemini_model = app.GEMINI_MODEL
+        self.instance.ai_hedge_budget = None
+        self.instance.ai_hedge_models = app.hedge_models(app.HEDGE_MODELS)
+        self.instance.ai_stats = app.LatencyStats()
+        self.instance.batch_pdf_path = None
+        self.instance.scanner_var = DummyVar()
+        self.instance.skip_ai_button = Mock()
+        self.instance.tasks = InlineTasks()
+        self.instance.ai_tasks = self.instance.tasks
+        self.instance.scan_task = None
+        self.instance.ai_task = None
+        self.instance.ai_timeout = 60
+        self.instance.upload_document = None
+        self.instance.skip_blank_pages = True
+        self.instance.blank_page_threshold = None
+        self.instance.page_cleanup = None
+        self.instance.cleanup_workers = None
+        self.instance.auto_page_format = True
+        self.instance.encode_workers = None
+        self.instance.page_store = None
 
     @patch('app.scan_image')
     @patch('app.get_recommended_filename_from_pil_image')
     def test_scan_success(self, mock_getname, mock_scan):
-        # Return a simple dummy image object from scan
-        img = object()
-        mock_scan.return_value = img
+        # Return a small scanned document
+        doc = Document(Image.new('RGB', (10, 10), 'white'))
+        mock_scan.return_value = doc
         mock_getname.return_value = 'recommended_name'
 
         # Ensure no API keys so openai path not used
@@ -70,14 +109,15 @@ class TestScanDocument(UIErrorGuardTestCase):
         self.instance.scan_document()
 
         # display_image_object should be called (method on instance was mocked)
-        self.instance.display_image_object.assert_called_once_with(img)
-        self.assertEqual(self.instance.scanned_image, img)
+        self.instance.display_image_object.assert_called_once_with(doc)
+        self.assertIs(self.instance.document, doc)
         # filename_frame.pack called
         self.instance.filename_frame.pack.assert_called()
         # filename_var set (empty string expected because no api keys)
         self.assertEqual(self.instance.filename_var.get(), "")
-        # scanned_image_path set to tmp.jpg
-        self.assertEqual(self.instance.scanned_image_path, 'tmp.jpg')
+        # the scan stays in memory until it is uploaded, no temp file
+        self.assertIsNone(self.instance.scanned_image_path)
+        self.assertIs(self.instance.upload_document, doc)
         # upload button enabled
         self.instance.upload_button.config.assert_called_with(text="Upload to Paperless")
         # status_label updated to success message
@@ -88,8 +128,8 @@ class TestScanDocument(UIErrorGuardTestCase):
     def test_scan_uses_custom_endpoint(self, mock_custom, mock_scan):
         # When a custom endpoint + model are configured, scan_document should
         # use the custom provider in preference to OpenAI/Gemini.
-        img = object()
-        mock_scan.return_value = img
+        doc = Document(Image.new('RGB', (10, 10), 'white'))
+        mock_scan.return_value = doc
         mock_custom.return_value = 'custom_name'
 
         self.instance.custom_endpoint = 'http://localhost:11434/v1'
@@ -104,10 +144,11 @@ class TestScanDocument(UIErrorGuardTestCase):
         self.instance.scan_document()
 
         mock_custom.assert_called_once_with(
-            img,
+            doc,
             'http://localhost:11434/v1',
             'llava',
             'secret',
+            cancel=None,
         )
         self.assertEqual(self.instance.filename, 'custom_name')
         self.assertEqual(self.instance.filename_var.get(), 'custom_name')
@@ -135,6 +176,166 @@ class TestScanDocument(UIErrorGuardTestCase):
         # messagebox.showerror called
         mock_showerror.assert_called()
 
+    @patch('app.scan_batch')
+    @patch('app.get_recommended_filename_from_pil_image')
+    def test_batch_scan_success(self, mock_getname, mock_batch):
+        page = Mock()
+        page.copy.return_value = 'first_page'
+
+        def fake_batch(path, scanner_name=None, on_page=None, **kwargs):
+            for number in (1, 2, 3):
+                on_page(number, page)
+            return 3
+
+        mock_batch.side_effect = fake_batch
+        mock_getname.return_value = 'batch_name'
+        self.instance.openai_api_key = 'openai_key'
+        self.instance.display_image_object = Mock()
+
+        self.instance.batch_scan_document()
+
+        # only the first page is kept and previewed
+        page.copy.assert_called_once()
+        self.instance.display_image_object.assert_called_once_with(self.instance.document)
+        self.assertEqual(self.instance.document.image, 'first_page')
+        mock_getname.assert_called_once()
+        self.assertEqual(mock_getname.call_args[0][0].image, 'first_page')
+        self.assertEqual(mock_getname.call_args[0][1], 'openai_key')
+        self.assertEqual(self.instance.filename_var.get(), 'batch_name')
+        # the PDF becomes the document to upload
+        pdf_path = self.instance.batch_pdf_path
+        self.assertEqual(self.instance.scanned_image_path, pdf_path)
+        self.assertTrue(pdf_path.endswith('.pdf'))
+        self.instance.status_label.config.assert_called_with(text="Scanned 3 page(s) into one PDF. Enter filename to save.")
+        self.instance.cleanup()
+        self.assertFalse(os.path.exists(pdf_path))
+
+    @patch('app.scan_batch')
+    def test_batch_scan_reports_blank_pages_left_out(self, mock_batch):
+        page = Mock()
+
+        def fake_batch(path, scanner_name=None, on_page=None, skip_blank=False, blank_threshold=None, on_blank=None,
+                       cleanup=None, cleanup_workers=None, compact=False, encode_workers=0):
+            self.assertTrue(skip_blank)
+            on_page(1, page)
+            on_blank(page)
+            on_page(2, page)
+            on_blank(page)
+            return 2
+
+        mock_batch.side_effect = fake_batch
+        self.instance.display_image_object = Mock()
+
+        self.instance.batch_scan_document()
+
+        self.instance.status_label.config.assert_called_with(
+            text="Scanned 2 page(s) into one PDF, left out 2 blank page(s). Enter filename to save.")
+        self.instance.cleanup()
+
+    @patch('app.scan_batch')
+    @patch('app.messagebox.showinfo')
+    def test_batch_scan_empty_feeder(self, mock_showinfo, mock_batch):
+        mock_batch.return_value = 0
+
+        self.instance.batch_scan_document()
+
+        self.assertIsNone(self.instance.batch_pdf_path)
+        self.instance.status_label.config.assert_called_with(text="No pages scanned")
+        mock_showinfo.assert_called_once()
+
+    @patch('app.scan_image')
+    @patch('app.get_recommended_filename_from_pil_image')
+    def test_scan_and_ai_run_as_background_tasks(self, mock_getname, mock_scan):
+        mock_scan.return_value = Document(Image.new('RGB', (10, 10), 'white'))
+        mock_getname.return_value = 'recommended_name'
+        self.instance.openai_api_key = 'openai_key'
+        self.instance.ai_timeout = 12.5
+        self.instance.display_image_object = Mock()
+        self.instance.ai_tasks = InlineTasks()
+
+        self.instance.scan_document()
+
+        # the AI call has its own workers, so a slow provider never holds up a scan
+        self.assertEqual([fn for fn, _ in self.instance.tasks.submitted], [mock_scan])
+        self.assertEqual([fn for fn, _ in self.instance.ai_tasks.submitted], [self.instance.recommend_filename])
+        # the configured timeout applies to the AI call
+        self.assertEqual(self.instance.ai_tasks.submitted[0][1], 12.5)
+        self.assertEqual(self.instance.filename_var.get(), 'recommended_name')
+        self.instance.skip_ai_button.pack_forget.assert_called()
+
+    @patch('app.scan_image')
+    def test_scan_ignored_while_scan_is_running(self, mock_scan):
+        self.instance.scan_task = Mock(pending=True)
+
+        self.instance.scan_document()
+
+        mock_scan.assert_not_called()
+        self.instance.status_label.config.assert_called_with(text="Already scanning...")
+
+    def test_skip_ai_cancels_pending_suggestion(self):
+        task = Mock()
+        self.instance.ai_task = task
+
+        self.instance.skip_ai()
+
+        task.cancel.assert_called_once()
+        self.assertIsNone(self.instance.ai_task)
+        self.instance.skip_ai_button.pack_forget.assert_called()
+        self.instance.status_label.config.assert_called_with(text="AI suggestion skipped. Enter filename to save.")
+
+    @patch('app.get_recommended_filename_from_pil_image')
+    def test_ai_result_does_not_overwrite_typed_filename(self, mock_getname):
+        self.instance.openai_api_key = 'openai_key'
+        self.instance.filename = ''
+        self.instance.filename_var.set('')
+        mock_getname.side_effect = lambda *a, **kw: (self.instance.filename_var.set('typed_by_user'), 'ai_name')[1]
+
+        self.instance.request_filename(object(), "done")
+
+        self.assertEqual(self.instance.filename_var.get(), 'typed_by_user')
+
+    def test_ai_timeout_reports_and_hides_skip_button(self):
+        self.instance.openai_api_key = 'openai_key'
+        captured = {}
+
+        def fake_submit(fn, *args, on_timeout=None, **kwargs):
+            captured['on_timeout'] = on_timeout
+            return Mock()
+
+        self.instance.ai_tasks = Mock()
+        self.instance.ai_tasks.submit.side_effect = fake_submit
+
+        self.instance.request_filename(object(), "done")
+        captured['on_timeout']()
+
+        self.instance.skip_ai_button.pack_forget.assert_called()
+        self.instance.status_label.config.assert_called_with(text="AI suggestion timed out. Enter filename to save.")
+
+
+    @patch('app.get_recommended_filename_from_pil_image_gemini')
+    def test_configured_gemini_model_is_used(self, mock_gemini):
+        self.instance.gemini_api_key = 'gemini_key'
+        self.instance.gemini_model = 'gemini-2.5-flash'
+        mock_gemini.return_value = 'flash_name'
+        doc = Document(Image.new('RGB', (10, 10), 'white'))
+
+        self.assertEqual(self.instance.recommend_filename(doc), 'flash_name')
+        mock_gemini.assert_called_once_with(doc, 'gemini_key', 'gemini-2.5-flash', cancel=None)
+
+    @patch('app.get_recommended_filename_from_pil_image_gemini')
+    @patch('app.get_recommended_filename_from_pil_image')
+    def test_hedging_moves_on_when_the_primary_gives_no_filename(self, mock_openai, mock_gemini):
+        self.instance.openai_api_key = 'openai_key'
+        self.instance.gemini_api_key = 'gemini_key'
+        self.instance.ai_hedge_budget = 5
+        mock_openai.return_value = ''
+        mock_gemini.side_effect = lambda document, key, model, cancel: f'from_{model}'
+
+        self.assertEqual([c.name for c in self.instance.ai_candidates()],
+                         ['openai:gpt-4o-mini', 'gemini:gemini-2.5-pro', 'gemini:gemini-2.5-flash'])
+        self.assertEqual(self.instance.recommend_filename(Document(Image.new('RGB', (10, 10)))), 'from_gemini-2.5-pro')
+        self.assertEqual(self.instance.ai_stats.summary()['openai:gpt-4o-mini'][2], 1)
+
 
 if __name__ == '__main__':
     unittest.main()
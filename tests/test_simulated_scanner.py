@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch
+
+from lib import simulated_scanner
+
+
+class TestSimulatedScanner(unittest.TestCase):
+    def setUp(self):
+        saved = dict(simulated_scanner.SETTINGS)
+        self.addCleanup(simulated_scanner.configure, **saved)
+        # small pages keep the tests fast
+        simulated_scanner.configure(dpi=20, pages=3, delay=0.0, variants=2)
+
+    def test_list_scanners(self):
+        self.assertEqual(simulated_scanner.list_scanners(), ['Simulated Scanner'])
+
+    def test_scan_image_returns_jpeg_document(self):
+        document = simulated_scanner.scan_image()
+        self.assertEqual(document.size, (165, 233))
+        self.assertEqual(document.image.format, 'JPEG')
+        self.assertEqual(document.image.mode, 'RGB')
+
+    def test_grayscale_letter_pages(self):
+        simulated_scanner.configure(color=False, paper=(8.5, 11))
+        document = simulated_scanner.scan_image()
+        self.assertEqual(document.image.mode, 'L')
+        self.assertEqual(document.size, (170, 220))
+
+    def test_feeder_delivers_configured_page_count(self):
+        pages = list(simulated_scanner.scan_pages())
+        self.assertEqual(len(pages), 3)
+
+    def test_pages_vary_and_are_reused(self):
+        with patch('lib.simulated_scanner.make_page', wraps=simulated_scanner.make_page) as make_page:
+            data = [simulated_scanner.scan_image().encode('JPEG') for _ in range(4)]
+        self.assertEqual(make_page.call_count, 2)
+        self.assertNotEqual(data[0], data[1])
+        self.assertEqual(data[0], data[2])
+
+    @patch('lib.simulated_scanner.time.sleep')
+    def test_acquisition_delay(self, mock_sleep):
+        simulated_scanner.configure(delay=0.25)
+        simulated_scanner.scan_image()
+        mock_sleep.assert_called_once_with(0.25)
+
+    def test_unknown_setting(self):
+        with self.assertRaises(KeyError):
+            simulated_scanner.configure(colour=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
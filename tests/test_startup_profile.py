@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+import app
+from lib.startup_profile import StartupProfile
+
+
+class TestStartupProfile(unittest.TestCase):
+    def test_mark_records_consecutive_phases(self):
+        clock = iter([1.0, 1.25, 1.75])
+        cpu = iter([0.5, 0.6, 0.9])
+        with patch('lib.startup_profile.time.perf_counter', side_effect=lambda: next(clock)), \
+                patch('lib.startup_profile.time.process_time', side_effect=lambda: next(cpu)):
+            profile = StartupProfile()
+            profile.mark('imports')
+            profile.mark('load_config')
+
+        report = profile.report()
+        self.assertEqual(report['interpreter_cpu_ms'], 500.0)
+        self.assertEqual(report['phases'], [
+            {'name': 'imports', 'wall_ms': 250.0, 'cpu_ms': 100.0},
+            {'name': 'load_config', 'wall_ms': 500.0, 'cpu_ms': 300.0},
+        ])
+        self.assertEqual(report['total_wall_ms'], 750.0)
+        self.assertEqual(report['total_cpu_ms'], 400.0)
+
+    def test_write_json(self):
+        profile = StartupProfile()
+        profile.mark('imports')
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'startup.json')
+            profile.write(path)
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+        self.assertEqual([p['name'] for p in report['phases']], ['imports'])
+        self.assertIn('version', report)
+
+
+class TestFinishStartup(unittest.TestCase):
+    def test_writes_requested_reports_and_exits(self):
+        root = Mock()
+        with tempfile.TemporaryDirectory() as workdir:
+            args = app.parse_args(['--profile-startup', os.path.join(workdir, 'startup.json'),
+                                   '--profile-startup-cprofile', os.path.join(workdir, 'startup.prof'),
+                                   '--exit-after-startup'])
+            profiler = Mock()
+            with patch.object(app, 'STARTUP', StartupProfile()):
+                app.finish_startup(root, args, profiler)
+                self.assertEqual(app.STARTUP.phases[-1]['name'], 'first_window')
+
+            self.assertTrue(os.path.exists(args.profile_startup))
+        profiler.disable.assert_called_once()
+        profiler.dump_stats.assert_called_once_with(args.profile_startup_cprofile)
+        root.destroy.assert_called_once()
+
+    def test_default_report_path(self):
+        args = app.parse_args(['--profile-startup'])
+        self.assertEqual(args.profile_startup, 'startup-profile.json')
+        self.assertFalse(args.exit_after_startup)
+
+
+if __name__ == '__main__':
+    unittest.main()
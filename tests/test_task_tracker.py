@@ -0,0 +1,121 @@
+import threading
+import unittest
+
+from lib import task_tracker
+from lib.task_tracker import TaskTracker
+
+
+class FakeTasksApi:
+    """Answers fetch() from a dict of task_id -> state, recording each request"""
+
+    def __init__(self):
+        self.states = {}
+        self.requests = []
+
+    def __call__(self, api_url, api_token, task_ids):
+        self.requests.append((api_url, list(task_ids)))
+        return [dict(task_id=task_id, **self.states[task_id]) for task_id in task_ids if task_id in self.states]
+
+
+class TestTaskTracker(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeTasksApi()
+        self.tracker = TaskTracker(batch_size=50, initial_delay=1.0, max_delay=8.0, fetch=self.api)
+        # poll by hand rather than on the tracker thread
+        self.tracker._thread = object()
+
+    def test_outstanding_tasks_are_polled_in_batches(self):
+        for number in range(120):
+            self.tracker.track('http://paperless', 'token', f'task-{number}')
+        now = self.tracker.tasks()[-1].next_poll
+
+        self.tracker.poll_due(now)
+
+        self.assertEqual([len(ids) for _, ids in self.api.requests], [50, 50, 20])
+        self.assertEqual(self.tracker.requests, 3)
+
+    def test_servers_get_separate_requests(self):
+        self.tracker.track('http://one', 'token', 'a')
+        self.tracker.track('http://two', 'token', 'b')
+
+        self.tracker.poll_due(self.tracker.tasks()[-1].next_poll)
+
+        self.assertEqual(sorted(self.api.requests), [('http://one', ['a']), ('http://two', ['b'])])
+
+    def test_unfinished_tasks_back_off_exponentially(self):
+        task = self.tracker.track('http://paperless', 'token', 'a')
+        self.api.states['a'] = {'status': 'STARTED'}
+        delays = []
+        for _ in range(5):
+            self.tracker.poll_due(task.next_poll)
+            delays.append(task.delay)
+
+        self.assertEqual(delays, [2.0, 4.0, 8.0, 8.0, 8.0])
+        self.assertEqual(task.polls, 5)
+
+    def test_tasks_not_due_are_not_polled(self):
+        task = self.tracker.track('http://paperless', 'token', 'a')
+
+        wait = self.tracker.poll_due(task.created)
+
+        self.assertEqual(self.api.requests, [])
+        self.assertAlmostEqual(wait, 1.0, delta=0.2)
+
+    def test_final_states_are_recorded_and_reported_once(self):
+        finished = []
+        self.tracker.on_finished = finished.append
+        consumed = self.tracker.track('http://paperless', 'token', 'a', name='invoice.pdf')
+        duplicate = self.tracker.track('http://paperless', 'token', 'b')
+        waiting = self.tracker.track('http://paperless', 'token', 'c')
+        self.api.states = {
+            'a': {'status': 'SUCCESS', 'result': 'Success. New document id 42 created', 'related_document': '42'},
+            'b': {'status': 'FAILURE', 'result': 'invoice.pdf: Not consuming invoice.pdf: It is a duplicate of invoice (#41)'},
+        }
+
+        self.tracker.poll_due(waiting.next_poll)
+        self.tracker.poll_due(waiting.next_poll)
+
+        self.assertEqual((consumed.summary, consumed.document_id), ('consumed', '42'))
+        self.assertEqual(duplicate.summary, 'duplicate')
+        self.assertEqual(waiting.summary, 'consuming')
+        self.assertEqual(finished, [consumed, duplicate])
+        self.assertEqual(self.tracker.pending(), 1)
+        # finished tasks are not asked for again
+        self.assertEqual(self.api.requests[-1][1], ['c'])
+
+    def test_fetch_errors_back_off(self):
+        def failing_fetch(*args):
+            raise ConnectionError("server down")
+
+        self.tracker.fetch = failing_fetch
+        task = self.tracker.track('http://paperless', 'token', 'a')
+
+        self.tracker.poll_due(task.next_poll)
+
+        self.assertFalse(task.finished)
+        self.assertEqual(task.delay, 2.0)
+
+    def test_tasks_that_never_finish_are_given_up(self):
+        self.tracker.max_age = 10
+        task = self.tracker.track('http://paperless', 'token', 'a')
+
+        self.tracker.poll_due(task.created + 10)
+
+        self.assertEqual(task.status, task_tracker.UNKNOWN)
+        self.assertEqual(task.summary, 'unknown')
+
+    def test_tracker_thread_polls_until_consumed(self):
+        done = threading.Event()
+        api = FakeTasksApi()
+        api.states['a'] = {'status': 'SUCCESS', 'related_document': 1}
+        tracker = TaskTracker(initial_delay=0.01, fetch=api, on_finished=lambda task: done.set())
+
+        task = tracker.track('http://paperless', 'token', 'a')
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(task.summary, 'consumed')
+        tracker.stop(wait=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,346 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from PIL import Image
+
+import app
+from lib import task_tracker, upload_queue
+from lib.document import Document
+from lib.task_tracker import TrackedTask
+from lib.upload_queue import UploadQueue
+from tests.ui_guard import UIErrorGuardTestCase
+
+
+def wait_for(predicate, timeout=5):
+    """Spin until predicate() is true or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestUploadQueue(unittest.TestCase):
+    def setUp(self):
+        self.api_url = 'http://localhost:8000'
+        self.api_token = 'token123' # clearly fake
+
+    def test_submit_returns_immediately_and_uploads_in_background(self):
+        release = threading.Event()
+        calls = []
+
+        def fake_upload(file_path, api_url, api_token, filename=None, progress=None):
+            release.wait(5)
+            calls.append((file_path, api_url, api_token, filename))
+            return True, None, None
+
+        q = UploadQueue(workers=1, upload_func=fake_upload)
+        job = q.submit('doc.pdf', self.api_url, self.api_token, 'mydoc.pdf')
+
+        # the caller is not blocked by the upload
+        self.assertTrue(wait_for(lambda: job.status == upload_queue.UPLOADING))
+        self.assertEqual(q.depth(), 1)
+
+        release.set()
+        self.assertTrue(wait_for(lambda: job.status == upload_queue.DONE))
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(calls, [('doc.pdf', self.api_url, self.api_token, 'mydoc.pdf')])
+        self.assertEqual(q.depth(), 0)
+        q.shutdown(wait=True)
+
+    def test_failed_upload_records_error(self):
+        q = UploadQueue(workers=1, upload_func=lambda *a, **kw: (False, 400, {'error': 'bad'}))
+        job = q.submit('doc.pdf', self.api_url, self.api_token)
+
+        self.assertTrue(wait_for(lambda: job.finished))
+        self.assertEqual(job.status, upload_queue.FAILED)
+        self.assertIn('400', job.error)
+        q.shutdown(wait=True)
+
+    def test_exception_in_upload_marks_job_failed(self):
+        def boom(*args, **kwargs):
+            raise ConnectionError('no route')
+
+        q = UploadQueue(workers=1, upload_func=boom)
+        job = q.submit('doc.pdf', self.api_url, self.api_token)
+
+        self.assertTrue(wait_for(lambda: job.finished))
+        self.assertEqual(job.status, upload_queue.FAILED)
+        self.assertEqual(job.error, 'no route')
+        q.shutdown(wait=True)
+
+    def test_cancel_only_affects_pending_jobs(self):
+        release = threading.Event()
+        uploaded = []
+
+        def fake_upload(file_path, *args, **kwargs):
+            release.wait(5)
+            uploaded.append(file_path)
+            return True, None, None
+
+        q = UploadQueue(workers=1, upload_func=fake_upload)
+        first = q.submit('first.pdf', self.api_url, self.api_token)
+        second = q.submit('second.pdf', self.api_url, self.api_token)
+        self.assertTrue(wait_for(lambda: first.status == upload_queue.UPLOADING))
+
+        # running job cannot be cancelled, pending one can
+        self.assertFalse(q.cancel(first.id))
+        self.assertTrue(q.cancel(second.id))
+        self.assertEqual(second.status, upload_queue.CANCELLED)
+
+        release.set()
+        self.assertTrue(wait_for(lambda: first.finished))
+        q.shutdown(wait=True)
+        self.assertEqual(uploaded, ['first.pdf'])
+
+    def test_workers_upload_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_upload(*args, **kwargs):
+            # only passes if all three uploads are in flight at once
+            barrier.wait()
+            return True, None, None
+
+        q = UploadQueue(workers=3, upload_func=fake_upload)
+        jobs = [q.submit(f'{i}.pdf', self.api_url, self.api_token) for i in range(3)]
+
+        self.assertTrue(wait_for(lambda: all(j.finished for j in jobs)))
+        self.assertTrue(all(j.status == upload_queue.DONE for j in jobs))
+        q.shutdown(wait=True)
+
+    def test_progress_callback_updates_job(self):
+        seen = []
+        release = threading.Event()
+
+        def fake_upload(*args, progress=None):
+            progress(25, 100)
+            seen.append('reported')
+            release.wait(5)
+            progress(100, 100)
+            return True, None, None
+
+        q = UploadQueue(workers=1, upload_func=fake_upload)
+        job = q.submit('doc.pdf', self.api_url, self.api_token)
+
+        self.assertTrue(wait_for(lambda: seen))
+        self.assertEqual(job.progress, 0.25)
+        release.set()
+        self.assertTrue(wait_for(lambda: job.finished))
+        self.assertEqual(job.progress, 1.0)
+        q.shutdown(wait=True)
+
+    def test_remove_after_deletes_staged_file(self):
+        fd, path = tempfile.mkstemp(suffix='.jpg')
+        os.close(fd)
+
+        q = UploadQueue(workers=1, upload_func=lambda *a, **kw: (True, None, None))
+        job = q.submit(path, self.api_url, self.api_token, remove_after=True)
+
+        self.assertTrue(wait_for(lambda: job.finished))
+        self.assertFalse(os.path.exists(path))
+        q.shutdown(wait=True)
+
+    def test_failed_upload_keeps_staged_file(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        q = UploadQueue(workers=1, upload_func=lambda *a, **kw: (False, 500, 'Server Error'))
+        job = q.submit(path, self.api_url, self.api_token, remove_after=True)
+
+        self.assertTrue(wait_for(lambda: job.finished))
+        self.assertEqual(job.status, upload_queue.FAILED)
+        # it may be the only copy of a scanned stack
+        self.assertTrue(os.path.exists(path))
+        q.shutdown(wait=True)
+
+    def test_clear_finished_forgets_completed_jobs(self):
+        q = UploadQueue(workers=1, upload_func=lambda *a, **kw: (True, None, None))
+        job = q.submit('doc.pdf', self.api_url, self.api_token)
+        self.assertTrue(wait_for(lambda: job.finished))
+
+        q.clear_finished()
+        self.assertEqual(q.jobs(), [])
+        q.shutdown(wait=True)
+
+    def test_forget_drops_only_finished_jobs(self):
+        release = threading.Event()
+        q = UploadQueue(workers=1, upload_func=lambda *a, **kw: (release.wait(5), None, None))
+        done = q.submit('done.pdf', self.api_url, self.api_token)
+        waiting = q.submit('waiting.pdf', self.api_url, self.api_token)
+
+        self.assertFalse(q.forget(waiting.id))
+        release.set()
+        self.assertTrue(wait_for(lambda: done.finished and waiting.finished))
+        self.assertTrue(q.forget(done.id))
+        self.assertEqual(q.jobs(), [waiting])
+        q.shutdown(wait=True)
+
+
+class TestAppUpload(UIErrorGuardTestCase):
+    def setUp(self):
+        super().setUp()
+        self.instance = app.PaperlessScanApp.__new__(app.PaperlessScanApp)
+        self.instance.status_label = Mock()
+        self.instance.upload_button = Mock()
+        self.instance.upload_tree = Mock()
+        self.instance.upload_tree.exists.return_value = False
+        self.instance.queue_label = Mock()
+        self.instance.upload_progress = Mock()
+        self.instance.upload_queue = Mock()
+        self.instance.upload_queue.jobs.return_value = []
+        self.instance.upload_queue.depth.return_value = 1
+        self.instance._reported_jobs = set()
+        self.instance._owned_uploads = {}
+        self.instance.task_tracker = Mock()
+        self.instance._consume_tasks = {}
+        self.instance._reported_consumes = set()
+        self.instance.api_url = 'http://localhost:8000'
+        self.instance.api_token = 'token123'
+        self.instance.filename = 'mydoc'
+        self.instance.batch_pdf_path = None
+        self.instance.upload_document = None
+        self.instance.auto_page_format = True
+        self.instance.page_cleanup = None
+        self.instance.tasks = Mock()
+        # run background work inline
+        self.instance.tasks.submit.side_effect = lambda fn, *args, on_success=None, on_error=None, **kwargs: on_success(fn(*args))
+
+    def test_upload_to_paperless_enqueues_selected_file(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        self.instance.scanned_image_path = path
+
+        self.instance.upload_to_paperless()
+
+        self.instance.upload_queue.submit.assert_called_once_with(
+            path, 'http://localhost:8000', 'token123', 'mydoc', remove_after=False
+        )
+        # ready for the next document straight away
+        self.assertIsNone(self.instance.scanned_image_path)
+        self.instance.upload_button.config.assert_called_with(text="Select Document")
+        self.instance.queue_label.config.assert_called_with(text="Queue: 1")
+
+    def test_upload_scanned_document_writes_encoded_page_once(self):
+        document = Document(Image.new('RGB', (50, 50), 'white'))
+        self.instance.upload_document = document
+        self.instance.auto_page_format = False
+        self.instance.scanned_image_path = None
+
+        self.instance.upload_to_paperless()
+
+        args, kwargs = self.instance.upload_queue.submit.call_args
+        self.addCleanup(os.remove, args[0])
+        self.assertTrue(args[0].endswith('.jpg'))
+        self.assertEqual(args[1:], ('http://localhost:8000', 'token123', 'mydoc'))
+        # the queue owns (and removes) the temp file
+        self.assertEqual(kwargs, {'remove_after': True})
+        with open(args[0], 'rb') as f:
+            self.assertEqual(f.read(), document.encode('JPEG'))
+        self.assertIsNone(self.instance.upload_document)
+
+    def test_black_and_white_pages_stay_lossless_without_auto_format(self):
+        self.instance.auto_page_format = False
+        self.instance.scanned_image_path = None
+        for mode, cleanup, extension in (('1', None, '.png'), ('L', {}, '.png'), ('L', None, '.jpg'), ('RGB', {}, '.jpg')):
+            self.instance.page_cleanup = cleanup
+            document = Document(Image.new(mode, (50, 50), 'white'))
+            self.instance.upload_document = document
+
+            self.instance.upload_to_paperless()
+
+            path = self.instance.upload_queue.submit.call_args[0][0]
+            self.addCleanup(os.remove, path)
+            self.assertTrue(path.endswith(extension), (mode, cleanup, path))
+            if extension == '.png':
+                with Image.open(path) as image:
+                    self.assertEqual(image.tobytes(), document.image.tobytes())
+
+    def test_failed_scan_upload_can_be_sent_again(self):
+        document = Document(Image.new('RGB', (50, 50), 'white'))
+        self.instance.upload_document = document
+        self.instance.auto_page_format = False
+        self.instance.scanned_image_path = None
+        jobs = []
+        self.instance.upload_queue.submit.side_effect = lambda path, *args, **kwargs: jobs.append(
+            upload_queue.UploadJob(len(jobs) + 1, path, *args, **kwargs)) or jobs[-1]
+
+        self.instance.upload_to_paperless()
+        job = jobs[0]
+        job.status = upload_queue.FAILED
+        job.error = '500 Server Error'
+        self.instance.upload_queue.jobs.return_value = [job]
+        self.instance.refresh_upload_list()
+
+        self.assertIs(self.instance.upload_document, document)
+        self.instance.upload_button.config.assert_called_with(text="Upload to Paperless")
+        # the staged copy the queue kept is not needed, the page is staged again
+        self.assertFalse(os.path.exists(job.file_path))
+        self.instance.upload_to_paperless()
+        self.addCleanup(os.remove, jobs[1].file_path)
+        with open(jobs[1].file_path, 'rb') as f:
+            self.assertEqual(f.read(), document.encode('JPEG'))
+
+    def test_upload_scanned_text_page_in_compact_format(self):
+        document = Document(Image.new('RGB', (50, 50), 'white'))
+        self.instance.upload_document = document
+        self.instance.scanned_image_path = None
+
+        self.instance.upload_to_paperless()
+
+        path = self.instance.upload_queue.submit.call_args[0][0]
+        self.addCleanup(os.remove, path)
+        self.assertFalse(path.endswith('.jpg'))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), document.encode_compact()[2])
+
+    def test_failed_batch_upload_can_be_sent_again(self):
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        self.instance.batch_pdf_path = self.instance.scanned_image_path = path
+        job = upload_queue.UploadJob(1, path, 'http://localhost:8000', 'token123', 'mydoc', remove_after=True)
+        self.instance.upload_queue.submit.return_value = job
+
+        self.instance.upload_to_paperless()
+        self.assertIsNone(self.instance.batch_pdf_path)
+        job.status = upload_queue.FAILED
+        job.error = '500 Server Error'
+        self.instance.upload_queue.jobs.return_value = [job]
+        self.instance.refresh_upload_list()
+
+        # the stack is back behind the Upload button
+        self.assertEqual((self.instance.batch_pdf_path, self.instance.scanned_image_path), (path, path))
+        self.instance.upload_button.config.assert_called_with(text="Upload to Paperless")
+        self.instance.upload_to_paperless()
+        self.assertEqual(self.instance.upload_queue.submit.call_args, ((path, 'http://localhost:8000', 'token123', 'mydoc'), {'remove_after': True}))
+
+    def test_uploaded_job_is_tracked_until_consumed(self):
+        job = upload_queue.UploadJob(1, 'doc.pdf', 'http://localhost:8000', 'token123', 'doc.pdf')
+        job.status = upload_queue.DONE
+        job.task_id = 'task-1'
+        job.progress = 1.0
+        self.instance.upload_queue.jobs.return_value = [job]
+        consume = TrackedTask('task-1', job.api_url, job.api_token, job.name)
+        self.instance.task_tracker.track.return_value = consume
+
+        self.instance.refresh_upload_list()
+        self.instance.task_tracker.track.assert_called_once_with('http://localhost:8000', 'token123', 'task-1', 'doc.pdf')
+
+        consume.status = task_tracker.SUCCESS
+        consume.document_id = 42
+        self.instance.upload_tree.exists.return_value = True
+        self.instance.refresh_upload_list()
+        self.instance.upload_tree.item.assert_called_with('1', values=('doc.pdf', 'consumed', '100%'))
+        self.instance.status_label.config.assert_called_with(text="'doc.pdf' consumed by Paperless (document 42)")
+        self.assertEqual(self.instance.task_tracker.track.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
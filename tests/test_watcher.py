@@ -0,0 +1,166 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from lib.watcher import HotFolderWatcher
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "inotify is Linux only")
+class TestHotFolderWatcher(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        # registered first, so it runs after the watchers are stopped
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.inbox = os.path.join(self.root, 'inbox')
+        os.makedirs(self.inbox)
+        self.uploads = []
+        self.fail = False
+        self.lock = threading.Lock()
+
+    def fake_upload(self, file_path, api_url, api_token, filename=None, progress=None):
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        with self.lock:
+            self.uploads.append((filename, content))
+        if self.fail:
+            return False, 500, {'error': 'down'}
+        return True, None, 'task-id'
+
+    def start_watcher(self, **kwargs):
+        kwargs.setdefault('settle', 0.05)
+        watcher = HotFolderWatcher(self.inbox, 'http://localhost:8000', 'token123',
+                                   workers=2, upload_func=self.fake_upload, **kwargs)
+        watcher.start()
+        thread = threading.Thread(target=watcher.run, daemon=True)
+        thread.start()
+
+        def stop():
+            watcher.stop(wait=True)
+            thread.join(5)
+        self.addCleanup(stop)
+        return watcher
+
+    def write(self, name, content=b'%PDF-1.4 test'):
+        with open(os.path.join(self.inbox, name), 'wb') as f:
+            f.write(content)
+
+    def test_new_file_is_uploaded_and_deleted(self):
+        watcher = self.start_watcher()
+        self.write('invoice.pdf')
+
+        self.assertTrue(wait_for(lambda: watcher.uploaded == 1))
+        self.assertEqual(self.uploads, [('invoice.pdf', b'%PDF-1.4 test')])
+        self.assertFalse(os.path.exists(os.path.join(self.inbox, 'invoice.pdf')))
+
+    def test_existing_files_are_picked_up_on_start(self):
+        self.write('already_here.pdf')
+        watcher = self.start_watcher()
+
+        self.assertTrue(wait_for(lambda: watcher.uploaded == 1))
+        self.assertEqual(self.uploads[0][0], 'already_here.pdf')
+
+    def test_file_is_not_uploaded_while_still_open(self):
+        watcher = self.start_watcher()
+        path = os.path.join(self.inbox, 'big_scan.pdf')
+        with open(path, 'wb') as f:
+            f.write(b'first half ')
+            f.flush()
+            time.sleep(0.3)
+            # still open for writing, nothing may be uploaded yet
+            self.assertEqual(self.uploads, [])
+            f.write(b'second half')
+
+        self.assertTrue(wait_for(lambda: watcher.uploaded == 1))
+        self.assertEqual(self.uploads, [('big_scan.pdf', b'first half second half')])
+
+    def test_moved_in_file_goes_to_done_dir(self):
+        done_dir = os.path.join(self.root, 'done')
+        watcher = self.start_watcher(done_dir=done_dir)
+        staging = os.path.join(self.root, 'staging.pdf')
+        with open(staging, 'wb') as f:
+            f.write(b'moved')
+        os.rename(staging, os.path.join(self.inbox, 'moved.pdf'))
+
+        self.assertTrue(wait_for(lambda: watcher.uploaded == 1))
+        self.assertTrue(os.path.exists(os.path.join(done_dir, 'moved.pdf')))
+        self.assertFalse(os.path.exists(os.path.join(self.inbox, 'moved.pdf')))
+
+    def test_same_name_twice_keeps_both_in_done_dir(self):
+        done_dir = os.path.join(self.root, 'done')
+        watcher = self.start_watcher(done_dir=done_dir)
+        self.write('scan.pdf', b'first')
+        self.assertTrue(wait_for(lambda: watcher.uploaded == 1))
+        self.write('scan.pdf', b'second')
+        self.assertTrue(wait_for(lambda: watcher.uploaded == 2))
+
+        self.assertEqual(sorted(os.listdir(done_dir)), ['scan.pdf', 'scan_1.pdf'])
+        with open(os.path.join(done_dir, 'scan.pdf'), 'rb') as f:
+            self.assertEqual(f.read(), b'first')
+
+    def test_failed_upload_moves_to_failed_dir(self):
+        self.fail = True
+        failed_dir = os.path.join(self.root, 'failed')
+        watcher = self.start_watcher(failed_dir=failed_dir)
+        self.write('broken.pdf')
+
+        self.assertTrue(wait_for(lambda: watcher.failed == 1))
+        self.assertTrue(os.path.exists(os.path.join(failed_dir, 'broken.pdf')))
+
+    def test_hidden_and_partial_files_are_ignored(self):
+        watcher = self.start_watcher()
+        self.write('.hidden.pdf')
+        self.write('download.pdf.part')
+        self.write('real.pdf')
+
+        self.assertTrue(wait_for(lambda: watcher.uploaded == 1))
+        time.sleep(0.2)
+        self.assertEqual([name for name, _ in self.uploads], ['real.pdf'])
+
+    def test_removed_folder_stops_the_watcher_with_an_error(self):
+        watcher = HotFolderWatcher(self.inbox, 'http://localhost:8000', 'token123', upload_func=self.fake_upload)
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        errors = []
+
+        def run():
+            try:
+                watcher.run()
+            except OSError as e:
+                errors.append(e)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        shutil.rmtree(self.inbox)
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0].filename, watcher.directory)
+
+    def test_many_files_are_all_uploaded_once(self):
+        watcher = self.start_watcher()
+        for i in range(100):
+            self.write(f'doc_{i:03d}.pdf', str(i).encode())
+
+        self.assertTrue(wait_for(lambda: watcher.uploaded == 100, timeout=10))
+        self.assertEqual(sorted(name for name, _ in self.uploads), [f'doc_{i:03d}.pdf' for i in range(100)])
+        self.assertEqual(os.listdir(self.inbox), [])
+        # finished jobs are not kept around
+        self.assertTrue(wait_for(lambda: watcher.queue.jobs() == []))
+
+
+if __name__ == '__main__':
+    unittest.main()